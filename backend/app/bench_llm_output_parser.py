@@ -0,0 +1,85 @@
+"""
+AI 응답 파서 예시 확인 + 마이크로 벤치마크
+
+1) llm_output_corpus.json 의 모델 응답 예시를 전체 파싱과 스트리밍 파싱(여러 조각 크기)으로
+   각각 돌려서 expected 와 같은지 확인합니다.
+2) 예시를 이어 붙인 큰 텍스트로 초당 처리 줄 수를 잽니다.
+
+실행 (backend 디렉토리에서):
+    python app/bench_llm_output_parser.py
+"""
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from llm_output_parser import parse_generated_text, StreamingLineParser
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_output_corpus.json")
+BENCH_REPEAT = int(os.getenv("PARSER_BENCH_REPEAT", "2000"))
+CHUNK_SIZES = [1, 3, 7, 64]
+
+
+def parse_streaming(generation_type, text, chunk_size):
+    parser = StreamingLineParser(generation_type)
+    sentences = []
+    for i in range(0, len(text), chunk_size):
+        sentences.extend(parser.feed(text[i:i + chunk_size]))
+    sentences.extend(parser.flush())
+    return sentences
+
+
+def check_corpus(corpus):
+    failures = 0
+    for case in corpus:
+        results = {"전체": parse_generated_text(case["generation_type"], case["text"])}
+        for chunk_size in CHUNK_SIZES:
+            results[f"스트리밍({chunk_size})"] = parse_streaming(case["generation_type"], case["text"], chunk_size)
+        for mode, sentences in results.items():
+            if sentences != case["expected"]:
+                failures += 1
+                print(f"실패: [{case['generation_type']}] {case['name']} - {mode}")
+                print(f"  기대값: {case['expected']}")
+                print(f"  결과:   {sentences}")
+    print(f"예시 {len(corpus)}개 x {1 + len(CHUNK_SIZES)}가지 방식 확인, 실패 {failures}건")
+    return failures
+
+
+def bench(corpus):
+    text = "\n".join(case["text"] for case in corpus) + "\n"
+    text *= BENCH_REPEAT
+    lines = text.count("\n")
+
+    start = time.perf_counter()
+    parse_generated_text("sample_phrase", text)
+    full_seconds = time.perf_counter() - start
+
+    # 실제 스트림과 비슷하게 4~12글자 조각으로 나눠서 입력
+    rng = random.Random(0)
+    chunks = []
+    i = 0
+    while i < len(text):
+        size = rng.randint(4, 12)
+        chunks.append(text[i:i + size])
+        i += size
+    parser = StreamingLineParser("sample_phrase")
+    start = time.perf_counter()
+    for chunk in chunks:
+        parser.feed(chunk)
+    parser.flush()
+    stream_seconds = time.perf_counter() - start
+
+    print(f"{lines}줄 ({len(text) / 1024:.0f}KB)")
+    print(f"  전체 파싱:     {full_seconds * 1000:8.1f}ms  {lines / full_seconds:12,.0f}줄/초")
+    print(f"  스트리밍 파싱: {stream_seconds * 1000:8.1f}ms  {lines / stream_seconds:12,.0f}줄/초  (조각 {len(chunks)}개)")
+
+
+if __name__ == "__main__":
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        corpus = json.load(f)
+    failures = check_corpus(corpus)
+    bench(corpus)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,127 @@
+"""
+OpenAI 게이트웨이 동작 확인
+
+가짜 OpenAI 서버를 띄우고 /control 로 장애를 흉내내면서
+재시도, Retry-After, 시간 제한, 서킷 브레이커, 스트리밍 재시도를 확인합니다.
+
+실행 (backend 디렉토리에서):
+    python app/check_llm_gateway.py
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+FAKE_PORT = int(os.getenv("FAKE_OPENAI_PORT", "9102"))
+FAKE_URL = f"http://127.0.0.1:{FAKE_PORT}"
+
+# 확인을 빨리 끝내기 위해 시간 관련 설정을 줄임 (llm_gateway import 전에 설정)
+os.environ.update(
+    OPENAI_BASE_URL=f"{FAKE_URL}/v1",
+    LLM_TIMEOUT_SECONDS="1",
+    LLM_DEADLINE_SECONDS="2",
+    LLM_MAX_RETRIES="2",
+    LLM_RETRY_BASE_SECONDS="0.05",
+    LLM_CB_FAILURE_THRESHOLD="3",
+    LLM_CB_RESET_SECONDS="1",
+)
+sys.path.insert(0, APP_DIR)
+
+from llm_gateway import LLMGateway, LLMGatewayError, CircuitOpenError
+
+REQUEST = dict(model="gpt-3.5-turbo", messages=[{"role": "user", "content": "테스트"}], max_tokens=50)
+
+
+async def control(**values):
+    async with httpx.AsyncClient() as http:
+        await http.post(f"{FAKE_URL}/control", json=values)
+
+
+async def upstream_count():
+    async with httpx.AsyncClient() as http:
+        return (await http.get(f"{FAKE_URL}/stats")).json()["request_count"]
+
+
+async def call(gateway):
+    """(성공 여부, 오류, 걸린 시간 초, 업스트림 요청 수)"""
+    before = await upstream_count()
+    started = time.perf_counter()
+    try:
+        await gateway.chat_completion("check", **REQUEST)
+        error = None
+    except LLMGatewayError as e:
+        error = e
+    return error is None, error, time.perf_counter() - started, await upstream_count() - before
+
+
+async def main():
+    gateway = LLMGateway("sk-fake-gateway-check")
+    results = []
+
+    def check(name, passed, info=""):
+        results.append(passed)
+        print(f"{'PASS' if passed else 'FAIL'}  {name}  {info}")
+
+    await control(delay=0.05, fail_next=[], fail_status=None, retry_after=None)
+    ok, error, seconds, upstream = await call(gateway)
+    check("정상 호출", ok and upstream == 1, f"{seconds * 1000:.0f}ms")
+
+    await control(fail_next=[500, 502])
+    ok, error, seconds, upstream = await call(gateway)
+    check("5xx 두 번 뒤 재시도로 성공", ok and upstream == 3, f"업스트림 {upstream}회")
+
+    await control(fail_next=[429], retry_after=0.3)
+    ok, error, seconds, upstream = await call(gateway)
+    check("429 Retry-After 만큼 기다린 뒤 성공", ok and upstream == 2 and seconds >= 0.3, f"{seconds:.2f}초")
+
+    await control(fail_next=[400], retry_after=None)
+    ok, error, seconds, upstream = await call(gateway)
+    check("400은 재시도하지 않음", not ok and upstream == 1 and error.status_code == 502)
+
+    await control(delay=3)
+    ok, error, seconds, upstream = await call(gateway)
+    check("느린 응답은 전체 제한 시간 안에 504", not ok and error.status_code == 504 and seconds < 2.5, f"{seconds:.2f}초")
+    await control(delay=0.05)
+
+    await control(fail_status=500)
+    for _ in range(3):
+        await call(gateway)
+    ok, error, seconds, upstream = await call(gateway)
+    check("연속 실패 후 서킷이 열리고 바로 실패", isinstance(error, CircuitOpenError) and upstream == 0 and seconds < 0.05,
+          f"{seconds * 1000:.1f}ms, Retry-After {error.headers if error else None}")
+
+    await control(fail_status=None)
+    await asyncio.sleep(1.1)
+    ok, error, seconds, upstream = await call(gateway)
+    check("대기 시간이 지나면 시험 호출 후 서킷이 닫힘", ok and gateway.breaker.stats()["state"] == "closed")
+
+    await control(fail_next=[503])
+    chunks = [chunk async for chunk in gateway.stream_chat_completion("check", **REQUEST)]
+    check("스트리밍도 첫 응답 전 실패는 재시도", "".join(chunks).count("\n") >= 9)
+
+    stats = gateway.stats()["operations"]
+    check("작업별 지연 시간 히스토그램", stats["check"]["latency_ms"]["count"] >= 4, str(stats["check"]["outcomes"]))
+    await gateway.aclose()
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    fake_server = subprocess.Popen(
+        [sys.executable, os.path.join(APP_DIR, "fake_openai_server.py"), "--port", str(FAKE_PORT), "--delay", "0.05"]
+    )
+    try:
+        for _ in range(100):
+            try:
+                httpx.get(f"{FAKE_URL}/stats")
+                break
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        exit_code = asyncio.run(main())
+    finally:
+        fake_server.terminate()
+        fake_server.wait()
+    sys.exit(exit_code)
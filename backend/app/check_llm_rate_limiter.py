@@ -0,0 +1,144 @@
+"""
+요청/토큰 한도 스케줄러 동작 확인
+
+OpenAI를 부르지 않고 RateLimitScheduler만 돌려서 한도 유지, 우선순위 순서, 버리기,
+실제 사용량 반영, 429 뒤 멈춤을 확인합니다.
+
+실행 (backend 디렉토리에서):
+    python app/check_llm_rate_limiter.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from llm_rate_limiter import RateLimitScheduler, RateLimitShed, estimate_tokens
+
+# 초당 1000토큰 (요청 하나 1000토큰이면 처음 60개를 보낸 뒤 1초에 하나)
+TPM = 60000
+TOKENS_PER_REQUEST = 1000
+PRIORITIES = "sample_phrase:30,experience:15,hint:2"
+
+
+async def drain(limiter):
+    """버킷을 비워서 다음 요청부터 대기열을 타게 함"""
+    for _ in range(TPM // TOKENS_PER_REQUEST):
+        await limiter.acquire("sample_phrase", TOKENS_PER_REQUEST)
+
+
+async def check_throughput(check):
+    limiter = RateLimitScheduler(rpm=0, tpm=TPM, priorities=PRIORITIES)
+    started = time.monotonic()
+    admitted = []
+
+    async def one():
+        await limiter.acquire("sample_phrase", TOKENS_PER_REQUEST)
+        admitted.append(time.monotonic() - started)
+
+    await asyncio.gather(*(one() for _ in range(65)))
+    # 어느 시점이든 보낸 토큰 <= 버킷 크기 + 그때까지 다시 찬 양
+    within = all(
+        (i + 1) * TOKENS_PER_REQUEST <= TPM + at * TPM / 60 + 1
+        for i, at in enumerate(sorted(admitted))
+    )
+    last = max(admitted)
+    check("한도를 넘지 않고 최대 속도로 보냄", within and 4.5 <= last <= 6.0, f"65번째 {last:.2f}초")
+
+
+async def check_priority(check):
+    limiter = RateLimitScheduler(rpm=0, tpm=TPM, priorities=PRIORITIES)
+    await drain(limiter)
+    order = []
+
+    async def one(operation):
+        await limiter.acquire(operation, TOKENS_PER_REQUEST)
+        order.append(operation)
+
+    tasks = [asyncio.create_task(one("experience"))]
+    await asyncio.sleep(0)
+    tasks += [asyncio.create_task(one("sample_phrase")) for _ in range(2)]
+    await asyncio.gather(*tasks)
+    check("높은 우선순위가 먼저 나감", order == ["sample_phrase", "sample_phrase", "experience"], str(order))
+
+
+async def check_shedding(check):
+    limiter = RateLimitScheduler(rpm=0, tpm=TPM, priorities=PRIORITIES)
+    await drain(limiter)
+    backlog = [asyncio.create_task(limiter.acquire("sample_phrase", TOKENS_PER_REQUEST)) for _ in range(5)]
+    await asyncio.sleep(0)
+    started = time.monotonic()
+    try:
+        await limiter.acquire("hint", TOKENS_PER_REQUEST)
+        shed = None
+    except RateLimitShed as e:
+        shed = e
+    elapsed = time.monotonic() - started
+    check("대기 시간이 최대 대기 시간을 넘는 낮은 우선순위는 바로 거절",
+          shed is not None and elapsed < 0.01 and shed.retry_after >= 5,
+          f"retry_after {shed.retry_after:.1f}초" if shed else "")
+
+    for task in backlog:
+        task.cancel()
+
+    # 혼자 기다리기 시작했어도 높은 우선순위에 계속 밀리면 최대 대기 시간 뒤 거절
+    limiter = RateLimitScheduler(rpm=0, tpm=TPM, priorities=PRIORITIES)
+    await drain(limiter)
+    waiting = asyncio.create_task(limiter.acquire("hint", TOKENS_PER_REQUEST))
+    backlog = []
+    for _ in range(8):
+        await asyncio.sleep(0.3)
+        backlog.append(asyncio.create_task(limiter.acquire("sample_phrase", TOKENS_PER_REQUEST)))
+    started = time.monotonic()
+    try:
+        await waiting
+        passed = False
+    except RateLimitShed:
+        passed = True
+    check("대기 중 밀려나면 최대 대기 시간 뒤 거절", passed and time.monotonic() - started < 0.1)
+    for task in backlog:
+        task.cancel()
+    stats = limiter.stats()["operations"]["hint"]
+    check("대기열 / 거절 횟수 집계", stats["queued"] == 1 and stats["shed"] == 1, str(stats))
+
+
+async def check_settle_and_pause(check):
+    limiter = RateLimitScheduler(rpm=0, tpm=TPM, priorities=PRIORITIES)
+    await limiter.acquire("sample_phrase", TOKENS_PER_REQUEST)
+    before = limiter.stats()["available_tokens"]
+    limiter.settle(TOKENS_PER_REQUEST, 200)
+    after = limiter.stats()["available_tokens"]
+    check("실제 사용량이 적으면 차이를 돌려줌", after - before >= 800, f"{before} → {after}")
+
+    limiter.pause(1.0)
+    started = time.monotonic()
+    await limiter.acquire("sample_phrase", TOKENS_PER_REQUEST)
+    elapsed = time.monotonic() - started
+    check("429 뒤에는 Retry-After 동안 보내지 않음", 1.0 <= elapsed < 1.2, f"{elapsed:.2f}초")
+
+
+def check_estimate(check):
+    messages = [{"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": "포켓몬 예시 문장 10개"}]
+    tokens = estimate_tokens(messages, 500)
+    check("예상 토큰 = 프롬프트 어림값 + max_tokens", 500 < tokens < 540, str(tokens))
+
+
+async def main():
+    results = []
+
+    def check(name, passed, info=""):
+        results.append(passed)
+        print(f"{'PASS' if passed else 'FAIL'}  {name}  {info}")
+
+    check_estimate(check)
+    await check_throughput(check)
+    await check_priority(check)
+    await check_shedding(check)
+    await check_settle_and_pause(check)
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,167 @@
+"""
+SQLite 연결 풀
+
+요청마다 sqlite3.connect를 새로 여는 대신, 워커 프로세스마다 하나의 풀에
+오래 유지되는 연결을 모아두고 재사용합니다. 각 연결은 WAL 모드로 열려서
+쓰기 중에도 읽기가 막히지 않고, 페이지 캐시도 요청 사이에 유지됩니다.
+연결은 TimedConnection으로 열어서 모든 쿼리 시간이 /metrics 에 기록됩니다.
+
+환경변수:
+    TEMPLATES_DB_PATH   데이터베이스 파일 경로
+    DB_POOL_SIZE        풀에 유지할 최대 연결 수 (기본 8)
+    DB_POOL_TIMEOUT     빈 연결을 기다리는 최대 시간 초 (기본 10)
+    DB_BUSY_TIMEOUT_MS  잠금 대기 시간 ms (기본 5000)
+    DB_CACHE_SIZE_KB    연결당 페이지 캐시 크기 KB (기본 16384)
+    DB_MMAP_SIZE        메모리 맵 크기 바이트 (기본 128MB)
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+from metrics import TimedConnection
+
+DB_PATH = os.getenv("TEMPLATES_DB_PATH", os.path.join(os.path.dirname(__file__), "templates.db"))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(128 * 1024 * 1024)))
+
+
+def like_pattern(term):
+    """LIKE ... ESCAPE '\\' 검색용 패턴 (%, _ 를 문자 그대로 검색)"""
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+class PoolTimeout(Exception):
+    """풀의 모든 연결이 사용 중이고 대기 시간이 초과된 경우"""
+
+
+class ConnectionPool:
+    def __init__(self, path, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()  # 가장 최근에 쓴(캐시가 따뜻한) 연결부터 재사용
+        self._lock = threading.Lock()
+        self._created = 0
+        self._hits = 0
+        self._misses = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=DB_BUSY_TIMEOUT_MS / 1000, check_same_thread=False,
+                               factory=TimedConnection)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def acquire(self):
+        # 1) 쉬고 있는 연결이 있으면 바로 재사용 (hit)
+        try:
+            conn = self._idle.get_nowait()
+            with self._lock:
+                self._hits += 1
+            return conn
+        except queue.Empty:
+            pass
+
+        # 2) 아직 최대 개수에 도달하지 않았으면 새 연결 생성 (miss)
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+                self._misses += 1
+        if can_create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        # 3) 모두 사용 중이면 반납될 때까지 대기
+        start = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeout(f"{self.timeout}초 안에 데이터베이스 연결을 얻지 못했습니다.")
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._waits += 1
+            self._wait_time_total += waited
+            self._wait_time_max = max(self._wait_time_max, waited)
+        return conn
+
+    def release(self, conn):
+        # 커밋되지 않은 트랜잭션은 다음 사용자에게 넘기지 않음
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        with self._lock:
+            acquired = self._hits + self._misses + self._waits
+            return {
+                "size": self.size,
+                "created": self._created,
+                "idle": self._idle.qsize(),
+                "hits": self._hits,
+                "misses": self._misses,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "hit_rate": round(self._hits / acquired, 4) if acquired else 0.0,
+                "wait_time_total_ms": round(self._wait_time_total * 1000, 2),
+                "wait_time_max_ms": round(self._wait_time_max * 1000, 2),
+            }
+
+    def collect_metrics(self):
+        """/metrics 용 Prometheus 텍스트 줄 (metrics.register_collector 에 등록)"""
+        stats = self.stats()
+        lines = []
+        for name, kind, help_text, value in (
+            ("db_pool_connections", "gauge", "풀이 만든 연결 수", stats["created"]),
+            ("db_pool_idle_connections", "gauge", "쉬고 있는 연결 수", stats["idle"]),
+            ("db_pool_acquire_hits_total", "counter", "쉬고 있던 연결을 바로 빌린 횟수", stats["hits"]),
+            ("db_pool_acquire_misses_total", "counter", "새 연결을 만든 횟수", stats["misses"]),
+            ("db_pool_acquire_waits_total", "counter", "연결이 반납될 때까지 기다린 횟수", stats["waits"]),
+            ("db_pool_acquire_timeouts_total", "counter", "연결을 얻지 못하고 시간이 초과된 횟수", stats["timeouts"]),
+            ("db_pool_wait_seconds_total", "counter", "연결을 기다린 시간 합 (초)", stats["wait_time_total_ms"] / 1000),
+        ):
+            lines += metrics.format_family(name, kind, help_text, [("", [], value)])
+        return lines
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+db_pool = ConnectionPool(DB_PATH)
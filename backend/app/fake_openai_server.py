@@ -0,0 +1,133 @@
+"""
+부하 테스트용 가짜 OpenAI 서버
+
+/v1/chat/completions 요청을 받아 일정 시간 기다린 뒤 고정된 문장 목록을 돌려줍니다.
+실제 API 키나 비용 없이 AI 엔드포인트를 테스트할 수 있습니다.
+
+POST /control 로 장애를 흉내낼 수 있습니다.
+    {"delay": 0.5}                       응답 지연 시간 변경
+    {"fail_next": [500, 429]}            다음 요청들을 차례로 이 상태 코드로 실패
+    {"fail_status": 503}                 해제할 때까지 모든 요청 실패 (null이면 해제)
+    {"retry_after": 1}                   429 응답에 Retry-After 헤더 추가
+
+실행:
+    python app/fake_openai_server.py --port 9100 --delay 2.0
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import uvicorn
+
+app = FastAPI()
+
+# 응답 지연 시간 (초) - 실제 모델 응답 시간을 흉내냄
+app.state.delay = 2.0
+app.state.request_count = 0
+app.state.fail_next = []
+app.state.fail_status = None
+app.state.retry_after = None
+
+
+def build_fake_text(count):
+    return "\n".join(f'- "가짜 문장 {i + 1}번이야! 정말 재밌었어!"' for i in range(count))
+
+
+FAKE_USAGE = {"prompt_tokens": 100, "completion_tokens": 100, "total_tokens": 200}
+
+
+async def stream_chunks(model, text, include_usage=False):
+    # 첫 토큰까지 짧게 기다린 뒤, 나머지 지연 시간 동안 몇 글자씩 나눠서 보냄
+    pieces = [text[i:i + 4] for i in range(0, len(text), 4)]
+    await asyncio.sleep(min(0.1, app.state.delay))
+    for piece in pieces:
+        chunk = {
+            "id": f"chatcmpl-fake-{app.state.request_count}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]
+        }
+        yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+        await asyncio.sleep(app.state.delay / len(pieces))
+    if include_usage:
+        # stream_options.include_usage: 마지막에 choices 없이 사용량만 담은 조각
+        chunk = {
+            "id": f"chatcmpl-fake-{app.state.request_count}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [],
+            "usage": FAKE_USAGE,
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    app.state.request_count += 1
+    failure = app.state.fail_next.pop(0) if app.state.fail_next else app.state.fail_status
+    if failure:
+        headers = {}
+        if failure == 429 and app.state.retry_after is not None:
+            headers["Retry-After"] = str(app.state.retry_after)
+        return JSONResponse(
+            status_code=failure,
+            content={"error": {"message": f"fake failure {failure}", "type": "fake_error"}},
+            headers=headers
+        )
+    text = build_fake_text(10)
+    model = body.get("model", "gpt-3.5-turbo")
+
+    if body.get("stream"):
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+        return StreamingResponse(stream_chunks(model, text, include_usage), media_type="text/event-stream")
+
+    await asyncio.sleep(app.state.delay)
+    return {
+        "id": f"chatcmpl-fake-{app.state.request_count}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop"
+            }
+        ],
+        "usage": FAKE_USAGE
+    }
+
+
+@app.get("/stats")
+async def stats():
+    return {"request_count": app.state.request_count, "delay": app.state.delay}
+
+
+@app.post("/control")
+async def control(request: Request):
+    body = await request.json()
+    for key in ("delay", "fail_next", "fail_status", "retry_after"):
+        if key in body:
+            setattr(app.state, key, body[key])
+    return {
+        "delay": app.state.delay,
+        "fail_next": app.state.fail_next,
+        "fail_status": app.state.fail_status,
+        "retry_after": app.state.retry_after,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--delay", type=float, default=2.0)
+    args = parser.parse_args()
+    app.state.delay = args.delay
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,164 @@
+"""
+AI 생성 결과 캐시
+
+같은 키워드/유형/개수/프롬프트 버전/파서 버전으로 다시 요청하면 OpenAI를 호출하지 않고
+저장된 문장을 돌려줍니다. 메모리 LRU를 먼저 보고, 없으면 SQLite 저장소
+(ai_generation_cache 테이블)를 확인합니다. 저장소는 서버를 재시작해도 유지됩니다.
+
+환경변수:
+    AI_CACHE_TTL_SECONDS     캐시 유효 시간 (기본 7일, 0이면 캐시 사용 안 함)
+    AI_CACHE_MAX_ENTRIES     메모리 LRU 최대 항목 수 (기본 1024)
+    AI_CACHE_MAX_ROWS        SQLite 저장소 최대 행 수 (기본 100000)
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from db import db_pool
+
+AI_CACHE_TTL_SECONDS = int(os.getenv("AI_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "1024"))
+AI_CACHE_MAX_ROWS = int(os.getenv("AI_CACHE_MAX_ROWS", "100000"))
+PURGE_EVERY_PUTS = 100
+
+
+def make_cache_key(keyword, generation_type, count, prompt_version, parser_version):
+    return f"{generation_type}:{prompt_version}:{parser_version}:{count}:{keyword.strip()}"
+
+
+def create_cache_table(c):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS ai_generation_cache (
+            cache_key TEXT PRIMARY KEY,
+            sentences TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_ai_generation_cache_expires ON ai_generation_cache (expires_at)")
+
+
+class GenerationCache:
+    def __init__(self, ttl_seconds=AI_CACHE_TTL_SECONDS, max_entries=AI_CACHE_MAX_ENTRIES, max_rows=AI_CACHE_MAX_ROWS):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self._memory = OrderedDict()  # cache_key -> (sentences, expires_at)
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._memory_hits = 0
+        self._store_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expired = 0
+
+    @property
+    def enabled(self):
+        return self.ttl_seconds > 0
+
+    def get_from_memory(self, cache_key):
+        """메모리 LRU만 확인합니다. (데이터베이스를 보지 않으므로 이벤트 루프에서 불러도 됨)"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._memory.get(cache_key)
+            if entry is not None:
+                sentences, expires_at = entry
+                if expires_at > time.time():
+                    self._memory.move_to_end(cache_key)
+                    self._memory_hits += 1
+                    return list(sentences)
+                del self._memory[cache_key]
+                self._expired += 1
+        return None
+
+    def get(self, cache_key):
+        """메모리, 없으면 SQLite 저장소를 확인합니다. 연결 풀을 기다릴 수 있으므로 async 코드에서는 스레드풀로 부름"""
+        if not self.enabled:
+            return None
+        sentences = self.get_from_memory(cache_key)
+        if sentences is not None:
+            return sentences
+        now = time.time()
+
+        with db_pool.connection() as conn:
+            row = conn.execute(
+                "SELECT sentences, expires_at FROM ai_generation_cache WHERE cache_key = ? AND expires_at > ?",
+                (cache_key, now)
+            ).fetchone()
+        if row is None:
+            with self._lock:
+                self._misses += 1
+            return None
+
+        sentences = json.loads(row[0])
+        with self._lock:
+            self._store_hits += 1
+            self._remember(cache_key, sentences, row[1])
+        return list(sentences)
+
+    def put(self, cache_key, sentences):
+        """메모리와 SQLite 저장소에 저장합니다. (커밋하므로 async 코드에서는 스레드풀로 부름)"""
+        if not self.enabled:
+            return
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        with self._lock:
+            self._remember(cache_key, list(sentences), expires_at)
+            self._puts += 1
+            purge = self._puts % PURGE_EVERY_PUTS == 0
+
+        with db_pool.connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO ai_generation_cache (cache_key, sentences, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                (cache_key, json.dumps(sentences, ensure_ascii=False), now, expires_at)
+            )
+            if purge:
+                self._purge_store(conn, now)
+            conn.commit()
+
+    def _remember(self, cache_key, sentences, expires_at):
+        # self._lock 안에서 호출
+        self._memory[cache_key] = (sentences, expires_at)
+        self._memory.move_to_end(cache_key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._evictions += 1
+
+    def _purge_store(self, conn, now):
+        # 만료된 행과 최대 행 수를 넘는 오래된 행 정리
+        conn.execute("DELETE FROM ai_generation_cache WHERE expires_at <= ?", (now,))
+        conn.execute('''
+            DELETE FROM ai_generation_cache WHERE cache_key IN (
+                SELECT cache_key FROM ai_generation_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?
+            )
+        ''', (self.max_rows,))
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        with db_pool.connection() as conn:
+            conn.execute("DELETE FROM ai_generation_cache")
+            conn.commit()
+
+    def stats(self):
+        with self._lock:
+            hits = self._memory_hits + self._store_hits
+            lookups = hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "ttl_seconds": self.ttl_seconds,
+                "memory_entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "memory_hits": self._memory_hits,
+                "store_hits": self._store_hits,
+                "misses": self._misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "expired": self._expired,
+            }
+
+
+generation_cache = GenerationCache()
@@ -0,0 +1,206 @@
+"""
+AI 생성 결과 저장 (generation_runs / ai_generations 테이블)
+
+생성 요청 한 번이 generation_runs 한 행(키워드, 유형, 모델, 응답 시간, 토큰 사용량)이 되고,
+생성된 문장들은 run_id로 연결된 ai_generations 행이 됩니다. 문장은 한 줄씩 INSERT하지 않고
+executemany 한 번, 트랜잭션 하나로 저장합니다.
+
+AI_WRITE_BEHIND=1 이면 저장을 기다리지 않고 큐에 넣은 뒤 바로 돌아가고, 백그라운드
+스레드가 큐를 모아서 AI_WRITE_BATCH_ROWS 행이 쌓이거나 AI_WRITE_FLUSH_MS 가 지나면
+한 번에 커밋합니다. 동시에 여러 생성이 끝나도 커밋(fsync) 횟수가 줄어듭니다.
+대신 /ai/history/ 에는 최대 AI_WRITE_FLUSH_MS 만큼 늦게 보일 수 있고, 서버 종료 시에는
+남은 행을 모두 저장한 뒤 종료합니다.
+
+환경변수:
+    AI_WRITE_BEHIND       1이면 백그라운드 일괄 저장 사용 (기본 0)
+    AI_WRITE_BATCH_ROWS   한 번에 저장할 최대 행 수 (기본 200)
+    AI_WRITE_FLUSH_MS     큐에 들어온 행을 저장하기까지 최대 대기 시간 ms (기본 200)
+"""
+import os
+import queue
+import threading
+import time
+
+from db import db_pool
+
+AI_WRITE_BEHIND = os.getenv("AI_WRITE_BEHIND", "0") == "1"
+AI_WRITE_BATCH_ROWS = int(os.getenv("AI_WRITE_BATCH_ROWS", "200"))
+AI_WRITE_FLUSH_MS = int(os.getenv("AI_WRITE_FLUSH_MS", "200"))
+
+RUN_COLUMNS = (
+    "keyword", "generation_type", "model", "prompt_version", "streamed",
+    "latency_ms", "prompt_tokens", "completion_tokens", "total_tokens",
+)
+
+INSERT_RUN_SQL = (
+    f"INSERT INTO generation_runs ({', '.join(RUN_COLUMNS)}, sentence_count) "
+    f"VALUES ({', '.join('?' for _ in RUN_COLUMNS)}, ?)"
+)
+INSERT_GENERATION_SQL = (
+    "INSERT INTO ai_generations (run_id, position, keyword, generation_type, generated_text) VALUES (?, ?, ?, ?, ?)"
+)
+
+_STOP = object()
+
+
+def create_generation_runs(c):
+    """generation_runs 테이블과 히스토리 조회용 인덱스를 만듭니다. (ai_generations 테이블이 먼저 있어야 함)"""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS generation_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            keyword TEXT NOT NULL,
+            generation_type TEXT NOT NULL,
+            model TEXT,
+            prompt_version TEXT,
+            streamed INTEGER NOT NULL DEFAULT 0,
+            latency_ms REAL,
+            prompt_tokens INTEGER,
+            completion_tokens INTEGER,
+            total_tokens INTEGER,
+            sentence_count INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # 예전 ai_generations 테이블에 run_id/position 컬럼 추가 (예전 행은 run_id가 NULL)
+    columns = {row[1] for row in c.execute("PRAGMA table_info(ai_generations)")}
+    if "run_id" not in columns:
+        c.execute("ALTER TABLE ai_generations ADD COLUMN run_id INTEGER REFERENCES generation_runs (id)")
+    if "position" not in columns:
+        c.execute("ALTER TABLE ai_generations ADD COLUMN position INTEGER")
+
+    c.execute("CREATE INDEX IF NOT EXISTS idx_generation_runs_created ON generation_runs (created_at, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_generation_runs_keyword ON generation_runs (keyword, generation_type, created_at, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_generation_runs_type ON generation_runs (generation_type, created_at, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_ai_generations_run ON ai_generations (run_id, position)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_ai_generations_created ON ai_generations (created_at, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_ai_generations_keyword ON ai_generations (keyword, generation_type, created_at, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_ai_generations_type ON ai_generations (generation_type, created_at, id)")
+
+
+def insert_runs(conn, runs):
+    """생성 기록(run dict)들을 트랜잭션 하나로 저장합니다. 문장은 run마다 executemany 한 번."""
+    if not runs:
+        return
+    with conn:
+        for run in runs:
+            sentences = run["sentences"]
+            cursor = conn.execute(INSERT_RUN_SQL, [run.get(column) for column in RUN_COLUMNS] + [len(sentences)])
+            conn.executemany(INSERT_GENERATION_SQL, [
+                (cursor.lastrowid, position, run["keyword"], run["generation_type"], sentence)
+                for position, sentence in enumerate(sentences)
+            ])
+
+
+class GenerationWriter:
+    def __init__(self, write_behind=AI_WRITE_BEHIND, batch_rows=AI_WRITE_BATCH_ROWS, flush_ms=AI_WRITE_FLUSH_MS):
+        self.write_behind = write_behind
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._runs_written = 0
+        self._rows_written = 0
+        self._flushes = 0
+        self._errors = 0
+        self._max_batch = 0
+
+    def write(self, run):
+        """
+        생성 기록 하나를 저장합니다.
+
+        run: {"keyword", "generation_type", "sentences", 그리고 RUN_COLUMNS 중 아는 값들}
+        """
+        if not self.write_behind:
+            self._flush([run])
+            return
+        self._ensure_started()
+        self._queue.put(run)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="generation-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            rows = len(item["sentences"])
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            # 문장 N행이 모이거나 T ms가 지날 때까지 모아서 한 번에 저장
+            while rows < self.batch_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+                rows += len(item["sentences"])
+            self._flush(batch)
+            if stop:
+                return
+
+    def _flush(self, runs):
+        rows = sum(len(run["sentences"]) for run in runs)
+        try:
+            with db_pool.connection() as conn:
+                insert_runs(conn, runs)
+        except Exception as e:
+            with self._lock:
+                self._errors += 1
+            print(f"AI 생성 결과 저장 에러 ({len(runs)}건, {rows}행): {str(e)}")
+            if not self.write_behind:
+                raise
+            return
+        with self._lock:
+            self._runs_written += len(runs)
+            self._rows_written += rows
+            self._flushes += 1
+            self._max_batch = max(self._max_batch, rows)
+
+    def close(self, timeout=10):
+        """큐에 남은 행을 모두 저장하고 백그라운드 스레드를 멈춥니다."""
+        with self._lock:
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+        # 스레드가 멈춘 뒤 들어온 행 저장
+        pending = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                pending.append(item)
+        if pending:
+            self._flush(pending)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "write_behind": self.write_behind,
+                "batch_rows": self.batch_rows,
+                "flush_ms": int(self.flush_interval * 1000),
+                "queued_runs": self._queue.qsize(),
+                "runs_written": self._runs_written,
+                "rows_written": self._rows_written,
+                "flushes": self._flushes,
+                "rows_per_flush": round(self._rows_written / self._flushes, 2) if self._flushes else 0.0,
+                "max_batch": self._max_batch,
+                "errors": self._errors,
+            }
+
+
+generation_writer = GenerationWriter()
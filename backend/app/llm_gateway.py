@@ -0,0 +1,404 @@
+"""
+OpenAI 호출 게이트웨이
+
+모든 AI 생성 요청이 이 모듈을 거쳐 OpenAI를 호출합니다.
+
+- 연결 풀: 워커마다 httpx.AsyncClient 하나를 공유하고 keep-alive 연결을 재사용합니다.
+- 시간 제한: 시도 한 번은 LLM_TIMEOUT_SECONDS, 재시도를 포함한 전체는 LLM_DEADLINE_SECONDS 안에 끝납니다.
+- 재시도: 429 / 5xx / 연결 오류만 지수 백오프 + 무작위 지터로 다시 시도합니다.
+  429 응답에 Retry-After가 있으면 그 시간만큼 기다립니다. (SDK 자체 재시도는 끔)
+- 서킷 브레이커: 재시도까지 실패한 호출이 LLM_CB_FAILURE_THRESHOLD번 연속되면
+  LLM_CB_RESET_SECONDS 동안 OpenAI를 부르지 않고 바로 실패합니다. 그 뒤 한 번 시험 호출해서
+  성공하면 다시 닫힙니다. 장애 중에 워커가 멈춘 호출에 쌓이지 않게 합니다.
+- 요청/토큰 한도: 호출 전에 llm_rate_limiter 스케줄러에서 분당 요청 수와 예상 토큰 수를 차감하고,
+  한도를 넘으면 생성 유형 우선순위대로 기다리거나 바로 거절(503)합니다. 작업 이름이 생성 유형입니다.
+- 지연 시간 히스토그램: 작업(operation)별로 업스트림 응답 시간, 결과, 토큰 사용량을 모읍니다.
+  /ai/gateway/stats 에는 JSON으로, /metrics 에는 collect_metrics()로 Prometheus 형식으로 나갑니다.
+
+실패는 LLMGatewayError(status_code, detail, retry_after)로 올라오고, main.py가 그대로
+503/504/502 응답으로 바꿉니다.
+
+환경변수:
+    AI_MAX_CONCURRENCY         동시에 진행할 OpenAI 호출 수 (기본 8)
+    LLM_TIMEOUT_SECONDS        시도 한 번의 응답 대기 시간 (기본 30)
+    LLM_CONNECT_TIMEOUT        연결 대기 시간 (기본 5)
+    LLM_DEADLINE_SECONDS       재시도를 포함한 전체 제한 시간 (기본 60)
+    LLM_MAX_RETRIES            재시도 횟수 (기본 2)
+    LLM_RETRY_BASE_SECONDS     백오프 기본 간격 (기본 0.5)
+    LLM_RETRY_MAX_SECONDS      백오프 최대 간격 (기본 8)
+    LLM_MAX_CONNECTIONS        연결 풀 최대 연결 수 (기본 20)
+    LLM_KEEPALIVE_SECONDS      쉬는 연결을 유지할 시간 (기본 60)
+    LLM_CB_FAILURE_THRESHOLD   서킷을 여는 연속 실패 수 (기본 5)
+    LLM_CB_RESET_SECONDS       서킷이 열려 있는 시간 (기본 30)
+    (요청/토큰 한도 설정은 llm_rate_limiter.py 참고)
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+import metrics
+from llm_rate_limiter import RateLimitScheduler, RateLimitShed, estimate_tokens
+
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "8"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_KEEPALIVE_SECONDS = float(os.getenv("LLM_KEEPALIVE_SECONDS", "60"))
+LLM_CB_FAILURE_THRESHOLD = int(os.getenv("LLM_CB_FAILURE_THRESHOLD", "5"))
+LLM_CB_RESET_SECONDS = float(os.getenv("LLM_CB_RESET_SECONDS", "30"))
+
+# 업스트림 지연 시간 히스토그램 구간 (ms, 마지막은 +Inf)
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError)
+
+
+class LLMGatewayError(Exception):
+    """OpenAI 호출 실패. status_code / retry_after는 API 응답에 그대로 씁니다."""
+
+    def __init__(self, status_code, detail, retry_after=None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+    @property
+    def headers(self):
+        return {"Retry-After": str(max(1, round(self.retry_after)))} if self.retry_after else None
+
+
+class CircuitOpenError(LLMGatewayError):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=LLM_CB_FAILURE_THRESHOLD, reset_seconds=LLM_CB_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._opened_count = 0
+
+    def before_call(self):
+        """호출해도 되면 통과, 아니면 CircuitOpenError"""
+        with self._lock:
+            if self._state == "closed":
+                return
+            remaining = self._opened_at + self.reset_seconds - time.monotonic()
+            if self._state == "open" and remaining <= 0:
+                self._state = "half_open"
+            # half_open 상태에서는 시험 호출 하나만 보냄
+            if self._state == "half_open" and not self._probing:
+                self._probing = True
+                return
+        raise CircuitOpenError(
+            503, "AI 서비스가 일시적으로 응답하지 않아 잠시 요청을 멈췄습니다. 잠시 후 다시 시도해주세요.",
+            retry_after=max(remaining, 1.0)
+        )
+
+    def record_success(self):
+        with self._lock:
+            self._state = "closed"
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == "half_open" or self._failures >= self.failure_threshold:
+                if self._state != "open":
+                    self._opened_count += 1
+                self._state = "open"
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release_probe(self):
+        # 시험 호출이 업스트림 장애와 무관한 이유(4xx 등)로 끝난 경우
+        with self._lock:
+            self._probing = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_seconds": self.reset_seconds,
+                "opened_count": self._opened_count,
+            }
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum_ms = 0.0
+        self.count = 0
+
+    def observe(self, ms):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if ms <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.sum_ms += ms
+        self.count += 1
+
+    def snapshot(self):
+        cumulative = []
+        total = 0
+        for bound, count in zip(list(self.buckets) + ["+Inf"], self.counts):
+            total += count
+            cumulative.append((bound, total))
+        return {"buckets": cumulative, "count": self.count, "sum_ms": round(self.sum_ms, 1)}
+
+
+class LLMGateway:
+    def __init__(self, api_key, base_url=None):
+        self.enabled = bool(api_key)
+        self.semaphore = asyncio.Semaphore(AI_MAX_CONCURRENCY)
+        self.breaker = CircuitBreaker()
+        self.limiter = RateLimitScheduler()
+        self._lock = threading.Lock()
+        self._latency = {}   # operation -> LatencyHistogram (성공한 시도)
+        self._outcomes = {}  # (operation, outcome) -> 횟수
+        self._tokens = {}    # (operation, prompt/completion) -> 토큰 수
+        self._http_client = None
+        self.client = None
+        if self.enabled:
+            # 모든 요청이 공유하는 연결 풀 (keep-alive로 TLS 연결 재사용)
+            self._http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_CONNECTIONS,
+                    keepalive_expiry=LLM_KEEPALIVE_SECONDS,
+                ),
+                timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT),
+            )
+            self.client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=self._http_client,
+                max_retries=0,  # 재시도는 아래에서 직접
+                timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT),
+            )
+
+    def _count(self, operation, outcome):
+        with self._lock:
+            self._outcomes[(operation, outcome)] = self._outcomes.get((operation, outcome), 0) + 1
+
+    def _record_usage(self, operation, estimated_tokens, usage):
+        """응답의 토큰 사용량을 집계하고 한도 스케줄러에 실제 사용량을 알려줍니다."""
+        if usage is None:
+            return
+        with self._lock:
+            for kind, value in (("prompt", usage.prompt_tokens), ("completion", usage.completion_tokens)):
+                self._tokens[(operation, kind)] = self._tokens.get((operation, kind), 0) + (value or 0)
+        self.limiter.settle(estimated_tokens, usage.total_tokens)
+
+    def _observe(self, operation, started):
+        ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._latency.setdefault(operation, LatencyHistogram()).observe(ms)
+
+    async def _call_with_retries(self, operation, call):
+        """call()을 재시도/시간 제한/서킷 브레이커 안에서 실행합니다."""
+        self.breaker.before_call()
+        deadline = time.monotonic() + LLM_DEADLINE_SECONDS
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            started = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(call(), timeout=max(remaining, 0.001))
+            except asyncio.TimeoutError:
+                self._count(operation, "deadline")
+                self.breaker.record_failure()
+                raise LLMGatewayError(504, f"AI 응답이 {LLM_DEADLINE_SECONDS:g}초 안에 오지 않았습니다.")
+            except RETRYABLE_ERRORS as e:
+                self._count(operation, _outcome_name(e))
+                delay = _retry_delay(e, attempt)
+                if isinstance(e, openai.RateLimitError):
+                    # 다른 요청도 한도가 풀릴 때까지 보내지 않음
+                    self.limiter.pause(delay)
+                if attempt >= LLM_MAX_RETRIES or time.monotonic() + delay >= deadline:
+                    self.breaker.record_failure()
+                    raise _gateway_error(e, delay)
+                attempt += 1
+                self._count(operation, "retry")
+                await asyncio.sleep(delay)
+                continue
+            except openai.APIStatusError as e:
+                # 400/401/404 등은 다시 시도해도 같으므로 바로 실패 (업스트림 장애로 보지 않음)
+                self._count(operation, f"http_{e.status_code}")
+                self.breaker.release_probe()
+                raise LLMGatewayError(502, f"AI 요청이 거절되었습니다 ({e.status_code}): {e.message}")
+            except BaseException:
+                self.breaker.release_probe()
+                raise
+            self._observe(operation, started)
+            self._count(operation, "ok")
+            self.breaker.record_success()
+            return result
+
+    async def _admit(self, operation, kwargs):
+        """요청/토큰 한도 안에서 보낼 차례를 기다립니다. 반환값: 예상 토큰 수"""
+        tokens = estimate_tokens(kwargs.get("messages", ()), kwargs.get("max_tokens"))
+        try:
+            await self.limiter.acquire(operation, tokens)
+        except RateLimitShed as e:
+            self._count(operation, "shed")
+            raise LLMGatewayError(
+                503, "AI 요청이 많아 지금은 처리할 수 없습니다. 잠시 후 다시 시도해주세요.",
+                retry_after=max(e.retry_after, 1.0)
+            )
+        return tokens
+
+    async def chat_completion(self, operation, **kwargs):
+        """chat completion 한 번 (응답 전체)"""
+        tokens = await self._admit(operation, kwargs)
+        async with self.semaphore:
+            response = await self._call_with_retries(
+                operation, lambda: self.client.chat.completions.create(**kwargs)
+            )
+        self._record_usage(operation, tokens, getattr(response, "usage", None))
+        return response
+
+    async def stream_chat_completion(self, operation, **kwargs):
+        """
+        스트리밍 응답의 텍스트 조각을 차례로 돌려줍니다. (스트림이 끝날 때까지 동시성 슬롯 사용)
+
+        재시도는 첫 응답(헤더)을 받기 전까지만 합니다. 문장을 이미 보낸 뒤에는 다시 시도하지 않고
+        LLMGatewayError를 올립니다.
+        """
+        tokens = await self._admit(operation, kwargs)
+        async with self.semaphore:
+            # 마지막 조각에 토큰 사용량을 받아서 한도 계산에 반영
+            stream = await self._call_with_retries(
+                f"{operation}.stream",
+                lambda: self.client.chat.completions.create(
+                    stream=True, stream_options={"include_usage": True}, **kwargs
+                )
+            )
+            try:
+                async for chunk in stream:
+                    if chunk.usage is not None:
+                        self._record_usage(f"{operation}.stream", tokens, chunk.usage)
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            except RETRYABLE_ERRORS as e:
+                self._count(f"{operation}.stream", _outcome_name(e))
+                self.breaker.record_failure()
+                raise _gateway_error(e, None)
+            finally:
+                await stream.response.aclose()
+
+    def stats(self):
+        with self._lock:
+            operations = {}
+            for operation, histogram in self._latency.items():
+                operations.setdefault(operation, {})["latency_ms"] = histogram.snapshot()
+            for (operation, outcome), count in self._outcomes.items():
+                operations.setdefault(operation, {}).setdefault("outcomes", {})[outcome] = count
+            for (operation, kind), count in self._tokens.items():
+                operations.setdefault(operation, {}).setdefault("tokens", {})[kind] = count
+        return {
+            "enabled": self.enabled,
+            "max_concurrency": AI_MAX_CONCURRENCY,
+            "timeout_seconds": LLM_TIMEOUT_SECONDS,
+            "deadline_seconds": LLM_DEADLINE_SECONDS,
+            "max_retries": LLM_MAX_RETRIES,
+            "circuit": self.breaker.stats(),
+            "rate_limit": self.limiter.stats(),
+            "operations": operations,
+        }
+
+    def collect_metrics(self):
+        """/metrics 용 Prometheus 텍스트 줄 (metrics.register_collector 에 등록)"""
+        with self._lock:
+            latency = {operation: histogram.snapshot() for operation, histogram in self._latency.items()}
+            outcomes = sorted(self._outcomes.items())
+            tokens = sorted(self._tokens.items())
+        duration_samples = []
+        for operation, snapshot in sorted(latency.items()):
+            bounds = [bound / 1000 for bound, _ in snapshot["buckets"][:-1]]
+            duration_samples.extend(metrics.histogram_samples(
+                [("operation", operation)], bounds, [count for _, count in snapshot["buckets"]],
+                round(snapshot["sum_ms"] / 1000, 6), snapshot["count"]
+            ))
+        circuit = self.breaker.stats()
+        limiter = self.limiter.stats()
+        lines = []
+        lines += metrics.format_family(
+            "llm_request_duration_seconds", "histogram", "OpenAI 호출 응답 시간 (성공한 시도, 초)", duration_samples
+        )
+        lines += metrics.format_family("llm_requests_total", "counter", "OpenAI 호출 결과별 횟수 (재시도 포함)", [
+            ("", [("operation", operation), ("outcome", outcome)], count) for (operation, outcome), count in outcomes
+        ])
+        lines += metrics.format_family("llm_tokens_total", "counter", "OpenAI 토큰 사용량", [
+            ("", [("operation", operation), ("type", kind)], count) for (operation, kind), count in tokens
+        ])
+        lines += metrics.format_family("llm_circuit_open", "gauge", "서킷 브레이커 상태 (0 닫힘, 1 열림/시험 중)", [
+            ("", [], 0 if circuit["state"] == "closed" else 1)
+        ])
+        lines += metrics.format_family("llm_rate_limit_queue_depth", "gauge", "요청/토큰 한도 대기열 길이", [
+            ("", [("operation", operation)], depth) for operation, depth in limiter["queue_depth"].items()
+        ])
+        if limiter["available_tokens"] is not None:
+            lines += metrics.format_family("llm_rate_limit_available_tokens", "gauge",
+                                           "지금 보낼 수 있는 토큰 수", [("", [], limiter["available_tokens"])])
+        return lines
+
+    async def aclose(self):
+        if self._http_client is not None:
+            await self._http_client.aclose()
+
+
+def _outcome_name(error):
+    if isinstance(error, openai.APITimeoutError):
+        return "timeout"
+    if isinstance(error, openai.APIConnectionError):
+        return "connection_error"
+    return f"http_{error.status_code}"
+
+
+def _retry_after_seconds(error):
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_delay(error, attempt):
+    retry_after = _retry_after_seconds(error)
+    if retry_after is not None:
+        return min(retry_after, LLM_RETRY_MAX_SECONDS)
+    # full jitter: 0 ~ min(최대, 기본 * 2^시도) 사이 무작위
+    return random.uniform(0, min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * (2 ** attempt)))
+
+
+def _gateway_error(error, retry_after):
+    if isinstance(error, openai.RateLimitError):
+        return LLMGatewayError(503, "AI 요청이 많아 처리하지 못했습니다. 잠시 후 다시 시도해주세요.", retry_after=retry_after or 1.0)
+    if isinstance(error, openai.APITimeoutError):
+        return LLMGatewayError(504, "AI 응답 시간이 초과되었습니다.")
+    if isinstance(error, openai.APIConnectionError):
+        return LLMGatewayError(502, "AI 서비스에 연결하지 못했습니다.")
+    return LLMGatewayError(502, f"AI 서비스 오류 ({error.status_code})", retry_after=retry_after)
@@ -0,0 +1,96 @@
+"""
+AI 응답 파싱
+
+모델이 돌려준 텍스트를 한 줄씩 읽어 문장 목록으로 바꿉니다. 모든 생성 유형이 같은 규칙을
+쓰고, 한 줄은 미리 컴파일한 정규식 하나로 한 번에 분해합니다.
+
+    1. "문장"        번호 목록   (1.  1)  1번.)
+    - "문장"         대시/점 목록 (-  *  •  ·)
+    "문장"           따옴표만 있는 줄 (" ' “ ” ‘ ’)
+    키워드: 문장     짧은 이름표가 붙은 줄 (이름표는 버림)
+    문장             그냥 문장
+
+목록 기호, 이름표, 바깥 따옴표는 떼고 문장만 돌려줍니다. 빈 줄, [TASK] 같은 구역 제목,
+"키워드:"/"예시:"처럼 제목으로 끝나는 줄, ``` 코드 블록 표시는 건너뜁니다.
+
+전체 텍스트를 한 번에 파싱할 수도 있고(parse_generated_text), 스트리밍으로 받은 조각을
+줄이 완성될 때마다 파싱할 수도 있습니다(StreamingLineParser). 두 방식의 결과는 같습니다.
+
+규칙을 바꾸면 PARSER_VERSION을 올려서 이전 규칙으로 파싱해 캐시된 결과를 쓰지 않도록 하고,
+llm_output_corpus.json 예시로 bench_llm_output_parser.py 를 실행해 확인하세요.
+"""
+import re
+
+PARSER_VERSION = "p2"
+
+# 목록 기호 → 이름표 → 본문 순서로 한 줄을 분해
+LINE_PATTERN = re.compile(r'''
+    ^\s*
+    (?:
+        (?P<number>\d{1,3})\s*(?:[.)]|번\.?)\s+     # 번호 목록
+      | (?P<bullet>[-*•·])\s*                        # 대시/점 목록
+    )?
+    (?:(?P<label>[^\s:"'“”‘’][^:"'“”‘’]{0,14}?)\s*[:：](?:\s+|(?=["“])))?   # 짧은 이름표 (3:30 같은 시간은 제외)
+    (?P<body>(?:.*\S)?)
+    \s*$
+''', re.VERBOSE)
+
+# 구역 제목, 제목 줄("예시:", "키워드별 예시:"), 제목 + 값("키워드: 축구"), 코드 블록 표시
+SKIP_PATTERN = re.compile(r'''
+    ^(?:
+        \[[^\]]*\]
+      | [^"'“”‘’]*[:：]
+      | (?:키워드|규칙|대화|예시|생성할|정답)\S*\s*[:：].*
+      | ```.*
+    )$
+''', re.VERBOSE)
+
+OPEN_QUOTES = "\"'“‘"
+CLOSE_QUOTES = "\"'”’"
+QUOTE_CHARS = OPEN_QUOTES + CLOSE_QUOTES
+
+
+def parse_line(line):
+    """한 줄에서 문장을 꺼냅니다. 문장이 없는 줄이면 None"""
+    number, bullet, label, body = LINE_PATTERN.match(line).groups()
+    if not body:
+        return None
+    # 목록 기호가 없는 제목 줄은 건너뜀
+    if number is None and bullet is None and SKIP_PATTERN.match(line.strip()):
+        return None
+
+    if len(body) >= 2 and body[0] in OPEN_QUOTES and body[-1] in CLOSE_QUOTES:
+        body = body[1:-1].strip()
+    # 따옴표만 남은 줄 ("" 또는 ")
+    if not body.strip(QUOTE_CHARS):
+        return None
+    return body
+
+
+def parse_generated_text(generation_type, text):
+    """생성 유형과 관계없이 같은 규칙으로 전체 텍스트를 파싱합니다. (generation_type은 호환용)"""
+    sentences = []
+    for line in text.split('\n'):
+        sentence = parse_line(line)
+        if sentence is not None:
+            sentences.append(sentence)
+    return sentences
+
+
+class StreamingLineParser:
+    """스트리밍 조각을 모아 줄이 끝날 때마다 파싱된 문장을 돌려줍니다."""
+
+    def __init__(self, generation_type=None):
+        self._buffer = ""
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        if '\n' not in self._buffer:
+            return []
+        *lines, self._buffer = self._buffer.split('\n')
+        return [sentence for sentence in map(parse_line, lines) if sentence is not None]
+
+    def flush(self):
+        line, self._buffer = self._buffer, ""
+        sentence = parse_line(line)
+        return [sentence] if sentence is not None else []
@@ -0,0 +1,259 @@
+"""
+OpenAI 요청 수(RPM) / 토큰 수(TPM) 제한 스케줄러
+
+세션을 시작할 때처럼 생성 요청이 한꺼번에 몰리면 분당 토큰 한도를 넘어 429가 연달아 나옵니다.
+이 스케줄러는 OpenAI를 부르기 전에 요청 수와 예상 토큰 수를 버킷 두 개에서 미리 차감해서,
+한도 안에서 최대한 많이 보내고 넘치는 요청은 우선순위 순서대로 기다리게 합니다.
+
+- 버킷: 분당 한도만큼 담기고 초당 한도/60씩 다시 찹니다. (1분 동안 한도까지 몰아서 보낼 수 있음)
+- 예상 토큰: max_tokens + 프롬프트 길이로 어림한 토큰 수. 응답에 실제 사용량(usage)이 오면
+  차이만큼 버킷에 돌려주거나 더 차감합니다.
+- 우선순위: LLM_PRIORITIES 순서대로 먼저 보냅니다. (기본 sample_phrase > experience > hint)
+  같은 우선순위는 들어온 순서대로 보냅니다.
+- 버리기: 예상 대기 시간이 우선순위별 최대 대기 시간을 넘으면 기다리지 않고 바로 거절하고,
+  기다리는 도중 더 높은 우선순위 요청에 밀려 최대 대기 시간을 넘겨도 거절합니다.
+- 429를 받으면 Retry-After 동안 새 요청을 보내지 않습니다. (다른 서버와 한도를 같이 쓰는 경우)
+
+이벤트 루프 하나 안에서만 쓰므로 잠금 없이 asyncio Future로 대기열을 관리합니다.
+
+환경변수:
+    LLM_RPM_LIMIT    분당 요청 수 한도 (기본 500, 0이면 제한 없음)
+    LLM_TPM_LIMIT    분당 토큰 수 한도 (기본 60000, 0이면 제한 없음)
+    LLM_PRIORITIES   "유형:최대 대기 초" 목록, 앞에 있을수록 먼저 보냄
+                     (기본 sample_phrase:30,experience:15,hint:5, 목록에 없는 유형은 맨 뒤)
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import time
+
+LLM_RPM_LIMIT = int(os.getenv("LLM_RPM_LIMIT", "500"))
+LLM_TPM_LIMIT = int(os.getenv("LLM_TPM_LIMIT", "60000"))
+LLM_PRIORITIES = os.getenv("LLM_PRIORITIES", "sample_phrase:30,experience:15,hint:5")
+
+# 목록에 없는 작업의 최대 대기 시간
+DEFAULT_MAX_WAIT_SECONDS = 5.0
+# 메시지 하나에 붙는 형식 토큰 (role, 구분자)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+class RateLimitShed(Exception):
+    """한도 안에서 제때 보낼 수 없어 요청을 버림. retry_after: 다시 시도할 때까지 예상 시간(초)"""
+
+    def __init__(self, operation, retry_after):
+        super().__init__(f"{operation} 요청이 한도 대기열에서 밀려났습니다")
+        self.operation = operation
+        self.retry_after = retry_after
+
+
+def parse_priorities(value):
+    """"a:30,b:15" → ({"a": 0, "b": 1}, {"a": 30.0, "b": 15.0})"""
+    ranks, max_waits = {}, {}
+    for rank, item in enumerate(part.strip() for part in value.split(",") if part.strip()):
+        name, _, wait = item.partition(":")
+        ranks[name.strip()] = rank
+        max_waits[name.strip()] = float(wait) if wait.strip() else DEFAULT_MAX_WAIT_SECONDS
+    return ranks, max_waits
+
+
+def estimate_tokens(messages, max_tokens):
+    """
+    요청 하나가 쓸 토큰 수를 넉넉하게 어림합니다.
+
+    영문/숫자는 4글자에 1토큰, 한글 등 그 밖의 글자는 1글자에 1토큰으로 셉니다.
+    응답은 max_tokens 전체를 쓴다고 봅니다.
+    """
+    prompt_tokens = 0
+    for message in messages:
+        content = message.get("content") or ""
+        ascii_chars = sum(1 for ch in content if ord(ch) < 128)
+        prompt_tokens += ascii_chars // 4 + (len(content) - ascii_chars) + MESSAGE_OVERHEAD_TOKENS
+    return prompt_tokens + (max_tokens or 0)
+
+
+class _Bucket:
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = float(per_minute)
+        self._updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def seconds_until(self, amount):
+        missing = amount - self.level
+        return missing / self.rate if missing > 0 else 0.0
+
+
+class RateLimitScheduler:
+    def __init__(self, rpm=LLM_RPM_LIMIT, tpm=LLM_TPM_LIMIT, priorities=LLM_PRIORITIES):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.enabled = rpm > 0 or tpm > 0
+        self._requests = _Bucket(rpm) if rpm > 0 else None
+        self._tokens = _Bucket(tpm) if tpm > 0 else None
+        self._ranks, self._max_waits = parse_priorities(priorities)
+        self._waiters = []  # (우선순위, 순번, 토큰, future)
+        self._seq = itertools.count()
+        self._timer = None
+        self._paused_until = 0.0
+        self._stats = {}  # 작업 -> 카운터
+
+    def _rank(self, operation):
+        return self._ranks.get(operation, len(self._ranks))
+
+    def _max_wait(self, operation):
+        return self._max_waits.get(operation, DEFAULT_MAX_WAIT_SECONDS)
+
+    def _cost(self, tokens):
+        # 한도보다 큰 요청은 버킷이 가득 찼을 때 보냄 (영원히 기다리지 않게)
+        return min(tokens, self._tokens.capacity) if self._tokens else 0
+
+    def _seconds_until(self, tokens, now):
+        """지금 요청 하나 + 토큰 tokens 를 보낼 수 있을 때까지 남은 시간"""
+        wait = max(self._paused_until - now, 0.0)
+        if self._requests:
+            wait = max(wait, self._requests.seconds_until(1))
+        if self._tokens:
+            wait = max(wait, self._tokens.seconds_until(self._cost(tokens)))
+        return wait
+
+    def _refill(self, now):
+        for bucket in (self._requests, self._tokens):
+            if bucket:
+                bucket.refill(now)
+
+    def _take(self, tokens):
+        if self._requests:
+            self._requests.level -= 1
+        if self._tokens:
+            self._tokens.level -= self._cost(tokens)
+
+    def _estimated_wait(self, rank, tokens, now):
+        """이미 기다리는 같거나 높은 우선순위 요청을 모두 보낸 뒤까지 걸릴 시간 (어림)"""
+        ahead_requests, ahead_tokens = 1, self._cost(tokens)
+        for waiter_rank, _, waiter_tokens, future in self._waiters:
+            if waiter_rank <= rank and not future.done():
+                ahead_requests += 1
+                ahead_tokens += self._cost(waiter_tokens)
+        wait = max(self._paused_until - now, 0.0)
+        if self._requests:
+            wait = max(wait, self._requests.seconds_until(ahead_requests))
+        if self._tokens:
+            wait = max(wait, self._tokens.seconds_until(ahead_tokens))
+        return wait
+
+    def _counter(self, operation):
+        return self._stats.setdefault(operation, {
+            "admitted": 0, "queued": 0, "shed": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0,
+        })
+
+    async def acquire(self, operation, tokens):
+        """요청 하나 + 예상 토큰 tokens 를 보낼 차례가 될 때까지 기다립니다. 보낼 수 없으면 RateLimitShed"""
+        if not self.enabled:
+            return
+        counter = self._counter(operation)
+        now = time.monotonic()
+        self._refill(now)
+        rank = self._rank(operation)
+
+        # 기다리는 요청이 없고 바로 보낼 수 있으면 대기열을 거치지 않음
+        if not self._waiters and self._seconds_until(tokens, now) == 0:
+            self._take(tokens)
+            counter["admitted"] += 1
+            return
+
+        max_wait = self._max_wait(operation)
+        estimated = self._estimated_wait(rank, tokens, now)
+        if estimated > max_wait:
+            counter["shed"] += 1
+            raise RateLimitShed(operation, estimated)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (rank, next(self._seq), tokens, future))
+        counter["queued"] += 1
+        self._dispatch()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=max_wait)
+        except asyncio.TimeoutError:
+            # 시간이 다 된 순간 차례를 받았으면 그대로 보냄
+            if future.cancel():
+                counter["shed"] += 1
+                self._dispatch()
+                raise RateLimitShed(operation, self._estimated_wait(rank, tokens, time.monotonic()))
+        except asyncio.CancelledError:
+            # 보낼 차례를 받은 직후 취소되면 받은 몫은 그대로 씀 (이미 차감됨)
+            future.cancel()
+            self._dispatch()
+            raise
+        waited = time.monotonic() - now
+        counter["admitted"] += 1
+        counter["wait_seconds_total"] += waited
+        counter["wait_seconds_max"] = max(counter["wait_seconds_max"], waited)
+
+    def _dispatch(self):
+        """보낼 수 있는 만큼 대기열 앞에서부터 깨우고, 남으면 다음 차례에 다시 확인하도록 예약"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        now = time.monotonic()
+        self._refill(now)
+        while self._waiters:
+            _, _, tokens, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            wait = self._seconds_until(tokens, now)
+            if wait > 0:
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+            heapq.heappop(self._waiters)
+            self._take(tokens)
+            future.set_result(None)
+
+    def settle(self, estimated_tokens, actual_tokens):
+        """실제 사용량을 알게 되면 어림값과의 차이를 버킷에 반영합니다."""
+        if not self._tokens or actual_tokens is None:
+            return
+        self._tokens.refill(time.monotonic())
+        self._tokens.level = min(
+            self._tokens.capacity, self._tokens.level + self._cost(estimated_tokens) - actual_tokens
+        )
+        if self._waiters:
+            self._dispatch()
+
+    def pause(self, seconds):
+        """업스트림이 429를 돌려주면 seconds 동안 새 요청을 보내지 않습니다."""
+        if not self.enabled or not seconds:
+            return
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def stats(self):
+        now = time.monotonic()
+        self._refill(now)
+        queued = {}
+        for rank, _, _, future in self._waiters:
+            if not future.done():
+                queued[rank] = queued.get(rank, 0) + 1
+        names = {rank: name for name, rank in self._ranks.items()}
+        return {
+            "enabled": self.enabled,
+            "rpm_limit": self.rpm,
+            "tpm_limit": self.tpm,
+            "available_requests": round(self._requests.level, 1) if self._requests else None,
+            "available_tokens": round(self._tokens.level) if self._tokens else None,
+            "paused_seconds": round(max(self._paused_until - now, 0.0), 2),
+            "priorities": [
+                {"operation": name, "max_wait_seconds": self._max_waits[name]}
+                for name in sorted(self._ranks, key=self._ranks.get)
+            ],
+            "queue_depth": {names.get(rank, "other"): count for rank, count in sorted(queued.items())},
+            "operations": {
+                operation: dict(counter, wait_seconds_total=round(counter["wait_seconds_total"], 3),
+                                wait_seconds_max=round(counter["wait_seconds_max"], 3))
+                for operation, counter in self._stats.items()
+            },
+        }
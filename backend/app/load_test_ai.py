@@ -0,0 +1,134 @@
+"""
+AI 생성 중 CRUD 지연시간 부하 테스트
+
+가짜 OpenAI 서버와 백엔드 서버를 띄운 뒤,
+1) CRUD 요청만 보냈을 때와
+2) AI 생성 요청이 동시에 진행 중일 때
+CRUD 응답시간(p50/p99)을 비교합니다.
+
+실행 (backend 디렉토리에서):
+    python app/load_test_ai.py
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+FAKE_PORT = int(os.getenv("FAKE_OPENAI_PORT", "9100"))
+APP_PORT = int(os.getenv("LOAD_TEST_APP_PORT", "8765"))
+FAKE_DELAY = float(os.getenv("FAKE_OPENAI_DELAY", "2.0"))
+AI_REQUESTS = int(os.getenv("LOAD_TEST_AI_REQUESTS", "16"))
+CRUD_REQUESTS = int(os.getenv("LOAD_TEST_CRUD_REQUESTS", "200"))
+CRUD_CONCURRENCY = 8
+APP_URL = f"http://127.0.0.1:{APP_PORT}"
+
+CRUD_PATHS = ["/templates/", "/folders/", "/templates/tags/", "/content/"]
+AI_PATHS = ["/ai/sample-phrase/", "/ai/experience/", "/ai/hint/"]
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def wait_until_ready(url, timeout=30):
+    deadline = time.time() + timeout
+    async with httpx.AsyncClient() as http:
+        while time.time() < deadline:
+            try:
+                await http.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"서버가 응답하지 않습니다: {url}")
+
+
+async def run_crud_load(http):
+    """CRUD 요청을 보내고 각 요청의 지연시간(ms)을 반환합니다."""
+    latencies = []
+    queue = asyncio.Queue()
+    for i in range(CRUD_REQUESTS):
+        queue.put_nowait(CRUD_PATHS[i % len(CRUD_PATHS)])
+
+    async def worker():
+        while not queue.empty():
+            path = queue.get_nowait()
+            start = time.perf_counter()
+            response = await http.get(APP_URL + path)
+            latencies.append((time.perf_counter() - start) * 1000)
+            response.raise_for_status()
+
+    await asyncio.gather(*(worker() for _ in range(CRUD_CONCURRENCY)))
+    return latencies
+
+
+async def run_ai_load(http):
+    start = time.perf_counter()
+    responses = await asyncio.gather(*(
+        http.post(
+            APP_URL + AI_PATHS[i % len(AI_PATHS)],
+            json={"keyword": f"부하테스트{i}", "generation_type": "sample_phrase", "count": 10},
+            timeout=120
+        )
+        for i in range(AI_REQUESTS)
+    ))
+    elapsed = time.perf_counter() - start
+    failed = [r for r in responses if r.status_code != 200]
+    return elapsed, failed
+
+
+async def main():
+    async with httpx.AsyncClient(timeout=60) as http:
+        # 1) 기준선: CRUD만 실행
+        await run_crud_load(http)  # 워밍업
+        await http.post(APP_URL + AI_PATHS[0], json={"keyword": "워밍업", "generation_type": "sample_phrase"}, timeout=60)
+        baseline = await run_crud_load(http)
+
+        # 2) AI 생성이 진행 중일 때 CRUD 실행
+        ai_task = asyncio.create_task(run_ai_load(http))
+        await asyncio.sleep(0.2)
+        under_load = await run_crud_load(http)
+        ai_elapsed, ai_failed = await ai_task
+
+    print(f"기준선 CRUD     : p50 {percentile(baseline, 50):7.1f}ms  p99 {percentile(baseline, 99):7.1f}ms")
+    print(f"AI 진행 중 CRUD : p50 {percentile(under_load, 50):7.1f}ms  p99 {percentile(under_load, 99):7.1f}ms")
+    print(f"AI 요청 {AI_REQUESTS}개 완료: {ai_elapsed:.1f}초 (요청당 지연 {FAKE_DELAY}초), 실패 {len(ai_failed)}개")
+
+    # AI 호출이 이벤트 루프를 막으면 CRUD p99가 모델 응답시간 수준(초 단위)으로 뛴다
+    ok = not ai_failed and percentile(under_load, 99) < FAKE_DELAY * 1000 / 4
+    print("결과: 통과" if ok else "결과: 실패")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    db_dir = tempfile.mkdtemp()
+    env = dict(
+        os.environ,
+        OPENAI_API_KEY="sk-fake-load-test",
+        OPENAI_BASE_URL=f"http://127.0.0.1:{FAKE_PORT}/v1",
+        TEMPLATES_DB_PATH=os.path.join(db_dir, "load_test.db"),
+    )
+    fake_server = subprocess.Popen(
+        [sys.executable, os.path.join(APP_DIR, "fake_openai_server.py"), "--port", str(FAKE_PORT), "--delay", str(FAKE_DELAY)],
+        env=env
+    )
+    app_server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(APP_PORT), "--log-level", "warning"],
+        cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL
+    )
+    try:
+        asyncio.run(wait_until_ready(f"http://127.0.0.1:{FAKE_PORT}/stats"))
+        asyncio.run(wait_until_ready(APP_URL + "/health"))
+        exit_code = asyncio.run(main())
+    finally:
+        app_server.terminate()
+        fake_server.terminate()
+        app_server.wait()
+        fake_server.wait()
+    sys.exit(exit_code)
@@ -1,15 +1,47 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import sqlite3
 from typing import List, Optional
 from datetime import datetime
 import json
 import os
-from openai import OpenAI
+import sys
+import csv
+import io
+import asyncio
+import time
+from contextlib import contextmanager
 from dotenv import load_dotenv
 
+# app 디렉토리를 모듈 검색 경로에 추가 (python app/main.py, uvicorn main:app, uvicorn app.main:app 모두 지원)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import metrics
+from db import db_pool, PoolTimeout, like_pattern
+from read_cache import read_cache
+from search import create_search_index, search_templates, search_contents
+from template_engine import get_compiled_template
+from streaming import ndjson_line, sse_event, STREAM_MEDIA_TYPES, STREAM_HEADERS, check_stream_format, format_event
+from generation_cache import generation_cache, make_cache_key, create_cache_table
+from generation_writer import generation_writer, create_generation_runs
+from retention import retention_job
+from prompt_registry import get_prompt, active_prompt_version, generation_types, list_prompts
+from llm_gateway import LLMGateway, LLMGatewayError
+from llm_output_parser import parse_generated_text, StreamingLineParser, PARSER_VERSION
+from template_import import TemplateImport
+from template_upload import (
+    UPLOAD_ERRORS, UploadError, check_upload_options,
+    iter_request_body, iter_simple_templates, upload_imports
+)
+from tag_index import TAG_KEYS, create_tag_index, get_tag_facets, tag_filter_joins
+from variable_index import create_variable_index, index_template_variables, get_folder_variables
+from pagination import (
+    TOTAL_COUNT_HEADER, NEXT_CURSOR_HEADER, MAX_PAGE_SIZE,
+    create_row_counters, get_row_count, paginate, parse_fields
+)
+
 # 환경변수 로드
 load_dotenv()
 
@@ -18,10 +50,16 @@ openai_api_key = os.getenv("OPENAI_API_KEY")
 if not openai_api_key:
     print("Warning: OPENAI_API_KEY environment variable not set.")
     print("Please set environment variable to use AI generation features.")
-    client = None
 else:
     print(f"OpenAI API key configured: {openai_api_key[:10]}...")
-    client = OpenAI(api_key=openai_api_key)
+
+# OpenAI 호출은 모두 게이트웨이를 거침 (연결 풀, 동시성 제한, 재시도, 시간 제한, 서킷 브레이커)
+llm_gateway = LLMGateway(openai_api_key)
+client = llm_gateway.client
+
+# 일괄 생성 요청 하나가 동시에 진행할 수 있는 생성 수와 최대 항목 수
+AI_BATCH_CONCURRENCY = int(os.getenv("AI_BATCH_CONCURRENCY", "4"))
+AI_BATCH_MAX_ITEMS = int(os.getenv("AI_BATCH_MAX_ITEMS", "60"))
 
 app = FastAPI()
 
@@ -30,6 +68,54 @@ app = FastAPI()
 def health_check():
     return {"status": "ok"}
 
+# 데이터베이스 연결 풀 상태 (hit/miss, 대기 시간)
+@app.get("/db/stats")
+def get_db_stats():
+    return {**db_pool.stats(), "generation_writer": generation_writer.stats(), "read_cache": read_cache.stats()}
+
+# 템플릿/폴더/태그 읽기 캐시 비우기 (다른 프로세스가 데이터베이스를 직접 고친 경우)
+@app.delete("/cache/read")
+def clear_read_cache():
+    read_cache.clear()
+    return {"message": "Read cache cleared"}
+
+# Prometheus 형식 지표 (라우트별 요청 수/처리 시간, SQLite 쿼리 시간, OpenAI 호출 시간/토큰, 연결 풀)
+metrics.register_collector(db_pool.collect_metrics)
+metrics.register_collector(read_cache.collect_metrics)
+metrics.register_collector(llm_gateway.collect_metrics)
+
+@app.get("/metrics")
+async def get_metrics():
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+# 오래된 AI 생성 기록 보관/정리 작업 진행 상황
+@app.get("/maintenance/retention")
+def get_retention_progress():
+    return retention_job.progress()
+
+@app.post("/maintenance/retention/run")
+def run_retention_job():
+    if not retention_job.enabled:
+        raise HTTPException(status_code=400, detail="AI_RETENTION_DAYS가 0이라 정리 작업이 꺼져 있습니다.")
+    if not retention_job.start():
+        raise HTTPException(status_code=409, detail="정리 작업이 이미 실행 중입니다.")
+    return retention_job.progress()
+
+@app.on_event("startup")
+def start_retention_scheduler():
+    retention_job.start_scheduler()
+
+@app.on_event("shutdown")
+async def close_llm_gateway():
+    await llm_gateway.aclose()
+
+@app.on_event("shutdown")
+def close_db_pool():
+    # 정리 작업을 멈추고, 큐에 남은 AI 생성 결과를 먼저 저장한 뒤 연결을 닫음
+    retention_job.stop()
+    generation_writer.close()
+    db_pool.close_all()
+
 # 정적 파일 서빙 설정 (프론트엔드 빌드 파일)
 frontend_build_path = os.path.join(os.path.dirname(__file__), "..", "frontend", "build")
 
@@ -67,14 +153,26 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[TOTAL_COUNT_HEADER, NEXT_CURSOR_HEADER, "ETag"],
 )
+# 라우트별 요청 수 / 처리 시간 (CORS 포함 전체 처리 시간을 재도록 가장 바깥에 둠)
+app.add_middleware(metrics.MetricsMiddleware)
+
+# 데이터베이스 연결 (연결 풀에서 빌려오고 요청이 끝나면 반납)
+@contextmanager
+def db_connection():
+    try:
+        conn = db_pool.acquire()
+    except PoolTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    try:
+        yield conn
+    finally:
+        db_pool.release(conn)
 
-# 데이터베이스 연결
 def get_db():
-    import os
-    db_path = os.path.join(os.path.dirname(__file__), 'templates.db')
-    conn = sqlite3.connect(db_path)
-    return conn
+    with db_connection() as conn:
+        yield conn
 
 # Pydantic 모델
 class Template(BaseModel):
@@ -105,6 +203,11 @@ class FolderBatchGenerate(BaseModel):
     folder_id: int
     variables: dict
 
+class TemplateBatchGenerate(BaseModel):
+    template_id: Optional[int] = None  # template_id 또는 folder_id 중 하나
+    folder_id: Optional[int] = None
+    variable_sets: List[dict]  # 예: [{"아동이름": "민수", "날짜": "3/2"}, ...]
+
 # 콘텐츠 정보 모델
 class ContentInfo(BaseModel):
     title: str
@@ -121,16 +224,35 @@ class AIGenerationRequest(BaseModel):
     keyword: str
     generation_type: str  # "sample_phrase" 또는 "experience"
     count: int = 10  # 생성할 문장 개수
+    fresh: bool = False  # True면 캐시를 건너뛰고 새로 생성
 
 class AIGenerationResponse(BaseModel):
     keyword: str
     generation_type: str
     generated_sentences: List[str]
     created_at: str
+    cached: bool = False
+
+class AIBatchGenerationRequest(BaseModel):
+    keywords: List[str]
+    generation_types: List[str] = ["sample_phrase"]  # "sample_phrase", "experience", "hint"
+    count: int = 10
+    fresh: bool = False
+
+# 태그 JSON 직렬화 (태그 색인의 키/값이 한글 그대로 들어가도록 유니코드 그대로 저장)
+def dump_tags(tags):
+    return json.dumps(tags, ensure_ascii=False)
 
 # 데이터베이스 초기화
 def init_db():
-    conn = get_db()
+    with db_pool.connection() as conn:
+        # 새 데이터베이스는 지운 페이지를 조금씩 돌려줄 수 있도록 incremental auto_vacuum으로 생성
+        if conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0] == 0:
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")  # WAL 모드로 이미 헤더가 써졌으므로 빈 파일을 다시 만들어 적용
+        _create_tables(conn)
+
+def _create_tables(conn):
     c = conn.cursor()
     c.execute('''
         CREATE TABLE IF NOT EXISTS folders (
@@ -197,8 +319,40 @@ def init_db():
         # 컬럼이 이미 존재하는 경우 무시
         pass
     
+    # \uXXXX 로 이스케이프되어 저장된 예전 태그를 유니코드 형식으로 변환
+    c.execute("SELECT id, tags FROM templates WHERE instr(tags, ?) > 0", ("\\u",))
+    for template_id, tags in c.fetchall():
+        try:
+            c.execute("UPDATE templates SET tags = ? WHERE id = ?", (dump_tags(json.loads(tags)), template_id))
+        except (json.JSONDecodeError, TypeError):
+            pass
+    
+    # 태그 목록/필터용 태그 색인 (예전 json_extract 식 인덱스는 더 이상 쓰지 않으므로 지움)
+    create_tag_index(c)
+    for index in ("idx_templates_tag_purpose", "idx_templates_tag_session", "idx_templates_tag_child_type"):
+        c.execute(f"DROP INDEX IF EXISTS {index}")
+    
+    # 카테고리 검색용 인덱스
+    c.execute("CREATE INDEX IF NOT EXISTS idx_content_info_category ON content_info (category, created_at)")
+    
+    # 목록 페이지네이션용 (created_at, id) 인덱스와 행 개수 카운터
+    c.execute("CREATE INDEX IF NOT EXISTS idx_templates_created ON templates (created_at, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_content_info_created ON content_info (created_at, id)")
+    
+    # AI 생성 기록 (요청 단위 generation_runs + 문장 단위 ai_generations) 및 히스토리 인덱스
+    create_generation_runs(c)
+    create_row_counters(c, ["templates", "content_info", "generation_runs", "ai_generations"])
+    
+    # 전문 검색 색인 (FTS5) 및 동기화 트리거
+    create_search_index(c)
+    
+    # 폴더별 공통 변수 계산용 템플릿 변수 색인
+    create_variable_index(c)
+    
+    # AI 생성 결과 캐시 저장소
+    create_cache_table(c)
+    
     conn.commit()
-    conn.close()
 
 # 데이터베이스 초기화 실행
 init_db()
@@ -214,21 +368,20 @@ def safe_json_loads(json_str, default=None):
 
 # 템플릿 관련 API 엔드포인트들
 @app.post("/templates/")
-async def create_template(template: Template):
-    conn = get_db()
+async def create_template(template: Template, conn: sqlite3.Connection = Depends(get_db)):
     c = conn.cursor()
     try:
         c.execute(
             "INSERT INTO templates (name, description, fixed_content, variables, tags, folder_id) VALUES (?, ?, ?, ?, ?, ?)",
-            (template.name, template.description, template.fixed_content, json.dumps(template.variables), json.dumps(template.tags), template.folder_id)
+            (template.name, template.description, template.fixed_content, json.dumps(template.variables), dump_tags(template.tags), template.folder_id)
         )
-        conn.commit()
         template_id = c.lastrowid
+        index_template_variables(c, template_id, template.fixed_content)
+        conn.commit()
+        read_cache.invalidate("templates", "tags")
         return {"id": template_id, **template.dict()}
     except sqlite3.IntegrityError:
         raise HTTPException(status_code=400, detail="Template name already exists")
-    finally:
-        conn.close()
 
 # 일괄 템플릿 임포트 API
 class BulkTemplateImport(BaseModel):
@@ -239,181 +392,96 @@ class SimpleBulkImport(BaseModel):
     text: str  # CSV 형식 또는 간단한 형식
     format: str = "csv"  # "csv" 또는 "simple"
 
+# 쓰기 잠금을 잡고 오래 걸릴 수 있으므로 일반 def (스레드풀에서 실행, 이벤트 루프를 막지 않음)
 @app.post("/templates/bulk-import/")
-async def bulk_import_templates(bulk_import: BulkTemplateImport):
-    """여러 템플릿을 한 번에 추가합니다."""
-    conn = get_db()
-    c = conn.cursor()
-    
-    success_count = 0
-    skip_count = 0
-    error_count = 0
-    errors = []
-    
+def bulk_import_templates(bulk_import: BulkTemplateImport, conn: sqlite3.Connection = Depends(get_db)):
+    """여러 템플릿을 한 번에 추가합니다. (묶음 단위 executemany, 트랜잭션 하나)"""
+    importer = TemplateImport(conn, skip_duplicates=bulk_import.skip_duplicates)
     for template in bulk_import.templates:
-        try:
-            c.execute(
-                "INSERT INTO templates (name, description, fixed_content, variables, tags, folder_id) VALUES (?, ?, ?, ?, ?, ?)",
-                (template.name, template.description, template.fixed_content, json.dumps(template.variables), json.dumps(template.tags), template.folder_id)
-            )
-            success_count += 1
-        except sqlite3.IntegrityError:
-            if bulk_import.skip_duplicates:
-                skip_count += 1
-            else:
-                error_count += 1
-                errors.append(f"템플릿 '{template.name}' 이미 존재함")
-        except Exception as e:
-            error_count += 1
-            errors.append(f"템플릿 '{template.name}' 추가 실패: {str(e)}")
-    
-    conn.commit()
-    conn.close()
+        importer.add(template.name, template.description, template.fixed_content,
+                     json.dumps(template.variables), dump_tags(template.tags), template.folder_id)
+    result = importer.finish()
+    if result["success_count"]:
+        read_cache.invalidate("templates", "tags")
     
-    return {
-        "success_count": success_count,
-        "skip_count": skip_count,
-        "error_count": error_count,
-        "errors": errors,
-        "total": len(bulk_import.templates)
-    }
+    # success_count / skip_count / error_count / errors / total + elapsed_seconds / templates_per_second
+    return result
 
 @app.post("/templates/simple-import/")
-async def simple_bulk_import(simple_import: SimpleBulkImport):
-    """간단한 형식으로 템플릿 일괄 추가 (Excel 복사/붙여넣기)"""
-    import re
-    
+def simple_bulk_import(simple_import: SimpleBulkImport, conn: sqlite3.Connection = Depends(get_db)):
+    """간단한 형식으로 템플릿 일괄 추가 (Excel 복사/붙여넣기). 큰 파일은 /templates/import/upload 사용"""
     # 원본 텍스트를 그대로 보존 (줄바꿈, 탭, 공백 모두 유지)
     lines = simple_import.text.split('\n')
     
-    # 첫 번째 줄이 헤더인지 확인
-    if len(lines) > 0 and lines[0].strip().startswith('이름') or (lines[0].strip().startswith('템플릿')):
-        lines = lines[1:]  # 헤더 제거
-    
-    conn = get_db()
-    c = conn.cursor()
+    # 예전처럼 건너뛴 중복도 errors 에 "이미 존재함" 메시지로 남김
+    importer = TemplateImport(conn, report_skipped=True)
+    for name, description, content, tags in iter_simple_templates(lines):
+        importer.add(name, description, content, "{}", dump_tags(tags))
+    result = importer.finish()
+    if result["success_count"]:
+        read_cache.invalidate("templates", "tags")
     
-    success_count = 0
-    skip_count = 0
-    error_count = 0
-    errors = []
+    # total 은 예전처럼 헤더를 뺀 줄 수
+    has_header = lines[0].strip().startswith(('이름', '템플릿'))
+    return {**result, "total": len(lines) - has_header}
+
+# 파일 업로드로 템플릿 가져오기 (CSV / TSV / 간단한 형식, 요청 본문을 받는 대로 파싱해서 묶음마다 커밋)
+# 예: curl -F file=@templates.csv "http://localhost:8000/templates/import/upload?format=csv"
+@app.post("/templates/import/upload")
+async def upload_import_templates(
+    request: Request,
+    format: str = "csv",
+    skip_duplicates: bool = True,
+    encoding: str = "utf-8-sig",
+    import_id: Optional[str] = None,
+):
+    try:
+        check_upload_options(format, encoding, import_id)
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    content_length = request.headers.get("content-length")
+    job = upload_imports.start(import_id, format, skip_duplicates, encoding,
+                               int(content_length) if content_length and content_length.isdigit() else None)
+    if job is None:
+        raise HTTPException(status_code=409, detail="같은 import_id의 가져오기가 진행 중입니다.")
     
-    # 현재 템플릿 변수
-    current_name = ""
-    current_description = ""
-    current_content = ""
-    current_tags = {}
+    def on_commit(importer):
+        # 묶음마다 커밋되므로 가져오는 도중에도 목록에 보이게 함
+        read_cache.invalidate("templates", "tags")
     
-    for line in lines:
-        # 공백 줄도 원본 유지 (줄바꿈 2개로 문단 구분)
-        is_blank_line = not line.strip()
-            
-        try:
-            # 탭 또는 | 로 구분된 데이터 파싱 (원본 줄 사용)
-            parts = re.split(r'\t+|\s*\|\s*', line)
-            
-            # 첫 번째 컬럼이 템플릿 이름이고, 3개 이상 컬럼이 있으면 새 템플릿
-            if len(parts) >= 3:
-                # 이전 템플릿 저장 (있으면)
-                if current_name and current_content:
-                    tags = {
-                        "용도": current_tags.get("용도", ""),
-                        "회기": current_tags.get("회기", ""),
-                        "아동유형": current_tags.get("아동유형", "")
-                    }
-                    
-                    try:
-                        c.execute(
-                            "INSERT INTO templates (name, description, fixed_content, variables, tags, folder_id) VALUES (?, ?, ?, ?, ?, ?)",
-                            (current_name, current_description, current_content, "{}", json.dumps(tags), None)
-                        )
-                        success_count += 1
-                    except sqlite3.IntegrityError:
-                        skip_count += 1
-                        errors.append(f"템플릿 '{current_name}' 이미 존재함")
-                
-                # 새 템플릿 시작
-                current_name = parts[0].strip()
-                current_description = parts[1].strip() if len(parts) > 1 else ""
-                # 내용에서 따옴표 이스케이프 처리 (Excel에서 복사할 때 "" -> " 로 변환)
-                content_raw = parts[2].strip() if len(parts) > 2 else ""
-                # Excel에서 복사할 때 ""가 되므로 "로 변환
-                current_content = content_raw.replace('""', '"')
-                # 시작과 끝의 따옴표 제거 (Excel이 전체를 감싸는 따옴표)
-                if len(current_content) >= 2 and current_content.startswith('"'):
-                    current_content = current_content[1:]
-                if len(current_content) >= 1 and current_content.endswith('"'):
-                    current_content = current_content[:-1]
-                
-                if len(parts) > 3:
-                    current_tags = {
-                        "용도": parts[3].strip() if len(parts) > 3 else "",
-                        "회기": parts[4].strip() if len(parts) > 4 else "",
-                        "아동유형": parts[5].strip() if len(parts) > 5 else ""
-                    }
-                else:
-                    current_tags = {}
-            
-            # 첫 번째 컬럼이 비어있거나 구분자가 없으면 내용 추가
-            elif current_name and current_content:
-                # 현재 템플릿의 내용에 이 줄 추가 (Excel의 "" -> " 변환, 들여쓰기 유지)
-                # 공백 줄도 그대로 추가 (문단 구분용)
-                line_processed = line.replace('""', '"')
-                current_content += "\n" + line_processed
-            
-            # 컬럼이 너무 적으면 스킵
-            else:
-                continue
-                
-        except Exception as e:
-            error_count += 1
-            errors.append(f"파싱 실패: {str(e)}")
+    def run():
+        with db_connection() as conn:
+            return job.run(conn, iter_request_body(request.stream()), request.headers.get("content-type"),
+                           dump_tags, on_commit)
     
-    # 마지막 템플릿 저장
-    if current_name and current_content:
-        # 끝의 따옴표가 줄바꿈 바로 뒤에 있는 경우 제거
-        current_content = current_content.rstrip()
-        if current_content.endswith('"'):
-            current_content = current_content[:-1].rstrip()
-        
-        tags = {
-            "용도": current_tags.get("용도", ""),
-            "회기": current_tags.get("회기", ""),
-            "아동유형": current_tags.get("아동유형", "")
-        }
-        
-        try:
-            c.execute(
-                "INSERT INTO templates (name, description, fixed_content, variables, tags, folder_id) VALUES (?, ?, ?, ?, ?, ?)",
-                (current_name, current_description, current_content, "{}", json.dumps(tags), None)
-            )
-            success_count += 1
-        except sqlite3.IntegrityError:
-            skip_count += 1
-            errors.append(f"템플릿 '{current_name}' 이미 존재함")
-        except Exception as e:
-            error_count += 1
-            errors.append(f"템플릿 '{current_name}' 추가 실패: {str(e)}")
-    
-    conn.commit()
-    conn.close()
-    
-    return {
-        "success_count": success_count,
-        "skip_count": skip_count,
-        "error_count": error_count,
-        "errors": errors,
-        "total": len(lines)
-    }
+    try:
+        return await run_in_threadpool(run)
+    except UPLOAD_ERRORS:
+        return JSONResponse(status_code=400, content=job.progress())
+
+# 업로드 가져오기 진행 상황 (진행 중 + 최근에 끝난 것)
+@app.get("/templates/import/")
+def list_upload_imports():
+    return {"imports": upload_imports.list()}
+
+@app.get("/templates/import/{import_id}")
+def get_upload_import(import_id: str):
+    progress = upload_imports.get(import_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="가져오기를 찾을 수 없습니다.")
+    return progress
 
 # 폴더 관련 API
+# 읽기 캐시를 쓰는 목록 API는 캐시 미스 때 연결 풀을 기다리고 DB를 읽으므로 일반 def (스레드풀에서 실행)
 @app.get("/folders/")
-async def get_folders():
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("SELECT * FROM folders ORDER BY created_at ASC")
-    folders = c.fetchall()
-    conn.close()
+def get_folders(request: Request):
+    return read_cache.conditional(request, "folders", ["folders"], load_folders)
+
+def load_folders():
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT * FROM folders ORDER BY created_at ASC")
+        folders = c.fetchall()
     return [
         {
             "id": folder[0],
@@ -423,11 +491,10 @@ async def get_folders():
             "created_at": folder[4]
         }
         for folder in folders
-    ]
+    ], None
 
 @app.post("/folders/")
-async def create_folder(folder: Folder):
-    conn = get_db()
+async def create_folder(folder: Folder, conn: sqlite3.Connection = Depends(get_db)):
     c = conn.cursor()
     try:
         c.execute(
@@ -435,16 +502,14 @@ async def create_folder(folder: Folder):
             (folder.name, folder.description, folder.color)
         )
         conn.commit()
+        read_cache.invalidate("folders")
         folder_id = c.lastrowid
         return {"id": folder_id, **folder.dict()}
     except sqlite3.IntegrityError:
         raise HTTPException(status_code=400, detail="Folder name already exists")
-    finally:
-        conn.close()
 
 @app.put("/folders/{folder_id}")
-async def update_folder(folder_id: int, folder: Folder):
-    conn = get_db()
+async def update_folder(folder_id: int, folder: Folder, conn: sqlite3.Connection = Depends(get_db)):
     c = conn.cursor()
     try:
         c.execute(
@@ -452,61 +517,91 @@ async def update_folder(folder_id: int, folder: Folder):
             (folder.name, folder.description, folder.color, folder_id)
         )
         conn.commit()
+        read_cache.invalidate("folders")
         return {"id": folder_id, **folder.dict()}
     except sqlite3.IntegrityError:
         raise HTTPException(status_code=400, detail="Folder name already exists")
-    finally:
-        conn.close()
 
 @app.delete("/folders/{folder_id}")
-async def delete_folder(folder_id: int):
-    conn = get_db()
+async def delete_folder(folder_id: int, conn: sqlite3.Connection = Depends(get_db)):
     c = conn.cursor()
-    try:
-        # 기본 폴더로 이동
-        c.execute("UPDATE templates SET folder_id = 1 WHERE folder_id = ?", (folder_id,))
-        c.execute("DELETE FROM folders WHERE id = ?", (folder_id,))
-        conn.commit()
-        return {"message": "Folder deleted successfully"}
-    finally:
-        conn.close()
+    # 기본 폴더로 이동
+    c.execute("UPDATE templates SET folder_id = 1 WHERE folder_id = ?", (folder_id,))
+    c.execute("DELETE FROM folders WHERE id = ?", (folder_id,))
+    conn.commit()
+    read_cache.invalidate("folders", "templates")
+    return {"message": "Folder deleted successfully"}
+
+# 목록 API에서 fields= 로 고를 수 있는 필드와 SQL 식
+TEMPLATE_LIST_FIELDS = {
+    "id": "t.id",
+    "name": "t.name",
+    "description": "t.description",
+    "fixed_content": "t.fixed_content",
+    "variables": "t.variables",
+    "tags": "t.tags",
+    "folder_id": "t.folder_id",
+    "folder_name": "f.name",
+    "folder_color": "f.color",
+    "created_at": "t.created_at",
+    "updated_at": "t.updated_at",
+}
+
+CONTENT_LIST_FIELDS = {
+    "id": "id",
+    "title": "title",
+    "content": "content",
+    "category": "category",
+    "created_at": "created_at",
+    "updated_at": "updated_at",
+}
+
+# 폴더 이름/색을 고른 목록만 폴더 수정에 따라 바뀜
+TEMPLATE_FOLDER_FIELDS = {"folder_name", "folder_color"}
 
 @app.get("/templates/")
-async def get_templates():
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("""
-        SELECT t.*, f.name as folder_name, f.color as folder_color 
-        FROM templates t 
-        LEFT JOIN folders f ON t.folder_id = f.id 
-        ORDER BY t.created_at DESC
-    """)
-    templates = c.fetchall()
-    conn.close()
-    return [
-        {
-            "id": template[0],
-            "name": template[1],
-            "description": template[2],
-            "fixed_content": template[3],
-            "variables": safe_json_loads(template[4]),
-            "tags": safe_json_loads(template[5]),
-            "folder_id": template[6],
-            "folder_name": template[8],
-            "folder_color": template[9],
-            "created_at": template[7],
-            "updated_at": template[8] if len(template) > 8 else None
-        }
-        for template in templates
-    ]
+def get_templates(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    selected = parse_fields(fields, TEMPLATE_LIST_FIELDS)
+    scopes = ["templates", "folders"] if TEMPLATE_FOLDER_FIELDS.intersection(selected) else ["templates"]
+    return read_cache.conditional(
+        request, ("templates", limit, cursor, tuple(selected)), scopes,
+        lambda: load_templates_page(selected, cursor, limit)
+    )
+
+def load_templates_page(selected, cursor, limit):
+    with db_connection() as conn:
+        templates, next_cursor = paginate(
+            conn,
+            "SELECT {columns} FROM templates t LEFT JOIN folders f ON t.folder_id = f.id {where}",
+            [(name, TEMPLATE_LIST_FIELDS[name]) for name in selected],
+            [], cursor, limit, "t.created_at", "t.id"
+        )
+        headers = {TOTAL_COUNT_HEADER: str(get_row_count(conn, "templates"))}
+    for template in templates:
+        if "variables" in template:
+            template["variables"] = safe_json_loads(template["variables"])
+        if "tags" in template:
+            template["tags"] = safe_json_loads(template["tags"])
+    if next_cursor:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    return templates, headers
 
 @app.get("/templates/{template_id}")
-async def get_template(template_id: int):
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("SELECT * FROM templates WHERE id = ?", (template_id,))
-    template = c.fetchone()
-    conn.close()
+def get_template(template_id: int):
+    return read_cache.get_or_build(
+        ("template", template_id), [f"template:{template_id}"], lambda: load_template(template_id)
+    ).response()
+
+def load_template(template_id):
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT * FROM templates WHERE id = ?", (template_id,))
+        template = c.fetchone()
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
     return {
@@ -518,40 +613,44 @@ async def get_template(template_id: int):
         "tags": safe_json_loads(template[5]),
         "created_at": template[6],
         "updated_at": template[7]
-    }
+    }, None
 
 @app.put("/templates/{template_id}")
-async def update_template(template_id: int, template: TemplateUpdate):
-    conn = get_db()
+async def update_template(template_id: int, template: TemplateUpdate, conn: sqlite3.Connection = Depends(get_db)):
     c = conn.cursor()
+    # 태그가 실제로 바뀐 경우에만 태그 목록 캐시를 버림
+    old_tags = c.execute("SELECT tags FROM templates WHERE id = ?", (template_id,)).fetchone()
     c.execute(
         "UPDATE templates SET name = ?, description = ?, fixed_content = ?, variables = ?, tags = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
-        (template.name, template.description, template.fixed_content, json.dumps(template.variables), json.dumps(template.tags), template_id)
+        (template.name, template.description, template.fixed_content, json.dumps(template.variables), dump_tags(template.tags), template_id)
     )
+    if c.rowcount:
+        index_template_variables(c, template_id, template.fixed_content)
     conn.commit()
-    conn.close()
+    if old_tags is not None:
+        tags_changed = safe_json_loads(old_tags[0]) != template.tags
+        read_cache.invalidate("templates", f"template:{template_id}", *(["tags"] if tags_changed else []))
     return {"id": template_id, **template.model_dump()}
 
 @app.put("/templates/{template_id}/move")
-async def move_template_to_folder(template_id: int, request: dict):
+async def move_template_to_folder(template_id: int, request: dict, conn: sqlite3.Connection = Depends(get_db)):
     folder_id = request.get("folder_id")
     if folder_id is None:
         raise HTTPException(status_code=400, detail="folder_id is required")
     
-    conn = get_db()
     c = conn.cursor()
     c.execute("UPDATE templates SET folder_id = ? WHERE id = ?", (folder_id, template_id))
     conn.commit()
-    conn.close()
+    read_cache.invalidate("templates")
     return {"message": "Template moved successfully"}
 
 @app.delete("/templates/{template_id}")
-async def delete_template(template_id: int):
-    conn = get_db()
+async def delete_template(template_id: int, conn: sqlite3.Connection = Depends(get_db)):
     c = conn.cursor()
     c.execute("DELETE FROM templates WHERE id = ?", (template_id,))
     conn.commit()
-    conn.close()
+    if c.rowcount:
+        read_cache.invalidate("templates", f"template:{template_id}", "tags")
     return {"result": "success"}
 
 # 태그로 필터링하는 API
@@ -560,42 +659,28 @@ async def filter_templates(
     용도: Optional[str] = None,
     회기: Optional[str] = None,
     아동유형: Optional[str] = None,
-    검색어: Optional[str] = None
+    검색어: Optional[str] = None,
+    conn: sqlite3.Connection = Depends(get_db)
 ):
-    conn = get_db()
     c = conn.cursor()
     
-    # 모든 템플릿 가져오기
-    c.execute("SELECT * FROM templates ORDER BY created_at DESC")
-    all_templates = c.fetchall()
-    conn.close()
+    # 태그 필터는 태그 색인과 조인 (일치하는 행만 가져옴)
+    tag_filters = {key: value for key, value in zip(TAG_KEYS, (용도, 회기, 아동유형)) if value}
+    joins, params = tag_filter_joins(tag_filters)
     
-    # Python에서 필터링
-    templates = []
-    for template in all_templates:
-        tags = safe_json_loads(template[5])
-        name = template[1]  # 템플릿 이름
-        description = template[2]  # 템플릿 설명
-        
-        # 필터 조건 확인
-        match = True
-        
-        # 태그 필터링
-        if 용도 and tags.get('용도') != 용도:
-            match = False
-        if 회기 and tags.get('회기') != 회기:
-            match = False
-        if 아동유형 and tags.get('아동유형') != 아동유형:
-            match = False
-            
-        # 검색어 필터링 (이름 또는 설명에 포함)
-        if 검색어:
-            search_term = 검색어.lower()
-            if not (search_term in name.lower() or search_term in description.lower()):
-                match = False
-            
-        if match:
-            templates.append(template)
+    # 검색어 필터링 (이름 또는 설명에 포함)
+    conditions = []
+    if 검색어:
+        conditions.append("(t.name LIKE ? ESCAPE '\\' OR t.description LIKE ? ESCAPE '\\')")
+        params.extend([like_pattern(검색어)] * 2)
+    
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    c.execute(f"""
+        SELECT t.id, t.name, t.description, t.fixed_content, t.variables, t.tags, t.created_at, t.updated_at
+        FROM templates t {joins} {where}
+        ORDER BY t.created_at DESC
+    """, params)
+    templates = c.fetchall()
     
     return [
         {
@@ -611,164 +696,158 @@ async def filter_templates(
         for template in templates
     ]
 
-# 사용 가능한 태그 값들을 가져오는 API
+# 사용 가능한 태그 값들을 가져오는 API (많이 쓰는 값부터)
+# with_counts=true 이면 값마다 템플릿 수를 같이 돌려줌: {"용도": [{"value": "체크인", "count": 3}, ...]}
 @app.get("/templates/tags/")
-async def get_available_tags():
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("SELECT tags FROM templates WHERE tags IS NOT NULL AND tags != '{}'")
-    templates = c.fetchall()
-    conn.close()
-    
-    # 모든 태그 수집
-    all_tags = {"용도": set(), "회기": set(), "아동유형": set()}
-    
-    for template in templates:
-        tags = safe_json_loads(template[0])
-        for key, value in tags.items():
-            if key in all_tags:
-                all_tags[key].add(value)
-    
-    # set을 list로 변환
-    return {key: list(values) for key, values in all_tags.items()}
+def get_available_tags(request: Request, with_counts: bool = False):
+    return read_cache.conditional(
+        request, ("tags", with_counts), ["tags"], lambda: load_available_tags(with_counts)
+    )
+
+def load_available_tags(with_counts):
+    with db_connection() as conn:
+        facets = get_tag_facets(conn, TAG_KEYS)
+    if with_counts:
+        return {key: [{"value": value, "count": count} for value, count in values] for key, values in facets.items()}, None
+    return {key: [value for value, _ in values] for key, values in facets.items()}, None
 
 @app.post("/templates/generate/")
-async def generate_from_template(data: TemplateGenerate):
-    conn = get_db()
+async def generate_from_template(data: TemplateGenerate, conn: sqlite3.Connection = Depends(get_db)):
     c = conn.cursor()
-    c.execute("SELECT * FROM templates WHERE id = ?", (data.template_id,))
+    c.execute("SELECT id, name, fixed_content, updated_at FROM templates WHERE id = ?", (data.template_id,))
     template = c.fetchone()
-    conn.close()
     
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
     
-    # 템플릿의 고정 내용
-    fixed_content = template[3]
-    
-    # {{{변수명}}} 형태의 변수들을 자동으로 추출
-    import re
-    variable_pattern = r'\{\{\{([^}]+)\}\}\}'
-    found_variables = re.findall(variable_pattern, fixed_content)
-    
-    # 변수 치환 ({{{변수명}}} 형태)
-    final_prompt = fixed_content
-    for key, value in data.variables.items():
-        final_prompt = final_prompt.replace("{{{" + key + "}}}", str(value))
+    # 컴파일된 템플릿으로 {{{변수명}}} 치환 (한 번의 join)
+    compiled = get_compiled_template(template[0], template[3], template[2])
+    final_prompt = compiled.render(data.variables)
     
     return {
         "template_id": data.template_id,
         "template_name": template[1],
         "final_prompt": final_prompt,
         "variables_used": data.variables,
-        "found_variables": found_variables
+        "found_variables": compiled.variables
     }
 
-# 폴더별 공통 변수 추출 API
-@app.get("/folders/{folder_id}/common-variables/")
-async def get_folder_common_variables(folder_id: int):
-    conn = get_db()
-    c = conn.cursor()
+# 여러 변수 묶음으로 일괄 생성 API (아동별로 같은 템플릿을 렌더링할 때)
+BATCH_OUTPUT_FORMATS = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+BATCH_CSV_COLUMNS = ["set_index", "template_id", "template_name", "final_prompt"]
+
+def iter_batch_results(templates, variable_sets):
+    # 변수 묶음(아동) 순서대로, 각 묶음마다 모든 템플릿을 렌더링
+    for set_index, variables in enumerate(variable_sets):
+        for template in templates:
+            yield {"set_index": set_index, **render_template_result(template, variables)}
+
+def iter_batch_csv(results):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")  # Excel에서 한글이 깨지지 않도록 BOM 추가
+    writer.writerow(BATCH_CSV_COLUMNS)
+    for result in results:
+        writer.writerow([result[column] for column in BATCH_CSV_COLUMNS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+@app.post("/templates/batch-generate/")
+async def batch_generate_variable_sets(
+    data: TemplateBatchGenerate,
+    format: str = "json",
+    conn: sqlite3.Connection = Depends(get_db)
+):
+    if (data.template_id is None) == (data.folder_id is None):
+        raise HTTPException(status_code=400, detail="template_id 또는 folder_id 중 하나만 지정해주세요.")
+    if not data.variable_sets:
+        raise HTTPException(status_code=400, detail="variable_sets가 비어 있습니다.")
+    if format not in BATCH_OUTPUT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"지원하지 않는 형식: {format} (json, ndjson, csv)")
     
-    # 폴더 내 모든 템플릿 가져오기
-    c.execute("SELECT id, name, fixed_content FROM templates WHERE folder_id = ?", (folder_id,))
+    # 템플릿은 한 번만 읽고, 컴파일 결과는 캐시에서 재사용
+    c = conn.cursor()
+    if data.template_id is not None:
+        c.execute("SELECT id, name, fixed_content, updated_at FROM templates WHERE id = ?", (data.template_id,))
+    else:
+        c.execute("SELECT id, name, fixed_content, updated_at FROM templates WHERE folder_id = ? ORDER BY id", (data.folder_id,))
     templates = c.fetchall()
-    conn.close()
+    if not templates:
+        raise HTTPException(status_code=404, detail="Template not found")
+    
+    results = iter_batch_results(templates, data.variable_sets)
+    if format == "ndjson":
+        return StreamingResponse((ndjson_line(result) for result in results), media_type=BATCH_OUTPUT_FORMATS[format])
+    if format == "csv":
+        return StreamingResponse(
+            iter_batch_csv(results),
+            media_type=BATCH_OUTPUT_FORMATS[format],
+            headers={"Content-Disposition": 'attachment; filename="batch-generate.csv"'}
+        )
+    
+    results = list(results)
+    return {
+        "template_id": data.template_id,
+        "folder_id": data.folder_id,
+        "set_count": len(data.variable_sets),
+        "generated_count": len(results),
+        "results": results
+    }
+
+# 폴더별 공통 변수 추출 API
+@app.get("/folders/{folder_id}/common-variables/")
+async def get_folder_common_variables(folder_id: int, conn: sqlite3.Connection = Depends(get_db)):
+    # 템플릿 변수 색인에서 폴더 단위로 집계
+    variables, templates = get_folder_variables(conn, folder_id)
     
     if not templates:
         return {"common_variables": [], "template_count": 0, "templates": []}
     
-    # 모든 템플릿에서 변수 추출
-    import re
-    variable_pattern = r'\{\{\{([^}]+)\}\}\}'
-    all_variables = set()
-    template_variables = {}
-    
-    for template in templates:
-        template_id, name, content = template
-        variables = re.findall(variable_pattern, content)
-        template_variables[template_id] = {
+    common_variables = []
+    for name, count, template_name in variables:
+        variable = {
             "name": name,
-            "variables": variables
+            "usage_count": count,
+            "usage_percentage": round((count / len(templates)) * 100, 1)
         }
-        all_variables.update(variables)
-    
-    # 모든 변수 찾기 (폴더 내 모든 템플릿의 변수들)
-    common_variables = []
-    for var in all_variables:
-        # 이 변수를 사용하는 템플릿들 찾기
-        using_templates = [tv for tv in template_variables.values() if var in tv["variables"]]
-        count = len(using_templates)
-        
         # 1개 템플릿에서만 사용되는 경우 템플릿 이름 포함
         if count == 1:
-            template_name = using_templates[0]["name"]
-            common_variables.append({
-                "name": var,
-                "usage_count": count,
-                "usage_percentage": round((count / len(templates)) * 100, 1),
-                "template_name": template_name
-            })
-        else:
-            # 2개 이상 템플릿에서 사용되는 경우
-            common_variables.append({
-                "name": var,
-                "usage_count": count,
-                "usage_percentage": round((count / len(templates)) * 100, 1)
-            })
-    
-    # 사용 빈도순으로 정렬
-    common_variables.sort(key=lambda x: x["usage_count"], reverse=True)
+            variable["template_name"] = template_name
+        common_variables.append(variable)
     
     return {
         "common_variables": common_variables,
-        "all_variables": list(all_variables),
+        "all_variables": [name for name, _, _ in variables],
         "template_count": len(templates),
         "templates": [
             {
-                "id": tid,
-                "name": data["name"],
-                "variables": data["variables"]
+                "id": template_id,
+                "name": template_name,
+                "variables": template_variables
             }
-            for tid, data in template_variables.items()
+            for template_id, template_name, template_variables in templates
         ]
     }
 
 # 폴더별 일괄 생성 API
 @app.post("/folders/{folder_id}/batch-generate/")
-async def batch_generate_from_folder(folder_id: int, data: FolderBatchGenerate):
-    conn = get_db()
+async def batch_generate_from_folder(folder_id: int, data: FolderBatchGenerate, conn: sqlite3.Connection = Depends(get_db)):
     c = conn.cursor()
     
     # 폴더 내 모든 템플릿 가져오기
-    c.execute("SELECT id, name, fixed_content FROM templates WHERE folder_id = ?", (folder_id,))
+    c.execute("SELECT id, name, fixed_content, updated_at FROM templates WHERE folder_id = ?", (folder_id,))
     templates = c.fetchall()
-    conn.close()
     
     if not templates:
         raise HTTPException(status_code=404, detail="No templates found in this folder")
     
     # 각 템플릿에 대해 프롬프트 생성
-    import re
-    variable_pattern = r'\{\{\{([^}]+)\}\}\}'
-    results = []
-    
-    for template in templates:
-        template_id, name, content = template
-        found_variables = re.findall(variable_pattern, content)
-        
-        # 변수 치환
-        final_prompt = content
-        for key, value in data.variables.items():
-            final_prompt = final_prompt.replace("{{{" + key + "}}}", str(value))
-        
-        results.append({
-            "template_id": template_id,
-            "template_name": name,
-            "final_prompt": final_prompt,
-            "variables_used": {k: v for k, v in data.variables.items() if k in found_variables},
-            "found_variables": found_variables
-        })
+    results = [render_template_result(template, data.variables) for template in templates]
     
     return {
         "folder_id": folder_id,
@@ -776,10 +855,52 @@ async def batch_generate_from_folder(folder_id: int, data: FolderBatchGenerate):
         "results": results
     }
 
+# 템플릿 한 개를 렌더링한 결과 (template: id, name, fixed_content, updated_at)
+def render_template_result(template, variables):
+    template_id, name, content, updated_at = template
+    compiled = get_compiled_template(template_id, updated_at, content)
+    found_variables = compiled.variables
+    found_set = set(found_variables)
+    return {
+        "template_id": template_id,
+        "template_name": name,
+        "final_prompt": compiled.render(variables),
+        "variables_used": {k: v for k, v in variables.items() if k in found_set},
+        "found_variables": found_variables
+    }
+
+def iter_folder_results(folder_id, variables, stream_format):
+    """폴더의 템플릿을 커서로 한 행씩 읽어 렌더링 결과를 바로 내보냅니다. (메모리 사용량 일정)"""
+    generated_count = 0
+    with db_pool.connection() as conn:
+        c = conn.cursor()
+        try:
+            c.execute("SELECT id, name, fixed_content, updated_at FROM templates WHERE folder_id = ? ORDER BY id", (folder_id,))
+            for template in c:
+                generated_count += 1
+                yield format_event(stream_format, "result", render_template_result(template, variables))
+        finally:
+            c.close()
+    yield format_event(stream_format, "done", {"folder_id": folder_id, "generated_count": generated_count})
+
+# 폴더별 일괄 생성 스트리밍 API (format=ndjson 또는 sse)
+@app.post("/folders/{folder_id}/batch-generate/stream")
+def stream_batch_generate_from_folder(folder_id: int, data: FolderBatchGenerate, format: str = "ndjson"):
+    stream_format = check_stream_format(format)
+    with db_pool.connection() as conn:
+        exists = conn.execute("SELECT 1 FROM templates WHERE folder_id = ? LIMIT 1", (folder_id,)).fetchone()
+    if not exists:
+        raise HTTPException(status_code=404, detail="No templates found in this folder")
+    
+    return StreamingResponse(
+        iter_folder_results(folder_id, data.variables, stream_format),
+        media_type=STREAM_MEDIA_TYPES[stream_format],
+        headers=STREAM_HEADERS
+    )
+
 # 콘텐츠 정보 관련 API 엔드포인트들
 @app.post("/content/")
-async def create_content(content: ContentInfo):
-    conn = get_db()
+async def create_content(content: ContentInfo, conn: sqlite3.Connection = Depends(get_db)):
     c = conn.cursor()
     try:
         c.execute(
@@ -787,39 +908,43 @@ async def create_content(content: ContentInfo):
             (content.title, content.content, content.category)
         )
         conn.commit()
+        read_cache.invalidate("content")
         content_id = c.lastrowid
         return {"id": content_id, **content.model_dump()}
     except sqlite3.IntegrityError:
         raise HTTPException(status_code=400, detail="Content title already exists")
-    finally:
-        conn.close()
 
 @app.get("/content/")
-async def get_content_list():
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("SELECT * FROM content_info ORDER BY created_at DESC")
-    contents = c.fetchall()
-    conn.close()
-    return [
-        {
-            "id": content[0],
-            "title": content[1],
-            "content": content[2],
-            "category": content[3],
-            "created_at": content[4],
-            "updated_at": content[5]
-        }
-        for content in contents
-    ]
+def get_content_list(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    selected = parse_fields(fields, CONTENT_LIST_FIELDS)
+    return read_cache.conditional(
+        request, ("content", limit, cursor, tuple(selected)), ["content"],
+        lambda: load_content_page(selected, cursor, limit)
+    )
+
+def load_content_page(selected, cursor, limit):
+    with db_connection() as conn:
+        contents, next_cursor = paginate(
+            conn,
+            "SELECT {columns} FROM content_info {where}",
+            [(name, CONTENT_LIST_FIELDS[name]) for name in selected],
+            [], cursor, limit, "created_at", "id"
+        )
+        headers = {TOTAL_COUNT_HEADER: str(get_row_count(conn, "content_info"))}
+    if next_cursor:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    return contents, headers
 
 @app.get("/content/{content_id}")
-async def get_content(content_id: int):
-    conn = get_db()
+async def get_content(content_id: int, conn: sqlite3.Connection = Depends(get_db)):
     c = conn.cursor()
     c.execute("SELECT * FROM content_info WHERE id = ?", (content_id,))
     content = c.fetchone()
-    conn.close()
     if not content:
         raise HTTPException(status_code=404, detail="Content not found")
     return {
@@ -832,59 +957,46 @@ async def get_content(content_id: int):
     }
 
 @app.put("/content/{content_id}")
-async def update_content(content_id: int, content: ContentInfoUpdate):
-    conn = get_db()
+async def update_content(content_id: int, content: ContentInfoUpdate, conn: sqlite3.Connection = Depends(get_db)):
     c = conn.cursor()
     c.execute(
         "UPDATE content_info SET title = ?, content = ?, category = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
         (content.title, content.content, content.category, content_id)
     )
     conn.commit()
-    conn.close()
+    read_cache.invalidate("content")
     return {"id": content_id, **content.model_dump()}
 
 @app.delete("/content/{content_id}")
-async def delete_content(content_id: int):
-    conn = get_db()
+async def delete_content(content_id: int, conn: sqlite3.Connection = Depends(get_db)):
     c = conn.cursor()
     c.execute("DELETE FROM content_info WHERE id = ?", (content_id,))
     conn.commit()
-    conn.close()
+    read_cache.invalidate("content")
     return {"result": "success"}
 
 # 콘텐츠 검색 API
 @app.get("/content/search/")
-async def search_content(검색어: Optional[str] = None, 카테고리: Optional[str] = None):
-    conn = get_db()
+async def search_content(검색어: Optional[str] = None, 카테고리: Optional[str] = None, conn: sqlite3.Connection = Depends(get_db)):
     c = conn.cursor()
     
-    # 모든 콘텐츠 가져오기
-    c.execute("SELECT * FROM content_info ORDER BY created_at DESC")
-    all_contents = c.fetchall()
-    conn.close()
+    # 필터 조건을 SQL로 조합 (일치하는 행만 가져옴)
+    conditions = []
+    params = []
+    
+    # 검색어 필터링
+    if 검색어:
+        conditions.append("(title LIKE ? ESCAPE '\\' OR content LIKE ? ESCAPE '\\')")
+        params.extend([like_pattern(검색어)] * 2)
     
-    # Python에서 필터링
-    contents = []
-    for content in all_contents:
-        title = content[1]
-        content_text = content[2]
-        category = content[3]
-        
-        # 필터 조건 확인
-        match = True
-        
-        # 검색어 필터링
-        if 검색어:
-            search_term = 검색어.lower()
-            if not (search_term in title.lower() or search_term in content_text.lower()):
-                match = False
-                
-        # 카테고리 필터링
-        if 카테고리 and category != 카테고리:
-            match = False
-            
-        if match:
-            contents.append(content)
+    # 카테고리 필터링
+    if 카테고리:
+        conditions.append("category = ?")
+        params.append(카테고리)
+    
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    c.execute(f"SELECT * FROM content_info {where} ORDER BY created_at DESC", params)
+    contents = c.fetchall()
     
     return [
         {
@@ -898,371 +1010,414 @@ async def search_content(검색어: Optional[str] = None, 카테고리: Optional
         for content in contents
     ]
 
+# 전문 검색 API (순위 + 하이라이트)
+def require_search_query(query):
+    query = query.strip()
+    if not query:
+        raise HTTPException(status_code=400, detail="검색어를 입력하세요")
+    return query
+
+@app.get("/search/templates/")
+async def search_templates_ranked(
+    검색어: str,
+    limit: int = Query(20, ge=1, le=100),
+    conn: sqlite3.Connection = Depends(get_db)
+):
+    검색어 = require_search_query(검색어)
+    rows = search_templates(conn, 검색어, limit)
+    return [
+        {
+            "id": row[0],
+            "name": row[1],
+            "description": row[2],
+            "tags": safe_json_loads(row[3]),
+            "folder_id": row[4],
+            "created_at": row[5],
+            "name_highlight": row[6],
+            "description_snippet": row[7],
+            "score": row[8]
+        }
+        for row in rows
+    ]
+
+@app.get("/search/content/")
+async def search_content_ranked(
+    검색어: str,
+    카테고리: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    conn: sqlite3.Connection = Depends(get_db)
+):
+    검색어 = require_search_query(검색어)
+    rows = search_contents(conn, 검색어, 카테고리, limit)
+    return [
+        {
+            "id": row[0],
+            "title": row[1],
+            "category": row[2],
+            "created_at": row[3],
+            "title_highlight": row[4],
+            "content_snippet": row[5],
+            "score": row[6]
+        }
+        for row in rows
+    ]
+
 # AI 생성 관련 API 엔드포인트들
-@app.post("/ai/sample-phrase/")
-async def generate_sample_phrases(request: AIGenerationRequest):
+
+# 프롬프트는 prompt_registry에 버전별로 등록되어 있음 (현재 버전은 AI_PROMPT_VERSION_* 환경변수)
+async def generate_sentences(generation_type, request: AIGenerationRequest):
+    """OpenAI로 문장을 생성하고 파싱합니다. 반환값: (문장 목록, 생성 기록에 남길 모델/응답 시간/토큰 사용량)"""
+    prompt = get_prompt(generation_type)
+    started = time.perf_counter()
+    response = await llm_gateway.chat_completion(generation_type, **prompt.build_request(request.keyword, request.count))
+    latency_ms = round((time.perf_counter() - started) * 1000, 1)
+    
+    generated_text = response.choices[0].message.content
+    
+    # 다양한 형식의 문장 파싱
+    sentences = parse_generated_text(generation_type, generated_text)
+    
+    usage = response.usage
+    run_info = {
+        "model": response.model,
+        "prompt_version": prompt.version,
+        "latency_ms": latency_ms,
+        "prompt_tokens": usage.prompt_tokens if usage else None,
+        "completion_tokens": usage.completion_tokens if usage else None,
+        "total_tokens": usage.total_tokens if usage else None,
+    }
+    return sentences, run_info
+
+# 오류 로그에 쓰는 생성 유형 이름
+AI_GENERATION_LABELS = {
+    "sample_phrase": "Sample Phrase 생성",
+    "experience": "Experience 분석 생성",
+    "hint": "Hint 생성",
+}
+
+
+async def save_ai_generations(keyword, generation_type, sentences, **run_info):
+    # 생성 기록 한 건 + 문장들을 executemany 한 번으로 저장 (AI_WRITE_BEHIND=1이면 백그라운드에서 모아서 저장)
+    run = {
+        "keyword": keyword,
+        "generation_type": generation_type,
+        "prompt_version": active_prompt_version(generation_type),
+        "streamed": 0,
+        "sentences": sentences,
+        **run_info
+    }
+    if generation_writer.write_behind:
+        # 큐에 넣기만 하므로 바로 끝남
+        generation_writer.write(run)
+    else:
+        # 연결 풀 대기 + 커밋(fsync)은 스레드풀에서 (이벤트 루프를 막지 않게)
+        await run_in_threadpool(generation_writer.write, run)
+
+async def get_cached_sentences(cache_key):
+    # 메모리에 있으면 바로, 없으면 SQLite 저장소 조회는 스레드풀에서 (연결 풀 대기로 이벤트 루프가 멈추지 않게)
+    cached = generation_cache.get_from_memory(cache_key)
+    if cached is None and generation_cache.enabled:
+        cached = await run_in_threadpool(generation_cache.get, cache_key)
+    return cached
+
+# 진행 중인 생성 작업 (같은 캐시 키의 동시 요청은 OpenAI 호출 하나를 함께 기다림)
+ai_inflight = {}
+
+async def _generate_and_store(generation_type, request: AIGenerationRequest, cache_key):
+    sentences, run_info = await generate_sentences(generation_type, request)
+    
+    # 데이터베이스에 저장
+    await save_ai_generations(request.keyword, generation_type, sentences, **run_info)
+    await run_in_threadpool(generation_cache.put, cache_key, sentences)
+    return sentences
+
+async def get_or_generate_sentences(generation_type, request: AIGenerationRequest):
+    """캐시 확인 후 없으면 생성합니다. 반환값: (문장 목록, 캐시 사용 여부)"""
+    cache_key = make_cache_key(request.keyword, generation_type, request.count, active_prompt_version(generation_type), PARSER_VERSION)
+    if not request.fresh:
+        cached = await get_cached_sentences(cache_key)
+        if cached is not None:
+            return cached, True
+    
+    task = ai_inflight.get(cache_key)
+    if task is None:
+        task = asyncio.ensure_future(_generate_and_store(generation_type, request, cache_key))
+        ai_inflight[cache_key] = task
+        task.add_done_callback(lambda _: ai_inflight.pop(cache_key, None))
+    # 한 요청이 취소되어도 같은 작업을 기다리는 다른 요청에는 영향이 없도록 shield
+    sentences = await asyncio.shield(task)
+    return list(sentences), False
+
+async def run_ai_generation(generation_type, request: AIGenerationRequest):
+    """캐시 확인 → OpenAI 생성 → 저장 → 캐시 저장 순서로 AI 생성 요청을 처리합니다."""
     if not client:
         raise HTTPException(status_code=500, detail="OpenAI API 키가 설정되지 않았습니다.")
     
     try:
-        # Sample Phrase 생성 프롬프트
-        prompt = f"""
-[ROLE]
-너는 지금 6살 어린이야. 친구에게 이야기하듯 말해.
-
-[TASK]
-키워드: {request.keyword}
-이 키워드로 친구와 이야기하는 대화 문장 {request.count}개를 만들어줘.
-
-[REQUIREMENTS]
-- 모든 문장은 반말로 작성 (존댓말 사용하지 않음)
-- 문장 길이는 15단어 이내
-- 문장 안에 감정이나 느낌 표현 포함 (재밌어, 무서워, 좋아, 신기해 등)
-- 키워드를 자연스럽게 문장에 포함
-- 다양한 대화 패턴 사용 (경험 공유, 질문하기, 감정 표현 등)
-
-[OUTPUT FORMAT]
-각 문장을 반드시 다음 형식으로 출력해줘:
-- "문장 내용"
-
-[EXAMPLES]
-예시:
-- "스켈레톤은 화살 쏘는 몬스터라서 무서웠어!"
-- "너 송편 먹어봤어? 난 꿀 들어간 송편 좋아해!"
-- "북극곰 보니까 너무 귀여웠어!"
-- "오늘 놀이터에서 재밌게 놀았어!"
-"""
-
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "당신은 5-7세 아동의 언어를 잘 아는 전문가입니다. 실제 아동이 사용하는 자연스러운 반말로만 문장을 생성해주세요."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=1000,
-            temperature=0.8
-        )
-        
-        generated_text = response.choices[0].message.content
-        print(f"Sample Phrase Generated text: {generated_text}")  # 디버그용
-        
-        # 다양한 형식의 문장 파싱
-        sentences = []
-        for line in generated_text.split('\n'):
-            line = line.strip()
-            if line:
-                # 번호가 있는 경우 (1. 2. 3.)
-                if line[0].isdigit() and '. ' in line:
-                    sentence = line.split('. ', 1)[1].strip()
-                    # 따옴표 제거
-                    if sentence.startswith('"') and sentence.endswith('"'):
-                        sentence = sentence[1:-1]
-                    sentences.append(sentence)
-                # 대시가 있는 경우 (- "문장")
-                elif line.startswith('-'):
-                    sentence = line.strip()  # 대시와 따옴표 그대로 유지
-                    sentences.append(sentence)
-                # 그냥 문장인 경우 (키워드나 규칙이 아닌)
-                elif not line.startswith('키워드') and not line.startswith('규칙') and not line.startswith('대화') and not line.startswith('예시'):
-                    # 따옴표 제거
-                    if line.startswith('"') and line.endswith('"'):
-                        line = line[1:-1]
-                    sentences.append(line)
-        
-        print(f"Sample Phrase Parsed sentences: {sentences}")  # 디버그용
-        
-        # 데이터베이스에 저장
-        conn = get_db()
-        c = conn.cursor()
-        for sentence in sentences:
-            c.execute(
-                "INSERT INTO ai_generations (keyword, generation_type, generated_text) VALUES (?, ?, ?)",
-                (request.keyword, "sample_phrase", sentence)
-            )
-        conn.commit()
-        conn.close()
-        
-        return AIGenerationResponse(
-            keyword=request.keyword,
-            generation_type="sample_phrase",
-            generated_sentences=sentences,
-            created_at=datetime.now().isoformat()
-        )
-        
+        sentences, cached = await get_or_generate_sentences(generation_type, request)
+    except LLMGatewayError as e:
+        # 업스트림 상태에 맞는 응답 (과부하/서킷 열림 503, 시간 초과 504, 그 외 502)
+        print(f"{AI_GENERATION_LABELS[generation_type]} 에러: {e.detail}")
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers)
     except Exception as e:
-        print(f"Sample Phrase 생성 에러: {str(e)}")
+        print(f"{AI_GENERATION_LABELS[generation_type]} 에러: {str(e)}")
         print(f"에러 타입: {type(e)}")
         raise HTTPException(status_code=500, detail=f"AI 생성 중 오류가 발생했습니다: {str(e)}")
+    
+    return AIGenerationResponse(
+        keyword=request.keyword,
+        generation_type=generation_type,
+        generated_sentences=sentences,
+        created_at=datetime.now().isoformat(),
+        cached=cached
+    )
+
+@app.post("/ai/sample-phrase/")
+async def generate_sample_phrases(request: AIGenerationRequest):
+    return await run_ai_generation("sample_phrase", request)
 
 @app.post("/ai/experience/")
 async def generate_experience_analysis(request: AIGenerationRequest):
-    if not client:
-        raise HTTPException(status_code=500, detail="OpenAI API 키가 설정되지 않았습니다.")
-    
-    try:
-        # 경험 분석 생성 프롬프트
-        prompt = f"""
-[ROLE]
-너는 지금 6살 어린이야. 실제로 있었던 일을 말하듯 자연스럽게 이야기해.
-
-[TASK]
-키워드: {request.keyword}
-이 키워드와 관련된 네 경험이나 느낌을 표현하는 문장 {request.count}개를 만들어줘.
-
-[REQUIREMENTS]
-- "나는/내가" 없이 직접적으로 시작
-- 과거 경험을 강조하는 표현 사용 ("~한 적 있음", "~봤음", "~했음")
-- 반말로만 작성 (존댓말 사용하지 않음)
-- 문장 길이는 15단어 이내
-- 문장 안에 감정이나 느낌 표현 포함 (재밌었음, 무서웠음, 좋았음, 싫었음, 신기했음 등)
-- 문장 안에 장소나 상황이 드러나야 함 (예: 집에서, 학교에서, 놀이터에서)
-- 키워드를 자연스럽게 문장에 포함
-- 다양한 유형의 문장 섞기 (경험 이야기, 선호, 감정 반응, 소유 등)
-
-[EXAMPLES]
-키워드별 예시:
-
-동물 (토끼, 강아지, 고양이, 북극곰):
-- "공원에서 토끼 본 적 있음. 너무 귀여웠음."
-- "강아지 털 만져봤는데 부드러워서 기분이 좋았음."
-- "고양이랑 놀아본 적 있음. 아직 키우지 않지만 키워보고 싶음."
-- "동물원에서 북극곰 보는 게 제일 좋았음."
-
-음식 (송편, 케이크, 과일, 햄버거):
-- "할머니가 집에서 송편 만드는 걸 도와준 적 있음."
-- "엄마 생일에 케이크 선물로 사준 적 있음."
-- "과일 중에 사과가 제일 좋음. 달아서 좋음."
-- "햄버거를 제일 좋아함. 제일 좋아하는 햄버거는 불거기 버거임."
-
-놀이/활동 (놀이터, 축구, 그림, 미끄럼틀):
-- "놀이터에서 그네 타는 걸 제일 좋아함. 높이 올라갈 때 제일 좋음."
-- "축구 할 때 공격수를 많이함. 골 넣을 때 가장 기분 좋음."
-- "그림 대회에서 1등 해봤음."
-- "키즈카페에서 미끄럼틀 타는걸 제일 좋아함."
-
-캐릭터/영화 (해리포터, 코난, 포켓몬스터, 인어공주):
-- "해리포터 책 읽어본 적 있음. 마법 쓸 때 신기했음."
-- "코난 애니메이션 본 적 있음. 코난이 추리하는 게 재밌었음!"
-- "포케몬스터 중에 피카츄가 제일 좋음. 피카츄 인형도 가지고 있음."
-- "인어공주가 목소리를 잃어서 말을 못하는 걸 보고 너무 속상했음."
-"""
-
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "당신은 5-7세 아동의 실제 경험을 잘 아는 전문가입니다. 아동이 실제로 경험했을 법한 구체적이고 자연스러운 문장을 생성해주세요."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=1000,
-            temperature=0.7
-        )
-        
-        generated_text = response.choices[0].message.content
-        print(f"Experience Generated text: {generated_text}")  # 디버그용
-        
-        # 다양한 형식의 문장 파싱
-        sentences = []
-        for line in generated_text.split('\n'):
-            line = line.strip()
-            if line:
-                # 번호가 있는 경우 (1. 2. 3.)
-                if line[0].isdigit() and '. ' in line:
-                    sentence = line.split('. ', 1)[1].strip()
-                    # 따옴표 제거
-                    if sentence.startswith('"') and sentence.endswith('"'):
-                        sentence = sentence[1:-1]
-                    sentences.append(sentence)
-                # 대시가 있는 경우 (- 문장)
-                elif line.startswith('-'):
-                    sentence = line[1:].strip()
-                    # 따옴표 제거
-                    if sentence.startswith('"') and sentence.endswith('"'):
-                        sentence = sentence[1:-1]
-                    sentences.append(sentence)
-                # 그냥 문장인 경우 (키워드나 규칙이 아닌)
-                elif not line.startswith('키워드') and not line.startswith('규칙') and not line.startswith('생성할') and not line.startswith('예시'):
-                    # 콜론으로 구분된 경우 (키워드: 문장) -> 문장 부분만 추출
-                    if ':' in line and not line.startswith('"'):
-                        # "키워드: 문장" 형식에서 문장 부분만 추출
-                        parts = line.split(':', 1)
-                        if len(parts) == 2:
-                            sentence = parts[1].strip()
-                            # 따옴표 제거
-                            if sentence.startswith('"') and sentence.endswith('"'):
-                                sentence = sentence[1:-1]
-                            sentences.append(sentence)
-                    else:
-                        # 따옴표 제거
-                        if line.startswith('"') and line.endswith('"'):
-                            line = line[1:-1]
-                        sentences.append(line)
-        
-        print(f"Experience Parsed sentences: {sentences}")  # 디버그용
-        
-        # 데이터베이스에 저장
-        conn = get_db()
-        c = conn.cursor()
-        for sentence in sentences:
-            c.execute(
-                "INSERT INTO ai_generations (keyword, generation_type, generated_text) VALUES (?, ?, ?)",
-                (request.keyword, "experience", sentence)
-            )
-        conn.commit()
-        conn.close()
-        
-        return AIGenerationResponse(
-            keyword=request.keyword,
-            generation_type="experience",
-            generated_sentences=sentences,
-            created_at=datetime.now().isoformat()
-        )
-        
-    except Exception as e:
-        print(f"Experience 분석 생성 에러: {str(e)}")
-        print(f"에러 타입: {type(e)}")
-        raise HTTPException(status_code=500, detail=f"AI 생성 중 오류가 발생했습니다: {str(e)}")
+    return await run_ai_generation("experience", request)
 
 @app.post("/ai/hint/")
 async def generate_hint(request: AIGenerationRequest):
+    return await run_ai_generation("hint", request)
+
+# 여러 키워드 일괄 AI 생성 API (키워드 x 생성 유형을 동시에 처리)
+@app.post("/ai/batch/")
+async def generate_ai_batch(batch: AIBatchGenerationRequest):
     if not client:
         raise HTTPException(status_code=500, detail="OpenAI API 키가 설정되지 않았습니다.")
+    unknown_types = [t for t in batch.generation_types if t not in generation_types()]
+    if unknown_types:
+        raise HTTPException(status_code=400, detail=f"알 수 없는 생성 유형: {', '.join(unknown_types)}")
+    
+    # 중복 제거 (같은 키워드/유형은 한 번만 생성)
+    items = list(dict.fromkeys(
+        (keyword.strip(), generation_type)
+        for keyword in batch.keywords if keyword.strip()
+        for generation_type in batch.generation_types
+    ))
+    if len(items) > AI_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"한 번에 최대 {AI_BATCH_MAX_ITEMS}개까지 생성할 수 있습니다.")
+    
+    # 한 배치가 전체 동시성 슬롯을 독차지하지 않도록 배치 안에서도 동시 실행 수 제한
+    batch_semaphore = asyncio.Semaphore(AI_BATCH_CONCURRENCY)
     
+    async def run_item(keyword, generation_type):
+        request = AIGenerationRequest(keyword=keyword, generation_type=generation_type, count=batch.count, fresh=batch.fresh)
+        async with batch_semaphore:
+            try:
+                sentences, cached = await get_or_generate_sentences(generation_type, request)
+            except LLMGatewayError as e:
+                print(f"{AI_GENERATION_LABELS[generation_type]} 에러 ({keyword}): {e.detail}")
+                return {"keyword": keyword, "generation_type": generation_type, "status": "error",
+                        "status_code": e.status_code, "error": e.detail}
+            except Exception as e:
+                print(f"{AI_GENERATION_LABELS[generation_type]} 에러 ({keyword}): {str(e)}")
+                return {"keyword": keyword, "generation_type": generation_type, "status": "error",
+                        "error": f"AI 생성 중 오류가 발생했습니다: {str(e)}"}
+        return {"keyword": keyword, "generation_type": generation_type, "status": "ok",
+                "cached": cached, "generated_sentences": sentences}
+    
+    results = await asyncio.gather(*(run_item(keyword, generation_type) for keyword, generation_type in items))
+    return {
+        "total": len(results),
+        "success_count": sum(1 for r in results if r["status"] == "ok"),
+        "error_count": sum(1 for r in results if r["status"] == "error"),
+        "cached_count": sum(1 for r in results if r.get("cached")),
+        "results": results,
+        "created_at": datetime.now().isoformat()
+    }
+
+# AI 생성 스트리밍 (SSE) - 문장이 한 줄 완성될 때마다 바로 전송하고 저장
+async def iter_ai_generation_events(generation_type, request: AIGenerationRequest):
+    cache_key = make_cache_key(request.keyword, generation_type, request.count, active_prompt_version(generation_type), PARSER_VERSION)
+    cached = None if request.fresh else await get_cached_sentences(cache_key)
+    if cached is not None:
+        for index, sentence in enumerate(cached):
+            yield sse_event("sentence", {"index": index, "text": sentence})
+        yield sse_event("done", {"keyword": request.keyword, "generation_type": generation_type,
+                                 "count": len(cached), "cached": True, "created_at": datetime.now().isoformat()})
+        return
+    
+    sentences = []
+    parser = StreamingLineParser(generation_type)
+    prompt = get_prompt(generation_type)
+    ai_request = prompt.build_request(request.keyword, request.count)
+    started = time.perf_counter()
     try:
-        # 키워드 힌트 생성 프롬프트
-        prompt = f"""
-[ROLE]
-너는 지금 6살 어린이와 함께 게임을 하는 친구야. 정답을 직접 말하지 않고 힌트를 주는 역할이야.
-
-[TASK]
-정답: {request.keyword}
-이 정답에 대한 힌트를 {request.count}개 만들어줘. 힌트는 정답을 유추할 수 있도록 도와주는 문장이어야 해.
-
-[REQUIREMENTS]
-- 정답 자체는 절대 포함하지 않기
-- 5-7세 아동이 이해할 수 있는 수준
-- 간단하고 직접적으로 설명
-- 핵심 특징이나 정보를 짧게 표현
-- 각 힌트는 5-15단어 이내
-- 반말을 사용해.
-
-[OUTPUT FORMAT]
-각 힌트를 반드시 다음 형식으로 출력해줘:
-- "힌트 내용"
-
-[EXAMPLES]
-키워드별 예시:
-
-축구:
-- "체육시간에 하는거야"
-- "공으로 하는거야! 11명이서해"
-- "골을 넣는 게 목표야"
-
-해리포터:
-- "영화로도 나오고 책으로도 나왔어"
-- "마법 이야기야"
-- "마법 학교에 다녀"
-
-코난:
-- "추리하는 애니메이션이야"
-- "주인공이 어린애로 변했어"
-- "범인을 찾는 이야기야"
-
-분리수거:
-- "쓰레기를 나눠서 버리는거야"
-- "환경을 지키기 위해서 꼭 해야돼"
-- "색깔별로 나눠서 버려"
-"""
-
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "당신은 5-7세 아동을 위한 교육 전문가입니다. 키워드에 대한 적절한 힌트를 생성해주세요."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=500,
-            temperature=0.7
-        )
-        
-        generated_text = response.choices[0].message.content
-        print(f"Hint Generated text: {generated_text}")  # 디버그용
-        
-        # 힌트 파싱
-        hints = []
-        lines = generated_text.split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            # Skip lines starting with keywords, rules, or examples
-            if any(line.startswith(prefix) for prefix in ['키워드:', '규칙:', '예시:', '키워드', '규칙', '예시', '정답:']):
-                continue
-                
-            # Handle numbered lists (1. 2. 3.)
-            if line[0].isdigit() and '. ' in line:
-                hint = line.split('. ', 1)[1].strip()
-                hints.append(hint)
-            # Handle dashed lists (- "hint")
-            elif line.startswith('-'):
-                hint = line.strip()  # 대시와 따옴표 그대로 유지
-                hints.append(hint)
-            # Handle colon-separated (Keyword: Hint)
-            elif ':' in line and not line.startswith('"'):
-                parts = line.split(':', 1)
-                if len(parts) == 2:
-                    hint = parts[1].strip()
-                    hints.append(hint)
-            # Handle plain lines (short words)
-            elif len(line) < 20 and not line.startswith('"'):
-                hints.append(line)
-        
-        # Keep quotes in hints (don't remove them)
-        # hints = [hint.strip('"') for hint in hints if hint.strip()]
-        
-        print(f"Hint Parsed hints: {hints}")  # 디버그용
-        
-        # 데이터베이스에 저장
-        conn = get_db()
-        c = conn.cursor()
-        for hint in hints:
-            c.execute(
-                "INSERT INTO ai_generations (keyword, generation_type, generated_text) VALUES (?, ?, ?)",
-                (request.keyword, "hint", hint)
-            )
-        conn.commit()
-        conn.close()
-        
-        return AIGenerationResponse(
-            keyword=request.keyword,
-            generation_type="hint",
-            generated_sentences=hints,
-            created_at=datetime.now().isoformat()
-        )
-        
+        async for chunk in llm_gateway.stream_chat_completion(generation_type, **ai_request):
+            for sentence in parser.feed(chunk):
+                sentences.append(sentence)
+                yield sse_event("sentence", {"index": len(sentences) - 1, "text": sentence})
+        for sentence in parser.flush():
+            sentences.append(sentence)
+            yield sse_event("sentence", {"index": len(sentences) - 1, "text": sentence})
     except Exception as e:
-        print(f"Hint 생성 에러: {str(e)}")
-        print(f"에러 타입: {type(e)}")
-        raise HTTPException(status_code=500, detail=f"AI 생성 중 오류가 발생했습니다: {str(e)}")
+        print(f"{AI_GENERATION_LABELS[generation_type]} 스트리밍 에러: {str(e)}")
+        yield sse_event("error", {"detail": f"AI 생성 중 오류가 발생했습니다: {str(e)}",
+                                  "status_code": getattr(e, "status_code", 500)})
+        return
+    finally:
+        # 오류가 나거나 클라이언트 연결이 끊겨도 그때까지 보낸 문장은 생성 기록 한 건으로 저장
+        # (연결이 끊기면 이 작업이 취소되므로 저장은 shield 해서 끝까지 진행)
+        if sentences:
+            await asyncio.shield(save_ai_generations(
+                request.keyword, generation_type, sentences,
+                model=prompt.model, prompt_version=prompt.version, streamed=1,
+                latency_ms=round((time.perf_counter() - started) * 1000, 1)
+            ))
+    
+    await run_in_threadpool(generation_cache.put, cache_key, sentences)
+    yield sse_event("done", {"keyword": request.keyword, "generation_type": generation_type,
+                             "count": len(sentences), "cached": False, "created_at": datetime.now().isoformat()})
+
+def stream_ai_generation(generation_type, request: AIGenerationRequest):
+    if not client:
+        raise HTTPException(status_code=500, detail="OpenAI API 키가 설정되지 않았습니다.")
+    return StreamingResponse(
+        iter_ai_generation_events(generation_type, request),
+        media_type=STREAM_MEDIA_TYPES["sse"],
+        headers=STREAM_HEADERS
+    )
 
+@app.post("/ai/sample-phrase/stream")
+async def stream_sample_phrases(request: AIGenerationRequest):
+    return stream_ai_generation("sample_phrase", request)
+
+@app.post("/ai/experience/stream")
+async def stream_experience_analysis(request: AIGenerationRequest):
+    return stream_ai_generation("experience", request)
+
+@app.post("/ai/hint/stream")
+async def stream_hint(request: AIGenerationRequest):
+    return stream_ai_generation("hint", request)
+
+# OpenAI 게이트웨이 상태 (서킷 브레이커, 작업별 업스트림 지연 시간 히스토그램, 재시도/오류 횟수)
+@app.get("/ai/gateway/stats")
+async def get_ai_gateway_stats():
+    return llm_gateway.stats()
+
+# 등록된 프롬프트 버전 목록 (현재 사용 중인 버전은 active)
+@app.get("/ai/prompts/")
+async def get_ai_prompts():
+    return list_prompts()
+
+# AI 생성 캐시 상태 (hit rate 등)
+@app.get("/ai/cache/stats")
+async def get_ai_cache_stats():
+    return generation_cache.stats()
+
+# 저장소 DELETE 가 있으므로 일반 def (스레드풀에서 실행)
+@app.delete("/ai/cache/")
+def clear_ai_cache():
+    generation_cache.clear()
+    return {"result": "success"}
+
+AI_HISTORY_FIELDS = {
+    "id": "id",
+    "run_id": "run_id",
+    "keyword": "keyword",
+    "generation_type": "generation_type",
+    "generated_text": "generated_text",
+    "created_at": "created_at",
+}
+
+GENERATION_RUN_FIELDS = {
+    "id": "id",
+    "keyword": "keyword",
+    "generation_type": "generation_type",
+    "model": "model",
+    "prompt_version": "prompt_version",
+    "streamed": "streamed",
+    "latency_ms": "latency_ms",
+    "prompt_tokens": "prompt_tokens",
+    "completion_tokens": "completion_tokens",
+    "total_tokens": "total_tokens",
+    "sentence_count": "sentence_count",
+    "created_at": "created_at",
+}
+
+def history_filters(keyword, generation_type):
+    # (keyword, generation_type, created_at, id) 인덱스를 타도록 정확히 일치하는 조건만 사용
+    conditions, params = [], []
+    if keyword is not None:
+        conditions.append("keyword = ?")
+        params.append(keyword.strip())
+    if generation_type is not None:
+        conditions.append("generation_type = ?")
+        params.append(generation_type)
+    return conditions, params
+
+# AI 생성 히스토리 조회 API (문장 단위, 최신순)
 @app.get("/ai/history/")
-async def get_ai_generation_history():
-    conn = get_db()
+async def get_ai_generation_history(
+    response: Response,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    keyword: Optional[str] = None,
+    generation_type: Optional[str] = None,
+    fields: Optional[str] = None,
+    conn: sqlite3.Connection = Depends(get_db)
+):
+    selected = parse_fields(fields, AI_HISTORY_FIELDS)
+    conditions, params = history_filters(keyword, generation_type)
+    generations, next_cursor = paginate(
+        conn,
+        "SELECT {columns} FROM ai_generations {where}",
+        [(name, AI_HISTORY_FIELDS[name]) for name in selected],
+        params, cursor, limit, "created_at", "id",
+        conditions=conditions
+    )
+    
+    if not conditions:
+        response.headers[TOTAL_COUNT_HEADER] = str(get_row_count(conn, "ai_generations"))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return generations
+
+# AI 생성 기록 조회 API (요청 단위, 최신순)
+@app.get("/ai/runs/")
+async def get_generation_runs(
+    response: Response,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    keyword: Optional[str] = None,
+    generation_type: Optional[str] = None,
+    fields: Optional[str] = None,
+    conn: sqlite3.Connection = Depends(get_db)
+):
+    selected = parse_fields(fields, GENERATION_RUN_FIELDS)
+    conditions, params = history_filters(keyword, generation_type)
+    runs, next_cursor = paginate(
+        conn,
+        "SELECT {columns} FROM generation_runs {where}",
+        [(name, GENERATION_RUN_FIELDS[name]) for name in selected],
+        params, cursor, limit, "created_at", "id",
+        conditions=conditions
+    )
+    
+    if not conditions:
+        response.headers[TOTAL_COUNT_HEADER] = str(get_row_count(conn, "generation_runs"))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return runs
+
+@app.get("/ai/runs/{run_id}")
+async def get_generation_run(run_id: int, conn: sqlite3.Connection = Depends(get_db)):
     c = conn.cursor()
-    c.execute("SELECT * FROM ai_generations ORDER BY created_at DESC LIMIT 100")
-    generations = c.fetchall()
-    conn.close()
+    c.execute(f"SELECT {', '.join(GENERATION_RUN_FIELDS.values())} FROM generation_runs WHERE id = ?", (run_id,))
+    run = c.fetchone()
+    if not run:
+        raise HTTPException(status_code=404, detail="Generation run not found")
     
-    return [
-        {
-            "id": gen[0],
-            "keyword": gen[1],
-            "generation_type": gen[2],
-            "generated_text": gen[3],
-            "created_at": gen[4]
-        }
-        for gen in generations
-    ]
+    c.execute("SELECT generated_text FROM ai_generations WHERE run_id = ? ORDER BY position", (run_id,))
+    return {
+        **dict(zip(GENERATION_RUN_FIELDS, run)),
+        "generated_sentences": [row[0] for row in c.fetchall()]
+    }
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,287 @@
+"""
+Prometheus 형식 지표 (/metrics)
+
+라이브러리 없이 카운터 / 히스토그램과 텍스트 출력(text exposition format 0.0.4)만 직접 구현합니다.
+워커 프로세스마다 따로 모으므로 워커가 여럿이면 Prometheus가 워커별로 수집해야 합니다.
+
+- http_requests_total / http_request_duration_seconds
+    MetricsMiddleware 가 라우트(경로 템플릿)별로 기록합니다. 스트리밍 응답은 마지막 조각까지의 시간입니다.
+- db_query_duration_seconds (실행 수는 _count) / db_fetch_seconds_total
+    연결 풀의 모든 연결은 TimedConnection 으로 열려서, 커서의 execute/executemany/executescript
+    시간과 fetchall/fetchmany 시간을 문장 종류(select, insert...)와 테이블별로 기록합니다.
+- 그 밖의 지표(OpenAI 호출, 연결 풀)는 register_collector 로 등록한 함수가 /metrics 요청 때 만듭니다.
+"""
+import bisect
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+DB_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def format_family(name, kind, help_text, samples):
+    """samples: [(접미사, [(라벨, 값)...], 값)] → 지표 하나의 텍스트 줄 목록"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for suffix, labels, value in samples:
+        lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+    return lines
+
+
+def histogram_samples(labels, bounds, cumulative_counts, total_sum, count):
+    """누적 버킷 값으로 히스토그램 샘플(_bucket/_sum/_count)을 만듭니다."""
+    samples = [
+        ("_bucket", labels + [("le", _format_value(float(bound)))], cumulative)
+        for bound, cumulative in zip(list(bounds) + [float("inf")], cumulative_counts)
+    ]
+    samples.append(("_sum", labels, total_sum))
+    samples.append(("_count", labels, count))
+    return samples
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return format_family(self.name, "counter", self.help_text, [
+            ("", list(zip(self.labelnames, labelvalues)), value) for labelvalues, value in values
+        ])
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=HTTP_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._values = {}  # 라벨 값 -> [구간별 개수(누적 아님), 합, 개수]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labelvalues)
+            if state is None:
+                state = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def collect(self):
+        with self._lock:
+            values = sorted((labelvalues, (list(counts), total, count))
+                            for labelvalues, (counts, total, count) in self._values.items())
+        samples = []
+        for labelvalues, (counts, total, count) in values:
+            cumulative, running = [], 0
+            for bucket_count in counts:
+                running += bucket_count
+                cumulative.append(running)
+            samples.extend(histogram_samples(list(zip(self.labelnames, labelvalues)), self.buckets,
+                                             cumulative, round(total, 6), count))
+        return format_family(self.name, "histogram", self.help_text, samples)
+
+
+_metrics = []
+_collectors = []
+
+
+def counter(name, help_text, labelnames=()):
+    metric = Counter(name, help_text, labelnames)
+    _metrics.append(metric)
+    return metric
+
+
+def histogram(name, help_text, labelnames=(), buckets=HTTP_BUCKETS):
+    metric = Histogram(name, help_text, labelnames, buckets)
+    _metrics.append(metric)
+    return metric
+
+
+def register_collector(collect):
+    """collect(): /metrics 요청 때마다 불려서 텍스트 줄 목록(format_family 결과)을 돌려주는 함수"""
+    _collectors.append(collect)
+
+
+def render():
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.collect())
+    for collect in _collectors:
+        lines.extend(collect())
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+# --- HTTP 요청 ---
+
+http_requests = counter("http_requests_total", "HTTP 요청 수", ("method", "route", "status"))
+http_duration = histogram("http_request_duration_seconds", "HTTP 요청 처리 시간 (초)", ("method", "route"))
+
+
+class MetricsMiddleware:
+    """라우트별 요청 수 / 처리 시간을 기록하는 ASGI 미들웨어"""
+
+    def __init__(self, app, skip_paths=("/metrics",)):
+        self.app = app
+        self.skip_paths = set(skip_paths)
+        self._route_paths = None
+
+    def _route_label(self, scope):
+        # 라우터가 찾은 endpoint를 경로 템플릿으로 바꿈 (/templates/{template_id}). 주소 그대로 쓰면 라벨이 끝없이 늘어남
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._route_paths is None:
+            app = scope.get("app")
+            self._route_paths = {
+                getattr(route, "endpoint", None): route.path
+                for route in getattr(app, "routes", ())
+                if hasattr(route, "path")
+            }
+        return self._route_paths.get(endpoint, "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = self._route_label(scope)
+            http_requests.inc(scope["method"], route, str(status))
+            http_duration.observe(time.perf_counter() - started, scope["method"], route)
+
+
+# --- SQLite 쿼리 ---
+
+db_duration = histogram("db_query_duration_seconds", "SQLite 문장 실행 시간 (초, fetch 제외)",
+                        ("statement", "table"), DB_BUCKETS)
+db_fetch_seconds = counter("db_fetch_seconds_total", "SQLite 결과 읽기(fetchall/fetchmany) 시간 합 (초)",
+                           ("statement", "table"))
+
+STATEMENT_PATTERN = re.compile(r"^\s*(\w+)")
+# 문장 종류별로 테이블 이름이 오는 자리
+TABLE_PATTERNS = {
+    "select": re.compile(r"\bFROM\s+([\w\"]+)", re.IGNORECASE),
+    "delete": re.compile(r"\bFROM\s+([\w\"]+)", re.IGNORECASE),
+    "insert": re.compile(r"\bINTO\s+([\w\"]+)", re.IGNORECASE),
+    "replace": re.compile(r"\bINTO\s+([\w\"]+)", re.IGNORECASE),
+    "update": re.compile(r"^\s*UPDATE\s+(?:OR\s+\w+\s+)?([\w\"]+)", re.IGNORECASE),
+    # 인덱스/트리거는 대상 테이블(ON ...), 테이블은 자기 이름
+    "create": re.compile(r"\b(?:ON|TABLE(?:\s+IF\s+NOT\s+EXISTS)?)\s+([\w\"]+)", re.IGNORECASE),
+    "drop": re.compile(r"\b(?:TABLE|INDEX|TRIGGER)(?:\s+IF\s+EXISTS)?\s+([\w\"]+)", re.IGNORECASE),
+    "alter": re.compile(r"\bTABLE\s+([\w\"]+)", re.IGNORECASE),
+}
+
+
+@lru_cache(maxsize=1024)
+def statement_labels(sql):
+    """SQL → (문장 종류, 테이블 이름). 같은 SQL 문자열은 다시 분석하지 않음"""
+    match = STATEMENT_PATTERN.match(sql)
+    if not match:
+        return "other", ""
+    statement = match.group(1).lower()
+    pattern = TABLE_PATTERNS.get(statement)
+    table = pattern.search(sql) if pattern else None
+    return statement, table.group(1).strip('"') if table else ""
+
+
+class TimedCursor(sqlite3.Cursor):
+    _labels = ("other", "")
+
+    def _timed(self, method, sql, *args):
+        labels = statement_labels(sql)
+        self._labels = labels
+        started = time.perf_counter()
+        try:
+            return method(self, sql, *args)
+        finally:
+            db_duration.observe(time.perf_counter() - started, *labels)
+
+    def execute(self, sql, parameters=()):
+        return self._timed(sqlite3.Cursor.execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._timed(sqlite3.Cursor.executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        self._labels = ("script", "")
+        started = time.perf_counter()
+        try:
+            return sqlite3.Cursor.executescript(self, sql_script)
+        finally:
+            db_duration.observe(time.perf_counter() - started, *self._labels)
+
+    def fetchall(self):
+        started = time.perf_counter()
+        try:
+            return sqlite3.Cursor.fetchall(self)
+        finally:
+            db_fetch_seconds.inc(*self._labels, amount=time.perf_counter() - started)
+
+    def fetchmany(self, *args):
+        started = time.perf_counter()
+        try:
+            return sqlite3.Cursor.fetchmany(self, *args)
+        finally:
+            db_fetch_seconds.inc(*self._labels, amount=time.perf_counter() - started)
+
+
+class TimedConnection(sqlite3.Connection):
+    """cursor()가 TimedCursor를 돌려주는 연결. conn.execute 같은 단축 메서드는 C에서 기본 커서를
+    바로 만들기 때문에 따로 TimedCursor를 거치게 함"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
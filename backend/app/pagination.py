@@ -0,0 +1,109 @@
+"""
+목록 API용 키셋 페이지네이션 / 필드 선택 / 캐시된 행 개수
+
+- 커서는 마지막 행의 (created_at, id)를 담은 불투명한 문자열이고,
+  다음 페이지는 WHERE (created_at, id) < (?, ?) 로 인덱스에서 바로 이어 읽습니다.
+- fields= 로 필요한 컬럼만 골라서 목록 화면이 fixed_content 같은 큰 컬럼을 건너뛸 수 있습니다.
+- 전체 개수는 COUNT(*) 대신 트리거가 유지하는 table_counters 테이블에서 읽습니다.
+"""
+import base64
+import json
+
+from fastapi import HTTPException
+
+TOTAL_COUNT_HEADER = "X-Total-Count"
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(created_at, row_id):
+    raw = json.dumps([created_at, row_id], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+    except (ValueError, TypeError):
+        payload = None
+    # [created_at 문자열, id 정수] 가 아니면 SQL 파라미터로 넘길 수 없음 (bool 도 int 이므로 제외)
+    if (not isinstance(payload, list) or len(payload) != 2 or not isinstance(payload[0], str)
+            or not isinstance(payload[1], int) or isinstance(payload[1], bool)):
+        raise HTTPException(status_code=400, detail="잘못된 cursor 값입니다.")
+    created_at, row_id = payload
+    return created_at, row_id
+
+
+def parse_fields(fields, allowed):
+    """fields=name,tags 형식을 검증해서 필드 목록으로 돌려줍니다. (없으면 전체)"""
+    if not fields:
+        return list(allowed)
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"알 수 없는 필드: {', '.join(unknown)}")
+    if not selected:
+        raise HTTPException(status_code=400, detail="필드를 하나 이상 지정하세요")
+    return selected
+
+
+def create_row_counters(c, tables):
+    """테이블별 행 개수를 유지하는 table_counters 테이블과 트리거를 생성합니다."""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS table_counters (
+            table_name TEXT PRIMARY KEY,
+            row_count INTEGER NOT NULL
+        )
+    ''')
+    for table in tables:
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_count_ai AFTER INSERT ON {table} BEGIN
+                UPDATE table_counters SET row_count = row_count + 1 WHERE table_name = '{table}';
+            END
+        ''')
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_count_ad AFTER DELETE ON {table} BEGIN
+                UPDATE table_counters SET row_count = row_count - 1 WHERE table_name = '{table}';
+            END
+        ''')
+        # 처음 한 번만 실제 개수로 초기화
+        c.execute(
+            f"INSERT OR IGNORE INTO table_counters (table_name, row_count) SELECT ?, COUNT(*) FROM {table}",
+            (table,)
+        )
+
+
+def get_row_count(conn, table):
+    row = conn.execute("SELECT row_count FROM table_counters WHERE table_name = ?", (table,)).fetchone()
+    return row[0] if row else 0
+
+
+def paginate(conn, base_query, columns, params, cursor, limit, created_col, id_col, conditions=()):
+    """
+    base_query의 {columns}, {where} 자리를 채워 (created_at, id) 내림차순으로 한 페이지를 읽습니다.
+
+    columns: [(필드 이름, SQL 식)] - 커서 계산을 위해 created_at/id를 항상 뒤에 추가로 읽습니다.
+    conditions: 추가 WHERE 조건들 (params는 이 조건들의 값)
+    반환값: (행 dict 목록, 다음 커서 또는 None)
+    """
+    select = ", ".join(expr for _, expr in columns) + f", {created_col}, {id_col}"
+    conditions = list(conditions)
+    params = list(params)
+    if cursor:
+        conditions.append(f"({created_col}, {id_col}) < (?, ?)")
+        params.extend(decode_cursor(cursor))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = base_query.format(columns=select, where=where) + f" ORDER BY {created_col} DESC, {id_col} DESC"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit + 1)  # 한 행 더 읽어서 다음 페이지가 있는지 확인
+
+    rows = conn.execute(query, params).fetchall()
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][-2], rows[-1][-1])
+
+    names = [name for name, _ in columns]
+    return [dict(zip(names, row)) for row in rows], next_cursor
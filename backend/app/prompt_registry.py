@@ -0,0 +1,360 @@
+"""
+AI 생성 프롬프트 저장소
+
+생성 유형별 프롬프트를 (유형, 버전)으로 등록해두고, 요청마다 f-string을 새로 만드는 대신
+미리 컴파일한 {{{변수}}} 템플릿(templates 테이블과 같은 template_engine)에 keyword/count만
+채워 넣습니다.
+
+v2 프롬프트는 역할/규칙/출력 형식/예시를 앞에 두고 키워드와 개수([TASK])를 맨 뒤에 둡니다.
+그래서 system 메시지와 user 메시지의 앞부분(prefix)이 모든 요청에서 똑같고, 업스트림의
+프롬프트 캐시(같은 prefix 재사용)를 탈 수 있습니다.
+
+프롬프트 문구를 바꿀 때는 기존 버전을 고치지 말고 새 버전을 등록하세요. 버전은 생성 캐시 키와
+generation_runs.prompt_version에 들어가므로, 버전이 바뀌면 이전 프롬프트로 만든 캐시를 쓰지 않고
+히스토리에서도 어떤 프롬프트로 만든 결과인지 구분됩니다.
+
+환경변수:
+    AI_PROMPT_VERSION_SAMPLE_PHRASE  sample_phrase에 쓸 프롬프트 버전 (기본 v2)
+    AI_PROMPT_VERSION_EXPERIENCE     experience에 쓸 프롬프트 버전 (기본 v2)
+    AI_PROMPT_VERSION_HINT           hint에 쓸 프롬프트 버전 (기본 v2)
+"""
+import os
+
+from template_engine import compile_template
+
+DEFAULT_PROMPT_VERSION = "v2"
+
+
+class PromptSpec:
+    __slots__ = ("generation_type", "version", "model", "system", "user", "max_tokens", "temperature")
+
+    def __init__(self, generation_type, version, model, system, user, max_tokens, temperature):
+        self.generation_type = generation_type
+        self.version = version
+        self.model = model
+        self.system = system
+        self.user = compile_template(user)
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+
+    @property
+    def static_prefix(self):
+        """user 메시지에서 첫 변수 앞까지의 고정 부분"""
+        return self.user.literals[0]
+
+    def build_request(self, keyword, count):
+        """chat.completions.create 에 넘길 인자를 만듭니다."""
+        return dict(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": self.system},
+                {"role": "user", "content": self.user.render({"keyword": keyword, "count": count})}
+            ],
+            max_tokens=self.max_tokens,
+            temperature=self.temperature
+        )
+
+    def describe(self):
+        return {
+            "generation_type": self.generation_type,
+            "version": self.version,
+            "model": self.model,
+            "variables": self.user.variables,
+            "static_prefix_chars": len(self.system) + len(self.static_prefix),
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+        }
+
+
+_prompts = {}  # (생성 유형, 버전) -> PromptSpec
+_active_versions = {}  # 생성 유형 -> 사용할 버전
+
+
+def register_prompt(spec):
+    _prompts[(spec.generation_type, spec.version)] = spec
+
+
+def get_prompt(generation_type, version=None):
+    """생성 유형의 프롬프트를 돌려줍니다. 버전을 주지 않으면 현재 사용 중인 버전."""
+    return _prompts[(generation_type, version or _active_versions[generation_type])]
+
+
+def active_prompt_version(generation_type):
+    return _active_versions[generation_type]
+
+
+def generation_types():
+    return list(_active_versions)
+
+
+def list_prompts():
+    return [
+        {**spec.describe(), "active": _active_versions.get(spec.generation_type) == spec.version}
+        for spec in _prompts.values()
+    ]
+
+
+# Sample Phrase 생성 프롬프트
+SAMPLE_PHRASE_SYSTEM = "당신은 5-7세 아동의 언어를 잘 아는 전문가입니다. 실제 아동이 사용하는 자연스러운 반말로만 문장을 생성해주세요."
+
+SAMPLE_PHRASE_USER_V1 = """
+[ROLE]
+너는 지금 6살 어린이야. 친구에게 이야기하듯 말해.
+
+[TASK]
+키워드: {{{keyword}}}
+이 키워드로 친구와 이야기하는 대화 문장 {{{count}}}개를 만들어줘.
+
+[REQUIREMENTS]
+- 모든 문장은 반말로 작성 (존댓말 사용하지 않음)
+- 문장 길이는 15단어 이내
+- 문장 안에 감정이나 느낌 표현 포함 (재밌어, 무서워, 좋아, 신기해 등)
+- 키워드를 자연스럽게 문장에 포함
+- 다양한 대화 패턴 사용 (경험 공유, 질문하기, 감정 표현 등)
+
+[OUTPUT FORMAT]
+각 문장을 반드시 다음 형식으로 출력해줘:
+- "문장 내용"
+
+[EXAMPLES]
+예시:
+- "스켈레톤은 화살 쏘는 몬스터라서 무서웠어!"
+- "너 송편 먹어봤어? 난 꿀 들어간 송편 좋아해!"
+- "북극곰 보니까 너무 귀여웠어!"
+- "오늘 놀이터에서 재밌게 놀았어!"
+"""
+
+# v2: 고정 지시문과 예시를 앞에 두고 키워드/개수([TASK])는 맨 뒤로
+SAMPLE_PHRASE_USER_V2 = """
+[ROLE]
+너는 지금 6살 어린이야. 친구에게 이야기하듯 말해.
+
+[REQUIREMENTS]
+- 모든 문장은 반말로 작성 (존댓말 사용하지 않음)
+- 문장 길이는 15단어 이내
+- 문장 안에 감정이나 느낌 표현 포함 (재밌어, 무서워, 좋아, 신기해 등)
+- 키워드를 자연스럽게 문장에 포함
+- 다양한 대화 패턴 사용 (경험 공유, 질문하기, 감정 표현 등)
+
+[OUTPUT FORMAT]
+각 문장을 반드시 다음 형식으로 출력해줘:
+- "문장 내용"
+
+[EXAMPLES]
+예시:
+- "스켈레톤은 화살 쏘는 몬스터라서 무서웠어!"
+- "너 송편 먹어봤어? 난 꿀 들어간 송편 좋아해!"
+- "북극곰 보니까 너무 귀여웠어!"
+- "오늘 놀이터에서 재밌게 놀았어!"
+
+[TASK]
+키워드: {{{keyword}}}
+이 키워드로 친구와 이야기하는 대화 문장 {{{count}}}개를 만들어줘.
+"""
+
+
+# 경험 분석 생성 프롬프트
+EXPERIENCE_SYSTEM = "당신은 5-7세 아동의 실제 경험을 잘 아는 전문가입니다. 아동이 실제로 경험했을 법한 구체적이고 자연스러운 문장을 생성해주세요."
+
+EXPERIENCE_USER_V1 = """
+[ROLE]
+너는 지금 6살 어린이야. 실제로 있었던 일을 말하듯 자연스럽게 이야기해.
+
+[TASK]
+키워드: {{{keyword}}}
+이 키워드와 관련된 네 경험이나 느낌을 표현하는 문장 {{{count}}}개를 만들어줘.
+
+[REQUIREMENTS]
+- "나는/내가" 없이 직접적으로 시작
+- 과거 경험을 강조하는 표현 사용 ("~한 적 있음", "~봤음", "~했음")
+- 반말로만 작성 (존댓말 사용하지 않음)
+- 문장 길이는 15단어 이내
+- 문장 안에 감정이나 느낌 표현 포함 (재밌었음, 무서웠음, 좋았음, 싫었음, 신기했음 등)
+- 문장 안에 장소나 상황이 드러나야 함 (예: 집에서, 학교에서, 놀이터에서)
+- 키워드를 자연스럽게 문장에 포함
+- 다양한 유형의 문장 섞기 (경험 이야기, 선호, 감정 반응, 소유 등)
+
+[EXAMPLES]
+키워드별 예시:
+
+동물 (토끼, 강아지, 고양이, 북극곰):
+- "공원에서 토끼 본 적 있음. 너무 귀여웠음."
+- "강아지 털 만져봤는데 부드러워서 기분이 좋았음."
+- "고양이랑 놀아본 적 있음. 아직 키우지 않지만 키워보고 싶음."
+- "동물원에서 북극곰 보는 게 제일 좋았음."
+
+음식 (송편, 케이크, 과일, 햄버거):
+- "할머니가 집에서 송편 만드는 걸 도와준 적 있음."
+- "엄마 생일에 케이크 선물로 사준 적 있음."
+- "과일 중에 사과가 제일 좋음. 달아서 좋음."
+- "햄버거를 제일 좋아함. 제일 좋아하는 햄버거는 불거기 버거임."
+
+놀이/활동 (놀이터, 축구, 그림, 미끄럼틀):
+- "놀이터에서 그네 타는 걸 제일 좋아함. 높이 올라갈 때 제일 좋음."
+- "축구 할 때 공격수를 많이함. 골 넣을 때 가장 기분 좋음."
+- "그림 대회에서 1등 해봤음."
+- "키즈카페에서 미끄럼틀 타는걸 제일 좋아함."
+
+캐릭터/영화 (해리포터, 코난, 포켓몬스터, 인어공주):
+- "해리포터 책 읽어본 적 있음. 마법 쓸 때 신기했음."
+- "코난 애니메이션 본 적 있음. 코난이 추리하는 게 재밌었음!"
+- "포케몬스터 중에 피카츄가 제일 좋음. 피카츄 인형도 가지고 있음."
+- "인어공주가 목소리를 잃어서 말을 못하는 걸 보고 너무 속상했음."
+"""
+
+# v2: 고정 지시문과 예시를 앞에 두고 키워드/개수([TASK])는 맨 뒤로
+EXPERIENCE_USER_V2 = """
+[ROLE]
+너는 지금 6살 어린이야. 실제로 있었던 일을 말하듯 자연스럽게 이야기해.
+
+[REQUIREMENTS]
+- "나는/내가" 없이 직접적으로 시작
+- 과거 경험을 강조하는 표현 사용 ("~한 적 있음", "~봤음", "~했음")
+- 반말로만 작성 (존댓말 사용하지 않음)
+- 문장 길이는 15단어 이내
+- 문장 안에 감정이나 느낌 표현 포함 (재밌었음, 무서웠음, 좋았음, 싫었음, 신기했음 등)
+- 문장 안에 장소나 상황이 드러나야 함 (예: 집에서, 학교에서, 놀이터에서)
+- 키워드를 자연스럽게 문장에 포함
+- 다양한 유형의 문장 섞기 (경험 이야기, 선호, 감정 반응, 소유 등)
+
+[EXAMPLES]
+키워드별 예시:
+
+동물 (토끼, 강아지, 고양이, 북극곰):
+- "공원에서 토끼 본 적 있음. 너무 귀여웠음."
+- "강아지 털 만져봤는데 부드러워서 기분이 좋았음."
+- "고양이랑 놀아본 적 있음. 아직 키우지 않지만 키워보고 싶음."
+- "동물원에서 북극곰 보는 게 제일 좋았음."
+
+음식 (송편, 케이크, 과일, 햄버거):
+- "할머니가 집에서 송편 만드는 걸 도와준 적 있음."
+- "엄마 생일에 케이크 선물로 사준 적 있음."
+- "과일 중에 사과가 제일 좋음. 달아서 좋음."
+- "햄버거를 제일 좋아함. 제일 좋아하는 햄버거는 불거기 버거임."
+
+놀이/활동 (놀이터, 축구, 그림, 미끄럼틀):
+- "놀이터에서 그네 타는 걸 제일 좋아함. 높이 올라갈 때 제일 좋음."
+- "축구 할 때 공격수를 많이함. 골 넣을 때 가장 기분 좋음."
+- "그림 대회에서 1등 해봤음."
+- "키즈카페에서 미끄럼틀 타는걸 제일 좋아함."
+
+캐릭터/영화 (해리포터, 코난, 포켓몬스터, 인어공주):
+- "해리포터 책 읽어본 적 있음. 마법 쓸 때 신기했음."
+- "코난 애니메이션 본 적 있음. 코난이 추리하는 게 재밌었음!"
+- "포케몬스터 중에 피카츄가 제일 좋음. 피카츄 인형도 가지고 있음."
+- "인어공주가 목소리를 잃어서 말을 못하는 걸 보고 너무 속상했음."
+
+[TASK]
+키워드: {{{keyword}}}
+이 키워드와 관련된 네 경험이나 느낌을 표현하는 문장 {{{count}}}개를 만들어줘.
+"""
+
+
+# 키워드 힌트 생성 프롬프트
+HINT_SYSTEM = "당신은 5-7세 아동을 위한 교육 전문가입니다. 키워드에 대한 적절한 힌트를 생성해주세요."
+
+HINT_USER_V1 = """
+[ROLE]
+너는 지금 6살 어린이와 함께 게임을 하는 친구야. 정답을 직접 말하지 않고 힌트를 주는 역할이야.
+
+[TASK]
+정답: {{{keyword}}}
+이 정답에 대한 힌트를 {{{count}}}개 만들어줘. 힌트는 정답을 유추할 수 있도록 도와주는 문장이어야 해.
+
+[REQUIREMENTS]
+- 정답 자체는 절대 포함하지 않기
+- 5-7세 아동이 이해할 수 있는 수준
+- 간단하고 직접적으로 설명
+- 핵심 특징이나 정보를 짧게 표현
+- 각 힌트는 5-15단어 이내
+- 반말을 사용해.
+
+[OUTPUT FORMAT]
+각 힌트를 반드시 다음 형식으로 출력해줘:
+- "힌트 내용"
+
+[EXAMPLES]
+키워드별 예시:
+
+축구:
+- "체육시간에 하는거야"
+- "공으로 하는거야! 11명이서해"
+- "골을 넣는 게 목표야"
+
+해리포터:
+- "영화로도 나오고 책으로도 나왔어"
+- "마법 이야기야"
+- "마법 학교에 다녀"
+
+코난:
+- "추리하는 애니메이션이야"
+- "주인공이 어린애로 변했어"
+- "범인을 찾는 이야기야"
+
+분리수거:
+- "쓰레기를 나눠서 버리는거야"
+- "환경을 지키기 위해서 꼭 해야돼"
+- "색깔별로 나눠서 버려"
+"""
+
+# v2: 고정 지시문과 예시를 앞에 두고 키워드/개수([TASK])는 맨 뒤로
+HINT_USER_V2 = """
+[ROLE]
+너는 지금 6살 어린이와 함께 게임을 하는 친구야. 정답을 직접 말하지 않고 힌트를 주는 역할이야.
+
+[REQUIREMENTS]
+- 정답 자체는 절대 포함하지 않기
+- 5-7세 아동이 이해할 수 있는 수준
+- 간단하고 직접적으로 설명
+- 핵심 특징이나 정보를 짧게 표현
+- 각 힌트는 5-15단어 이내
+- 반말을 사용해.
+
+[OUTPUT FORMAT]
+각 힌트를 반드시 다음 형식으로 출력해줘:
+- "힌트 내용"
+
+[EXAMPLES]
+키워드별 예시:
+
+축구:
+- "체육시간에 하는거야"
+- "공으로 하는거야! 11명이서해"
+- "골을 넣는 게 목표야"
+
+해리포터:
+- "영화로도 나오고 책으로도 나왔어"
+- "마법 이야기야"
+- "마법 학교에 다녀"
+
+코난:
+- "추리하는 애니메이션이야"
+- "주인공이 어린애로 변했어"
+- "범인을 찾는 이야기야"
+
+분리수거:
+- "쓰레기를 나눠서 버리는거야"
+- "환경을 지키기 위해서 꼭 해야돼"
+- "색깔별로 나눠서 버려"
+
+[TASK]
+정답: {{{keyword}}}
+이 정답에 대한 힌트를 {{{count}}}개 만들어줘. 힌트는 정답을 유추할 수 있도록 도와주는 문장이어야 해.
+"""
+
+
+def _register_defaults():
+    register_prompt(PromptSpec("sample_phrase", "v1", "gpt-3.5-turbo", SAMPLE_PHRASE_SYSTEM, SAMPLE_PHRASE_USER_V1, max_tokens=1000, temperature=0.8))
+    register_prompt(PromptSpec("sample_phrase", "v2", "gpt-3.5-turbo", SAMPLE_PHRASE_SYSTEM, SAMPLE_PHRASE_USER_V2, max_tokens=1000, temperature=0.8))
+    register_prompt(PromptSpec("experience", "v1", "gpt-3.5-turbo", EXPERIENCE_SYSTEM, EXPERIENCE_USER_V1, max_tokens=1000, temperature=0.7))
+    register_prompt(PromptSpec("experience", "v2", "gpt-3.5-turbo", EXPERIENCE_SYSTEM, EXPERIENCE_USER_V2, max_tokens=1000, temperature=0.7))
+    register_prompt(PromptSpec("hint", "v1", "gpt-3.5-turbo", HINT_SYSTEM, HINT_USER_V1, max_tokens=500, temperature=0.7))
+    register_prompt(PromptSpec("hint", "v2", "gpt-3.5-turbo", HINT_SYSTEM, HINT_USER_V2, max_tokens=500, temperature=0.7))
+    for generation_type in ("sample_phrase", "experience", "hint"):
+        version = os.getenv(f"AI_PROMPT_VERSION_{generation_type.upper()}", DEFAULT_PROMPT_VERSION)
+        if (generation_type, version) not in _prompts:
+            raise ValueError(f"등록되지 않은 프롬프트 버전: {generation_type} {version}")
+        _active_versions[generation_type] = version
+
+
+_register_defaults()
@@ -0,0 +1,209 @@
+"""
+템플릿 / 폴더 / 태그 읽기 캐시
+
+폴더 목록, 템플릿 목록, 템플릿 하나, 태그 목록은 누군가 편집할 때만 바뀌는데 요청마다 SQLite를 읽고
+JSON을 다시 풀었습니다. 이 캐시는 응답을 한 번 만들면 파이썬 값과 직렬화한 JSON 바이트를 같이
+메모리에 두고, 편집이 없는 동안은 데이터베이스에 닿지 않고 바이트를 그대로 돌려줍니다.
+
+무효화는 범위(scope)별 버전 번호로 합니다. 캐시 항목은 자기가 읽은 범위들을 기억하고,
+쓰기 API가 커밋한 뒤 invalidate(범위...)를 부르면 그 범위의 버전이 올라가서 해당 항목만 버려집니다.
+
+    folders            폴더 목록 (폴더 이름/색은 템플릿 목록에도 들어감)
+    templates          템플릿 목록 (추가, 수정, 이동, 삭제, 임포트)
+    template:{id}      템플릿 하나
+    tags               태그 목록 (태그가 실제로 바뀐 경우만)
+
+    content            콘텐츠 목록
+
+캐시를 만드는 도중에 버전이 바뀌면 (읽는 사이에 다른 요청이 커밋) 결과를 돌려주기만 하고 저장하지 않습니다.
+
+조건부 GET: conditional()로 응답하면 ETag(서버 시작 id + 범위 버전 + 요청 키)와
+Cache-Control: no-cache 를 붙이고, 요청의 If-None-Match가 현재 ETag와 같으면 캐시나 데이터베이스를
+보지 않고 본문 없이 304를 돌려줍니다. 버전은 서버가 시작할 때 0부터 다시 세므로 시작 id로 구분합니다.
+서버 프로세스 하나가 모든 쓰기를 받는 구성을 전제로 합니다. 다른 프로세스가 데이터베이스 파일을
+직접 고치면 재시작하거나 DELETE /cache/read 로 비워야 보입니다.
+
+환경변수:
+    READ_CACHE_ENABLED       0이면 캐시 사용 안 함 (기본 1)
+    READ_CACHE_MAX_ENTRIES   보관할 최대 응답 수, 오래 안 쓴 것부터 버림 (기본 512)
+"""
+import hashlib
+import json
+import os
+import secrets
+import threading
+from collections import OrderedDict
+
+from fastapi import Response
+
+import metrics
+
+READ_CACHE_ENABLED = os.getenv("READ_CACHE_ENABLED", "1") == "1"
+READ_CACHE_MAX_ENTRIES = int(os.getenv("READ_CACHE_MAX_ENTRIES", "512"))
+
+# 서버가 시작할 때마다 바뀌는 값 (재시작 전 ETag와 버전 번호가 겹치지 않게)
+BOOT_ID = secrets.token_hex(4)
+# 브라우저가 저장은 하되 쓸 때마다 If-None-Match로 다시 확인하게 함
+CACHE_CONTROL = "no-cache"
+
+
+def dump_json(value):
+    """Starlette JSONResponse와 같은 형식으로 직렬화"""
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+class CachedResponse:
+    __slots__ = ("value", "body", "headers", "versions")
+
+    def __init__(self, value, headers, versions):
+        self.value = value
+        self.body = dump_json(value)
+        self.headers = headers or {}
+        self.versions = versions
+
+    def response(self, headers=None):
+        return Response(content=self.body, media_type="application/json", headers={**self.headers, **(headers or {})})
+
+
+def make_etag(key, versions):
+    """같은 요청 키 + 같은 데이터 버전이면 같은 값인 강한 ETag"""
+    key_hash = hashlib.blake2b(repr(key).encode("utf-8"), digest_size=6).hexdigest()
+    return f'"{BOOT_ID}-{"-".join(map(str, versions))}-{key_hash}"'
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match 헤더가 etag와 맞는지 (약한 비교, * 포함)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class ReadCache:
+    def __init__(self, enabled=READ_CACHE_ENABLED, max_entries=READ_CACHE_MAX_ENTRIES):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (범위 목록, CachedResponse)
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._stale_builds = 0
+        self._invalidations = 0
+        self._not_modified = 0
+
+    def version(self, scope):
+        with self._lock:
+            return self._versions.get(scope, 0)
+
+    def versions(self, scopes):
+        with self._lock:
+            return self._current(scopes)
+
+    def _current(self, scopes):
+        # "*" 는 clear() 때 올라가는 전체 버전
+        return tuple(self._versions.get(scope, 0) for scope in ("*",) + scopes)
+
+    def get_or_build(self, key, scopes, build):
+        """
+        key의 캐시된 응답을 돌려주고, 없으면 build()로 만들어서 저장합니다.
+
+        scopes: 이 응답이 읽는 범위들
+        build(): (값, 응답 헤더 dict 또는 None)
+        """
+        scopes = tuple(scopes)
+        if self.enabled:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return entry[1]
+                self._misses += 1
+        # 읽기 전에 버전을 기록해야 읽는 도중 들어온 커밋을 알아챌 수 있음
+        versions = self.versions(scopes)
+        value, headers = build()
+        cached = CachedResponse(value, headers, versions)
+        if not self.enabled:
+            return cached
+        with self._lock:
+            if self._current(scopes) != versions:
+                self._stale_builds += 1
+                return cached
+            self._entries[key] = (scopes, cached)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return cached
+
+    def conditional(self, request, key, scopes, build):
+        """
+        ETag / If-None-Match 를 처리하는 get_or_build.
+        데이터가 바뀌지 않았으면 304, 아니면 캐시된 (또는 새로 만든) 응답에 ETag를 붙여 돌려줍니다.
+        """
+        scopes = tuple(scopes)
+        etag = make_etag(key, self.versions(scopes))
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            with self._lock:
+                self._not_modified += 1
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+        cached = self.get_or_build(key, scopes, build)
+        # 만드는 도중 버전이 바뀌었으면 만들 때의 버전으로 ETag를 붙임 (다음 요청에서 다시 받게 됨)
+        return cached.response({"ETag": make_etag(key, cached.versions), "Cache-Control": CACHE_CONTROL})
+
+    def invalidate(self, *scopes):
+        """쓰기를 커밋한 뒤 부릅니다. 해당 범위를 읽은 항목을 모두 버립니다."""
+        scopes = set(scopes)
+        with self._lock:
+            for scope in scopes:
+                self._versions[scope] = self._versions.get(scope, 0) + 1
+            stale = [key for key, (entry_scopes, _) in self._entries.items() if scopes.intersection(entry_scopes)]
+            for key in stale:
+                del self._entries[key]
+            self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._versions["*"] = self._versions.get("*", 0) + 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "stale_builds": self._stale_builds,
+                "invalidations": self._invalidations,
+                "not_modified": self._not_modified,
+                "cached_bytes": sum(len(cached.body) for _, cached in self._entries.values()),
+            }
+
+    def collect_metrics(self):
+        """/metrics 용 Prometheus 텍스트 줄 (metrics.register_collector 에 등록)"""
+        stats = self.stats()
+        lines = []
+        for name, kind, help_text, value in (
+            ("read_cache_hits_total", "counter", "읽기 캐시 적중 수", stats["hits"]),
+            ("read_cache_misses_total", "counter", "읽기 캐시 실패 수 (데이터베이스에서 읽음)", stats["misses"]),
+            ("read_cache_invalidations_total", "counter", "쓰기로 인한 캐시 무효화 수", stats["invalidations"]),
+            ("read_cache_not_modified_total", "counter", "If-None-Match가 맞아 304로 응답한 수", stats["not_modified"]),
+            ("read_cache_entries", "gauge", "캐시된 응답 수", stats["entries"]),
+            ("read_cache_bytes", "gauge", "캐시된 JSON 바이트 수", stats["cached_bytes"]),
+        ):
+            lines += metrics.format_family(name, kind, help_text, [("", [], value)])
+        return lines
+
+
+read_cache = ReadCache()
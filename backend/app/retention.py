@@ -0,0 +1,253 @@
+"""
+AI 생성 기록 보관(아카이브) / 정리 작업
+
+ai_generations, generation_runs 는 생성할 때마다 계속 늘어나기만 해서 데이터베이스 파일과
+페이지 캐시가 끝없이 커지고, 같은 파일을 쓰는 다른 테이블까지 느려집니다.
+이 작업은 보관 기간이 지난 행을 날짜별 gzip JSON Lines 파일로 옮긴 뒤 작은 배치로 지우고,
+마지막에 incremental_vacuum / PRAGMA optimize / WAL 체크포인트를 실행합니다.
+
+보관 파일: {AI_ARCHIVE_DIR}/{테이블}/{YYYY-MM-DD}.jsonl.gz
+    같은 날짜 파일에는 gzip 멤버를 이어 붙이므로 gzip.open 으로 그대로 읽을 수 있습니다.
+    파일을 먼저 기록(fsync)한 뒤 행을 지우므로, 도중에 종료되면 같은 행이 보관 파일에
+    두 번 들어갈 수는 있어도 잃어버리지는 않습니다. (행마다 id가 있어 중복 제거 가능)
+
+incremental_vacuum 은 auto_vacuum=INCREMENTAL 인 데이터베이스에서만 파일 크기를 줄입니다.
+새로 만드는 데이터베이스는 init_db 에서 이 모드로 만들고, 예전 데이터베이스는 지운 페이지를
+다음 INSERT 가 재사용하므로 파일이 더 커지지는 않습니다.
+
+환경변수:
+    AI_RETENTION_DAYS            보관 기간 (일, 기본 90, 0이면 정리 안 함)
+    AI_ARCHIVE_DIR               보관 파일 위치 (기본: 데이터베이스 파일 옆 archive 폴더)
+    AI_RETENTION_BATCH_ROWS      한 트랜잭션에서 옮기고 지울 행 수 (기본 2000)
+    AI_RETENTION_INTERVAL_HOURS  자동 실행 간격 (시간, 기본 24, 0이면 수동 실행만)
+"""
+import copy
+import gzip
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from db import db_pool, DB_PATH
+
+AI_RETENTION_DAYS = float(os.getenv("AI_RETENTION_DAYS", "90"))
+AI_ARCHIVE_DIR = os.getenv("AI_ARCHIVE_DIR") or os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), "archive")
+AI_RETENTION_BATCH_ROWS = int(os.getenv("AI_RETENTION_BATCH_ROWS", "2000"))
+AI_RETENTION_INTERVAL_HOURS = float(os.getenv("AI_RETENTION_INTERVAL_HOURS", "24"))
+
+# 배치 사이에 쉬는 시간 - 다른 요청의 쓰기가 잠금을 얻을 틈을 줌
+BATCH_PAUSE_SECONDS = 0.05
+# gzip 압축 수준 (9는 6보다 몇 배 느리고 크기 차이는 작음)
+ARCHIVE_COMPRESS_LEVEL = 6
+# 서버 시작 후 첫 자동 실행까지 기다리는 시간
+FIRST_RUN_DELAY_SECONDS = 60
+# incremental_vacuum 한 번에 돌려줄 최대 페이지 수
+VACUUM_PAGES_PER_STEP = 1000
+
+# 보관 순서: 문장을 먼저 옮기고, 그다음 생성 기록
+ARCHIVE_TABLES = ("ai_generations", "generation_runs")
+
+
+def archive_path(archive_dir, table, day):
+    return os.path.join(archive_dir, table, f"{day}.jsonl.gz")
+
+
+def append_archive(archive_dir, table, rows):
+    """행 dict 들을 created_at 날짜별 파일에 이어 씁니다. 반환값: 쓴 파일 경로 목록"""
+    by_day = {}
+    for row in rows:
+        by_day.setdefault(str(row["created_at"])[:10], []).append(row)
+
+    paths = []
+    for day, day_rows in sorted(by_day.items()):
+        path = archive_path(archive_dir, table, day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in day_rows).encode("utf-8")
+        with open(path, "ab") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=ARCHIVE_COMPRESS_LEVEL) as gz:
+                gz.write(data)
+            raw.flush()
+            os.fsync(raw.fileno())
+        paths.append(path)
+    return paths
+
+
+class RetentionJob:
+    def __init__(self, retention_days=AI_RETENTION_DAYS, archive_dir=AI_ARCHIVE_DIR,
+                 batch_rows=AI_RETENTION_BATCH_ROWS, interval_hours=AI_RETENTION_INTERVAL_HOURS):
+        self.retention_days = retention_days
+        self.archive_dir = archive_dir
+        self.batch_rows = batch_rows
+        self.interval_hours = interval_hours
+        self._lock = threading.Lock()
+        self._running = False
+        self._stop = threading.Event()
+        self._scheduler = None
+        self._progress = {"status": "idle"}
+        self._last_run = None
+        self._runs = 0
+
+    @property
+    def enabled(self):
+        return self.retention_days > 0
+
+    def _update(self, **values):
+        with self._lock:
+            self._progress.update(values)
+
+    def start(self, wait=False):
+        """작업을 백그라운드에서 시작합니다. 이미 실행 중이면 False를 돌려줍니다."""
+        with self._lock:
+            if self._running:
+                return False
+            self._running = True
+        thread = threading.Thread(target=self._run_safely, name="retention-job", daemon=True)
+        thread.start()
+        if wait:
+            thread.join()
+        return True
+
+    def _run_safely(self):
+        started = time.perf_counter()
+        cutoff = (datetime.utcnow() - timedelta(days=self.retention_days)).strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            self._progress = {
+                "status": "running",
+                "phase": "archive",
+                "cutoff": cutoff,
+                "started_at": datetime.now().isoformat(),
+                "archived": {table: 0 for table in ARCHIVE_TABLES},
+                "batches": 0,
+                "files": [],
+                "timings_ms": {},
+            }
+        try:
+            self._run(cutoff)
+            status = "finished"
+            error = None
+        except Exception as e:
+            print(f"AI 생성 기록 정리 에러: {str(e)}")
+            status = "failed"
+            error = str(e)
+        with self._lock:
+            self._progress.update(
+                status=status,
+                phase=None,
+                error=error,
+                finished_at=datetime.now().isoformat(),
+                duration_ms=round((time.perf_counter() - started) * 1000, 1),
+            )
+            self._last_run = dict(self._progress)
+            self._runs += 1
+            self._running = False
+
+    def _run(self, cutoff):
+        for table in ARCHIVE_TABLES:
+            phase_started = time.perf_counter()
+            self._update(phase=f"archive:{table}")
+            self._archive_table(table, cutoff)
+            self._record_timing(f"archive_{table}", phase_started)
+            if self._stop.is_set():
+                return
+
+        phase_started = time.perf_counter()
+        self._update(phase="compact")
+        with db_pool.connection() as conn:
+            self._update(compaction=compact(conn))
+        self._record_timing("compact", phase_started)
+
+    def _record_timing(self, name, started):
+        with self._lock:
+            self._progress["timings_ms"][name] = round((time.perf_counter() - started) * 1000, 1)
+
+    def _archive_table(self, table, cutoff):
+        # (created_at, id) 인덱스 순서로 오래된 행부터 배치 단위로 옮기고 지움
+        while not self._stop.is_set():
+            with db_pool.connection() as conn:
+                c = conn.execute(
+                    f"SELECT * FROM {table} WHERE created_at < ? ORDER BY created_at, id LIMIT ?",
+                    (cutoff, self.batch_rows)
+                )
+                columns = [column[0] for column in c.description]
+                rows = [dict(zip(columns, row)) for row in c.fetchall()]
+                if not rows:
+                    return
+
+                paths = append_archive(self.archive_dir, table, rows)
+                # 방금 보관한 범위까지만 지움 (인덱스 범위 삭제)
+                last = rows[-1]
+                with conn:
+                    conn.execute(
+                        f"DELETE FROM {table} WHERE created_at < ? AND (created_at, id) <= (?, ?)",
+                        (cutoff, last["created_at"], last["id"])
+                    )
+
+            with self._lock:
+                self._progress["archived"][table] += len(rows)
+                self._progress["batches"] += 1
+                for path in paths:
+                    if path not in self._progress["files"]:
+                        self._progress["files"].append(path)
+            if len(rows) < self.batch_rows:
+                return
+            time.sleep(BATCH_PAUSE_SECONDS)
+
+    def progress(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "retention_days": self.retention_days,
+                "archive_dir": self.archive_dir,
+                "batch_rows": self.batch_rows,
+                "interval_hours": self.interval_hours,
+                "runs": self._runs,
+                "current": copy.deepcopy(self._progress),
+                "last_run": self._last_run,
+            }
+
+    def start_scheduler(self):
+        """AI_RETENTION_INTERVAL_HOURS 마다 작업을 실행하는 백그라운드 스레드를 시작합니다."""
+        if not self.enabled or self.interval_hours <= 0 or self._scheduler is not None:
+            return
+        self._scheduler = threading.Thread(target=self._schedule, name="retention-scheduler", daemon=True)
+        self._scheduler.start()
+
+    def _schedule(self):
+        delay = FIRST_RUN_DELAY_SECONDS
+        while not self._stop.wait(delay):
+            self.start()
+            delay = self.interval_hours * 3600
+
+    def stop(self):
+        self._stop.set()
+
+
+def compact(conn):
+    """지운 페이지를 돌려주고 통계를 갱신합니다. 반환값: 실행 결과 요약"""
+    result = {}
+    auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    result["freelist_pages_before"] = freelist
+    if auto_vacuum == 2:  # INCREMENTAL
+        # 한 번에 조금씩 돌려줘서 쓰기 잠금을 오래 잡지 않음
+        while freelist > 0:
+            # execute()는 이 PRAGMA를 한 단계(한 페이지)만 실행하므로 executescript로 끝까지 실행
+            conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_PAGES_PER_STEP});")
+            remaining = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if remaining >= freelist:
+                break
+            freelist = remaining
+            time.sleep(BATCH_PAUSE_SECONDS)
+        result["incremental_vacuum"] = True
+    else:
+        result["incremental_vacuum"] = False
+    result["freelist_pages_after"] = conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+    conn.execute("PRAGMA optimize")
+    busy, wal_pages, checkpointed = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+    result["wal_checkpoint"] = {"busy": bool(busy), "wal_pages": wal_pages, "checkpointed": checkpointed}
+    return result
+
+
+retention_job = RetentionJob()
@@ -0,0 +1,200 @@
+"""
+템플릿/콘텐츠 전문 검색 (SQLite FTS5)
+
+templates(name, description)와 content_info(title, content)를 FTS5 가상 테이블로
+색인하고, 원본 테이블의 트리거로 색인을 항상 동기화합니다.
+
+한국어는 조사가 붙어 띄어쓰기 단위 토큰화가 잘 맞지 않으므로 trigram 토크나이저를
+사용합니다. 덕분에 '특공대'로 '미니특공대를'도 찾을 수 있습니다. 다만 trigram 색인은
+3글자 미만 검색어를 찾지 못하므로, 짧은 검색어는 원본 테이블의 LIKE 조건으로 거릅니다.
+"""
+import re
+import sqlite3
+
+from db import like_pattern
+
+SNIPPET_OPEN = "<mark>"
+SNIPPET_CLOSE = "</mark>"
+SNIPPET_ELLIPSIS = "…"
+SNIPPET_TOKENS = 24  # trigram 기준 약 24글자
+MIN_FTS_TERM_LENGTH = 3
+
+# FTS5(trigram)를 사용할 수 없는 SQLite에서는 LIKE 검색만 사용
+fts_enabled = True
+
+FTS_TABLES = {
+    "templates_fts": {
+        "source": "templates",
+        "columns": ("name", "description"),
+    },
+    "content_fts": {
+        "source": "content_info",
+        "columns": ("title", "content"),
+    },
+}
+
+
+def _create_fts_table(c, fts_table, source, columns):
+    column_list = ", ".join(columns)
+    new_values = ", ".join(f"new.{col}" for col in columns)
+    old_values = ", ".join(f"old.{col}" for col in columns)
+
+    c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts_table,))
+    exists = c.fetchone() is not None
+
+    c.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+            {column_list}, content='{source}', content_rowid='id', tokenize='trigram'
+        )
+    """)
+    c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {source} BEGIN
+            INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.id, {new_values});
+        END
+    """)
+    c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {source} BEGIN
+            INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+        END
+    """)
+    c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {column_list} ON {source} BEGIN
+            INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.id, {new_values});
+        END
+    """)
+
+    # 처음 만들 때는 기존 행들을 한 번에 색인
+    if not exists:
+        c.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+
+def create_search_index(c):
+    """FTS5 색인 테이블과 동기화 트리거를 생성합니다. (init_db에서 호출)"""
+    global fts_enabled
+    try:
+        for fts_table, spec in FTS_TABLES.items():
+            _create_fts_table(c, fts_table, spec["source"], spec["columns"])
+    except sqlite3.OperationalError as e:
+        print(f"Warning: FTS5 전문 검색을 사용할 수 없습니다 ({e}). LIKE 검색을 사용합니다.")
+        fts_enabled = False
+
+
+def _split_terms(query):
+    terms = [term for term in query.split() if term]
+    if not fts_enabled:
+        return [], terms
+    long_terms = [term for term in terms if len(term) >= MIN_FTS_TERM_LENGTH]
+    short_terms = [term for term in terms if len(term) < MIN_FTS_TERM_LENGTH]
+    return long_terms, short_terms
+
+
+def _match_expression(terms):
+    # 각 검색어를 구문(phrase)으로 감싸서 FTS5 문법 문자를 그대로 검색
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def _like_conditions(terms, columns):
+    conditions = []
+    params = []
+    for term in terms:
+        conditions.append("(" + " OR ".join(f"{col} LIKE ? ESCAPE '\\'" for col in columns) + ")")
+        params.extend([like_pattern(term)] * len(columns))
+    return conditions, params
+
+
+def _term_pattern(terms):
+    return re.compile("|".join(re.escape(term) for term in terms), re.IGNORECASE)
+
+
+def _mark(pattern, text):
+    return pattern.sub(lambda m: f"{SNIPPET_OPEN}{m.group(0)}{SNIPPET_CLOSE}", text)
+
+
+def highlight_text(text, terms):
+    """FTS를 쓰지 못한 경우 Python에서 highlight()와 같은 형식으로 전체 텍스트를 하이라이트합니다."""
+    if not text or not terms:
+        return text or ""
+    return _mark(_term_pattern(terms), text)
+
+
+def make_snippet(text, terms, width=SNIPPET_TOKENS):
+    """FTS를 쓰지 못한 경우 Python에서 snippet()과 같은 형식의 하이라이트를 만듭니다."""
+    if not text or not terms:
+        return text or ""
+    pattern = _term_pattern(terms)
+    first = pattern.search(text)
+    start = max(0, first.start() - width // 2) if first else 0
+    end = min(len(text), start + width)
+    highlighted = _mark(pattern, text[start:end])
+    prefix = SNIPPET_ELLIPSIS if start > 0 else ""
+    suffix = SNIPPET_ELLIPSIS if end < len(text) else ""
+    return f"{prefix}{highlighted}{suffix}"
+
+
+def _search(conn, fts_table, select_columns, query, extra_conditions, extra_params, limit):
+    spec = FTS_TABLES[fts_table]
+    source = spec["source"]
+    title_col, body_col = spec["columns"]
+    long_terms, short_terms = _split_terms(query)
+    like_conditions, like_params = _like_conditions(short_terms, [f"s.{title_col}", f"s.{body_col}"])
+    conditions = like_conditions + extra_conditions
+    params = like_params + extra_params
+    c = conn.cursor()
+
+    if long_terms:
+        # 색인으로 후보를 찾고 bm25 순위로 정렬 - 비용이 일치 건수에 비례
+        where = " AND ".join([f"{fts_table} MATCH ?"] + conditions)
+        c.execute(f"""
+            SELECT {select_columns},
+                   highlight({fts_table}, 0, ?, ?) AS title_highlight,
+                   snippet({fts_table}, 1, ?, ?, ?, ?) AS body_snippet,
+                   bm25({fts_table}) AS score
+            FROM {fts_table}
+            JOIN {source} s ON s.id = {fts_table}.rowid
+            WHERE {where}
+            ORDER BY score
+            LIMIT ?
+        """, [SNIPPET_OPEN, SNIPPET_CLOSE, SNIPPET_OPEN, SNIPPET_CLOSE, SNIPPET_ELLIPSIS, SNIPPET_TOKENS,
+              _match_expression(long_terms)] + params + [limit])
+        return c.fetchall(), None
+
+    # 짧은 검색어만 있는 경우 LIKE 조건으로 검색
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    c.execute(f"""
+        SELECT {select_columns}, s.{title_col}, s.{body_col}, NULL
+        FROM {source} s {where}
+        ORDER BY s.created_at DESC
+        LIMIT ?
+    """, params + [limit])
+    return c.fetchall(), short_terms
+
+
+def _highlight_rows(rows, terms):
+    # LIKE 검색 결과는 Python에서 하이라이트 생성 (마지막 세 컬럼이 제목/본문/점수)
+    # 검색어가 없으면 빈 정규식이 글자 사이마다 맞으므로 하이라이트하지 않음
+    if not terms:
+        return rows
+    return [
+        row[:-3] + (highlight_text(row[-3], terms), make_snippet(row[-2], terms), row[-1])
+        for row in rows
+    ]
+
+
+def search_templates(conn, query, limit=20):
+    rows, terms = _search(
+        conn, "templates_fts",
+        "s.id, s.name, s.description, s.tags, s.folder_id, s.created_at",
+        query, [], [], limit
+    )
+    return _highlight_rows(rows, terms)
+
+
+def search_contents(conn, query, category=None, limit=20):
+    conditions, params = (["s.category = ?"], [category]) if category else ([], [])
+    rows, terms = _search(
+        conn, "content_fts",
+        "s.id, s.title, s.category, s.created_at",
+        query, conditions, params, limit
+    )
+    return _highlight_rows(rows, terms)
@@ -0,0 +1,40 @@
+"""
+스트리밍 응답 형식 (NDJSON / Server-Sent Events)
+
+결과를 모두 모은 뒤 한 번에 보내는 대신, 만들어지는 대로 한 건씩 보냅니다.
+"""
+import json
+
+from fastapi import HTTPException
+
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+# 프록시가 스트림을 모아두지 않도록 하는 헤더
+STREAM_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+
+def check_stream_format(stream_format):
+    if stream_format not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"지원하지 않는 스트림 형식: {stream_format} (ndjson 또는 sse)")
+    return stream_format
+
+
+def ndjson_line(data):
+    return json.dumps(data, ensure_ascii=False) + "\n"
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def format_event(stream_format, event, data):
+    """ndjson이면 {"event": ..., **data} 한 줄, sse면 event/data 블록으로 만듭니다."""
+    if stream_format == "sse":
+        return sse_event(event, data)
+    return ndjson_line({"event": event, **data})
@@ -0,0 +1,95 @@
+"""
+템플릿 태그 색인 (template_tags 테이블)
+
+templates.tags JSON의 키/값을 (template_id, key, value) 행으로 풀어서 저장해둡니다.
+태그 목록(값별 템플릿 수)은 (key, value) 인덱스를 묶는(GROUP BY) 쿼리 하나로 계산하고,
+태그 필터는 JSON을 풀지 않고 이 테이블과 조인합니다.
+
+색인은 templates 테이블의 INSERT / UPDATE OF tags / DELETE 트리거가 json_each로 유지하므로
+템플릿을 저장하는 코드(생성, 수정, 임포트)는 따로 신경 쓸 필요가 없습니다.
+문자열/숫자 값만 색인하고 빈 문자열은 건너뜁니다. 잘못된 JSON은 빈 태그로 봅니다.
+"""
+
+# 태그 목록/필터, 가져오기에 쓰는 태그 키
+TAG_KEYS = ("용도", "회기", "아동유형")
+
+# 잘못된 JSON이나 객체가 아닌 값은 빈 객체로 바꿔서 json_each가 실패하지 않게 함
+TAGS_JSON = "CASE WHEN json_valid({tags}) AND json_type({tags}) = 'object' THEN {tags} ELSE '{{}}' END"
+TAG_ROWS_FILTER = "j.type IN ('text', 'integer', 'real') AND j.value != ''"
+
+
+def create_tag_index(c):
+    """template_tags 테이블과 동기화 트리거를 만들고, 처음 만들 때는 기존 템플릿을 모두 색인합니다."""
+    c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'template_tags'")
+    exists = c.fetchone() is not None
+
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS template_tags (
+            template_id INTEGER NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT NOT NULL,
+            PRIMARY KEY (template_id, key)
+        ) WITHOUT ROWID
+    ''')
+    # 태그 목록 집계와 필터 조인이 모두 인덱스만 읽도록 template_id까지 포함
+    c.execute("CREATE INDEX IF NOT EXISTS idx_template_tags_key_value ON template_tags (key, value, template_id)")
+
+    new_rows = f"SELECT new.id, j.key, j.value FROM json_each({TAGS_JSON.format(tags='new.tags')}) j WHERE {TAG_ROWS_FILTER}"
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS template_tags_ai AFTER INSERT ON templates BEGIN
+            INSERT OR REPLACE INTO template_tags (template_id, key, value) {new_rows};
+        END
+    ''')
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS template_tags_au AFTER UPDATE OF tags ON templates BEGIN
+            DELETE FROM template_tags WHERE template_id = old.id;
+            INSERT OR REPLACE INTO template_tags (template_id, key, value) {new_rows};
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS template_tags_ad AFTER DELETE ON templates BEGIN
+            DELETE FROM template_tags WHERE template_id = old.id;
+        END
+    ''')
+
+    if not exists:
+        c.execute(f'''
+            INSERT OR REPLACE INTO template_tags (template_id, key, value)
+            SELECT t.id, j.key, j.value FROM templates t, json_each({TAGS_JSON.format(tags='t.tags')}) j
+            WHERE {TAG_ROWS_FILTER}
+        ''')
+
+
+def get_tag_facets(conn, keys):
+    """
+    태그 키별 값과 값마다 쓰는 템플릿 수를 돌려줍니다. (많이 쓰는 값부터)
+
+    반환값: {키: [(값, 템플릿 수)]} - keys에 있는 키는 값이 없어도 빈 목록으로 들어감
+    """
+    facets = {key: [] for key in keys}
+    rows = conn.execute(f'''
+        SELECT key, value, COUNT(*) AS template_count
+        FROM template_tags
+        WHERE key IN ({", ".join("?" for _ in keys)})
+        GROUP BY key, value
+        ORDER BY key, template_count DESC, value
+    ''', list(keys)).fetchall()
+    for key, value, count in rows:
+        facets[key].append((value, count))
+    return facets
+
+
+def tag_filter_joins(filters, template_alias="t"):
+    """
+    {키: 값} 태그 필터를 template_tags 조인으로 바꿉니다.
+
+    반환값: (JOIN 절 문자열, 파라미터 목록)
+    """
+    joins = []
+    params = []
+    for i, (key, value) in enumerate(filters.items()):
+        joins.append(
+            f"JOIN template_tags tt{i} ON tt{i}.template_id = {template_alias}.id AND tt{i}.key = ? AND tt{i}.value = ?"
+        )
+        params.extend([key, value])
+    return " ".join(joins), params
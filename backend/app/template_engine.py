@@ -0,0 +1,70 @@
+"""
+{{{변수명}}} 템플릿 엔진
+
+fixed_content를 한 번만 파싱해서 [고정 문자열, 변수, 고정 문자열, ...] 조각으로 나눠두고,
+렌더링할 때는 조각들을 한 번에 join 합니다. 변수가 몇 개든 프롬프트 길이에 비례하는
+비용으로 렌더링되며, 컴파일 결과는 (템플릿 id, updated_at) 기준으로 캐시합니다.
+"""
+import re
+import threading
+from collections import OrderedDict
+
+VARIABLE_PATTERN = re.compile(r'\{\{\{([^{}]+)\}\}\}')
+TEMPLATE_CACHE_SIZE = 1024
+
+
+class CompiledTemplate:
+    __slots__ = ("source", "literals", "slots")
+
+    def __init__(self, source):
+        self.source = source
+        self.literals = []  # 변수 사이의 고정 문자열 (len(slots) + 1 개)
+        self.slots = []     # 등장 순서대로의 변수 이름
+        position = 0
+        for match in VARIABLE_PATTERN.finditer(source):
+            self.literals.append(source[position:match.start()])
+            self.slots.append(match.group(1))
+            position = match.end()
+        self.literals.append(source[position:])
+
+    @property
+    def variables(self):
+        """등장 순서대로의 변수 이름 목록 (re.findall 결과와 같음, 중복 포함)"""
+        return list(self.slots)
+
+    def render(self, values):
+        """변수를 치환한 문자열을 만듭니다. 값이 없는 변수는 {{{변수명}}} 그대로 둡니다."""
+        strings = {key: str(value) for key, value in values.items()}
+        parts = [self.literals[0]]
+        for name, literal in zip(self.slots, self.literals[1:]):
+            value = strings.get(name)
+            parts.append(value if value is not None else "{{{" + name + "}}}")
+            parts.append(literal)
+        return "".join(parts)
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def compile_template(source):
+    return CompiledTemplate(source)
+
+
+def get_compiled_template(template_id, updated_at, source):
+    """(템플릿 id, updated_at) 기준으로 캐시된 컴파일 결과를 돌려줍니다."""
+    key = (template_id, updated_at)
+    with _cache_lock:
+        compiled = _cache.get(key)
+        # updated_at은 초 단위라서 같은 초에 수정된 경우를 대비해 원문도 비교
+        if compiled is not None and compiled.source == source:
+            _cache.move_to_end(key)
+            return compiled
+
+    compiled = CompiledTemplate(source)
+    with _cache_lock:
+        _cache[key] = compiled
+        _cache.move_to_end(key)
+        while len(_cache) > TEMPLATE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return compiled
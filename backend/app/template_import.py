@@ -0,0 +1,210 @@
+"""
+템플릿 일괄 가져오기
+
+템플릿을 한 행씩 INSERT하고 IntegrityError로 중복을 알아내는 대신,
+이미 있는 이름을 쿼리 한 번으로 set에 담아두고 중복을 먼저 걸러낸 뒤
+나머지를 IMPORT_CHUNK_SIZE 개씩 executemany 로 넣습니다.
+
+- 가져오기 전체가 쓰기 트랜잭션 하나(BEGIN IMMEDIATE)입니다. 첫 템플릿이 들어올 때 쓰기 잠금을 잡고
+  이름 목록을 읽으므로 가져오는 동안 목록이 바뀌지 않습니다. (빈 입력이면 트랜잭션을 열지 않음)
+  commit()을 부르면 그때까지 넣은 것을 커밋하고, 다음 묶음을 넣을 때 새 트랜잭션을 엽니다.
+- commit_each_chunk=True 이면 묶음마다 커밋합니다. 파일 업로드처럼 행이 천천히 들어오는 경우
+  묶음 사이에는 쓰기 잠금을 잡고 있지 않게 됩니다.
+- INSERT ... ON CONFLICT(name) DO NOTHING 이라서 그래도 겹치는 이름이 있으면 건너뛰고 중복으로 셉니다.
+  track_names=False 이면 이름 목록을 읽지 않고 이것만으로 중복을 가려냅니다. (가져오는 양과 관계없이 메모리 일정)
+- 새 행의 id는 묶음을 넣기 전 가장 큰 id보다 큰 행을 읽어서 얻고, 변수 색인도 묶음마다 executemany 한 번으로 씁니다.
+  (태그 색인, 전문 검색 색인, 행 개수는 트리거가 유지)
+- 묶음 하나가 중복이 아닌 이유로 실패하면 그 묶음만 되돌리고 한 행씩 다시 넣어서 실패한 행만 오류로 남깁니다.
+- 결과에 걸린 시간과 초당 추가한 템플릿 수를 같이 돌려주고, /metrics 에도 기록합니다.
+
+쓰기 잠금을 잡고 동기로 도는 코드이므로 이벤트 루프가 아닌 스레드(일반 def 엔드포인트)에서 부릅니다.
+
+환경변수:
+    IMPORT_CHUNK_SIZE   executemany 한 번에 넣을 템플릿 수 (기본 500)
+"""
+import os
+import sqlite3
+import time
+
+import metrics
+from template_engine import compile_template
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "500"))
+
+TEMPLATE_COLUMNS = ("name", "description", "fixed_content", "variables", "tags", "folder_id")
+INSERT_TEMPLATE_SQL = (
+    f"INSERT INTO templates ({', '.join(TEMPLATE_COLUMNS)}) VALUES ({', '.join('?' for _ in TEMPLATE_COLUMNS)}) "
+    "ON CONFLICT (name) DO NOTHING"
+)
+INSERT_VARIABLE_SQL = "INSERT INTO template_variables (template_id, position, name) VALUES (?, ?, ?)"
+
+import_rows = metrics.counter("template_import_rows_total", "일괄 가져오기로 처리한 템플릿 수", ("result",))
+import_duration = metrics.histogram("template_import_duration_seconds", "일괄 가져오기 한 번에 걸린 시간 (초)")
+
+
+class TemplateImport:
+    """
+    템플릿 일괄 가져오기 한 번.
+
+        importer = TemplateImport(conn, skip_duplicates=True)
+        for template in templates:
+            importer.add(name, description, fixed_content, variables_json, tags_json, folder_id)
+        result = importer.finish()
+
+    skip_duplicates 가 False 이면 중복 이름을 건너뛰는 대신 오류 목록에 남깁니다. (나머지는 그대로 추가)
+    report_skipped 가 True 이면 건너뛴 중복도 오류 목록에 메시지를 남깁니다. (error_count 는 그대로)
+    max_errors 를 주면 오류 메시지는 그 개수까지만 남기고 error_count 만 셉니다.
+    on_commit(importer) 는 커밋할 때마다 불립니다.
+    """
+
+    def __init__(self, conn, skip_duplicates=True, chunk_size=IMPORT_CHUNK_SIZE,
+                 track_names=True, commit_each_chunk=False, max_errors=None, on_commit=None,
+                 report_skipped=False):
+        self.conn = conn
+        self.skip_duplicates = skip_duplicates
+        self.chunk_size = max(1, chunk_size)
+        self.commit_each_chunk = commit_each_chunk
+        self.max_errors = max_errors
+        self.on_commit = on_commit
+        self.report_skipped = report_skipped
+        self.success_count = 0
+        self.skip_count = 0
+        self.error_count = 0
+        self.errors = []
+        self.total = 0
+        self.commits = 0
+        self._chunk = []
+        self._uncommitted = 0
+        self._started = time.perf_counter()
+        self._track_names = track_names
+        self._names = None
+
+    def _begin(self):
+        if not self.conn.in_transaction:
+            self.conn.execute("BEGIN IMMEDIATE")
+
+    def _report(self, message):
+        if self.max_errors is None or len(self.errors) < self.max_errors:
+            self.errors.append(message)
+
+    def add_error(self, message):
+        self.error_count += 1
+        self._report(message)
+
+    def _duplicate(self, name):
+        if not self.skip_duplicates:
+            self.add_error(f"템플릿 '{name}' 이미 존재함")
+            return
+        self.skip_count += 1
+        if self.report_skipped:
+            self._report(f"템플릿 '{name}' 이미 존재함")
+
+    def add(self, name, description, fixed_content, variables, tags, folder_id=None):
+        """템플릿 하나를 넣을 묶음에 추가합니다. variables / tags 는 JSON 문자열"""
+        self.total += 1
+        if self._track_names and self._names is None:
+            self._begin()
+            self._names = {name for (name,) in self.conn.execute("SELECT name FROM templates")}
+        # 이미 있거나 이번 가져오기에서 앞에 나온 이름
+        if self._names is not None:
+            if name in self._names:
+                self._duplicate(name)
+                return
+            self._names.add(name)
+        self._chunk.append((name, description, fixed_content, variables, tags, folder_id))
+        if len(self._chunk) >= self.chunk_size:
+            if self.commit_each_chunk:
+                self.commit()
+            else:
+                self.flush()
+
+    def flush(self):
+        """모아둔 묶음을 넣습니다. (커밋은 하지 않음)"""
+        chunk, self._chunk = self._chunk, []
+        if not chunk:
+            return
+        self._begin()
+        self.conn.execute("SAVEPOINT template_import_chunk")
+        try:
+            self._insert(chunk)
+        except sqlite3.Error:
+            self.conn.execute("ROLLBACK TO template_import_chunk")
+            self.conn.execute("RELEASE template_import_chunk")
+            self._insert_one_by_one(chunk)
+            return
+        self.conn.execute("RELEASE template_import_chunk")
+
+    def _insert(self, chunk):
+        c = self.conn.cursor()
+        c.execute("SELECT COALESCE(MAX(id), 0) FROM templates")
+        last_id = c.fetchone()[0]
+        c.executemany(INSERT_TEMPLATE_SQL, chunk)
+        # 쓰기 잠금을 잡고 있으므로 last_id 보다 큰 행은 모두 방금 넣은 행 (AUTOINCREMENT)
+        c.execute("SELECT id, name, fixed_content FROM templates WHERE id > ?", (last_id,))
+        inserted = c.fetchall()
+        c.executemany(INSERT_VARIABLE_SQL, [
+            (template_id, position, variable)
+            for template_id, _, fixed_content in inserted
+            for position, variable in enumerate(compile_template(fixed_content).slots)
+        ])
+        self.success_count += len(inserted)
+        self._uncommitted += len(inserted)
+        if len(inserted) < len(chunk):
+            # 같은 이름이 묶음 안에 여러 번 있으면 처음 것만 들어감
+            remaining = {name for _, name, _ in inserted}
+            for row in chunk:
+                if row[0] in remaining:
+                    remaining.discard(row[0])
+                else:
+                    self._duplicate(row[0])
+
+    def _insert_one_by_one(self, chunk):
+        for row in chunk:
+            self.conn.execute("SAVEPOINT template_import_row")
+            try:
+                self._insert([row])
+            except sqlite3.Error as e:
+                self.conn.execute("ROLLBACK TO template_import_row")
+                self.add_error(f"템플릿 '{row[0]}' 추가 실패: {str(e)}")
+            self.conn.execute("RELEASE template_import_row")
+
+    def commit(self):
+        """지금까지 넣은 것을 커밋합니다. (새로 들어간 행이 있을 때만 commits 로 셈)"""
+        self.flush()
+        if self.conn.in_transaction:
+            self.conn.commit()
+        if not self._uncommitted:
+            return
+        self._uncommitted = 0
+        self.commits += 1
+        if self.on_commit:
+            self.on_commit(self)
+
+    def rollback(self):
+        """마지막 커밋 뒤에 넣은 것과 아직 넣지 않은 묶음을 버립니다. (세어둔 수는 그대로)"""
+        self._chunk = []
+        self._uncommitted = 0
+        self.conn.rollback()
+
+    def progress(self):
+        elapsed = time.perf_counter() - self._started
+        return {
+            "success_count": self.success_count,
+            "skip_count": self.skip_count,
+            "error_count": self.error_count,
+            "total": self.total,
+            "commits": self.commits,
+            "elapsed_seconds": round(elapsed, 3),
+            "templates_per_second": round(self.success_count / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+    def finish(self):
+        """남은 묶음을 넣고 커밋한 뒤 결과를 돌려줍니다."""
+        self.commit()
+        result = self.progress()
+        import_duration.observe(result["elapsed_seconds"])
+        for label, count in (("inserted", self.success_count), ("skipped", self.skip_count),
+                             ("failed", self.error_count)):
+            if count:
+                import_rows.inc(label, amount=count)
+        return {**result, "errors": self.errors}
@@ -0,0 +1,418 @@
+"""
+파일 업로드로 템플릿 가져오기 (CSV / TSV / 간단한 형식)
+
+/templates/simple-import/ 는 붙여넣은 표 전체를 JSON 문자열 하나로 받아서 줄 목록으로 나눈 뒤 처리하므로
+큰 파일은 요청 크기 제한에 걸리고 입력 크기의 몇 배 메모리를 씁니다. 업로드 가져오기는 요청 본문을
+받는 대로 조금씩 읽어서 한 줄(따옴표 안 여러 줄 셀은 한 행)씩 파싱하고, 묶음 단위로 커밋합니다.
+메모리에는 읽는 중인 조각 하나와 아직 커밋하지 않은 묶음 하나만 있으므로 파일 크기와 관계없이 일정합니다.
+
+본문 형식:
+    multipart/form-data   "file" 필드의 파일 (다른 필드는 무시, 옵션은 쿼리 파라미터로)
+    그 밖의 Content-Type   본문 전체가 파일 (text/csv, text/plain 등)
+
+파일 형식 (format):
+    csv / tsv   한 행이 템플릿 하나. 열 순서는 이름, 설명, 내용, 용도, 회기, 아동유형
+                첫 행이 머리글(이름/name, 설명, 내용/content...)이면 머리글의 열 이름으로 찾습니다.
+                따옴표로 감싼 셀 안의 줄바꿈은 셀 내용으로 봅니다.
+    simple      /templates/simple-import/ 와 같은 탭 / | 구분 형식 (iter_simple_templates)
+
+진행 상황: 가져오는 동안 GET /templates/import/{import_id} 로 받은 바이트 수, 처리한 행 수, 커밋한 묶음 수를
+볼 수 있습니다. import_id 를 쿼리 파라미터로 주면 그 id로, 없으면 새로 만든 id로 등록합니다.
+도중에 실패하면 이미 커밋한 묶음은 남고, 마지막 커밋 뒤에 읽은 행만 버립니다.
+
+XLSX는 zip이라 끝까지 받아야 읽을 수 있어서 받지 않습니다. 엑셀에서 CSV로 저장하거나 표를 복사해서
+TSV로 올리면 됩니다.
+
+환경변수:
+    UPLOAD_IMPORT_BATCH_ROWS   한 트랜잭션으로 커밋할 템플릿 수 (기본 1000)
+    UPLOAD_MAX_LINE_CHARS      한 줄 최대 글자 수, 넘으면 가져오기 실패 (기본 1000000)
+"""
+import codecs
+import csv
+import io
+import os
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+import anyio
+from starlette.requests import ClientDisconnect
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart 0.0.13 이전
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from tag_index import TAG_KEYS
+from template_import import TemplateImport
+
+UPLOAD_IMPORT_BATCH_ROWS = int(os.getenv("UPLOAD_IMPORT_BATCH_ROWS", "1000"))
+UPLOAD_MAX_LINE_CHARS = int(os.getenv("UPLOAD_MAX_LINE_CHARS", "1000000"))
+
+UPLOAD_FORMATS = ("csv", "tsv", "simple")
+UPLOAD_FILE_FIELD = "file"
+# 결과에 남길 최대 오류 메시지 수 (오류 수는 모두 셈)
+MAX_REPORTED_ERRORS = 100
+# 끝난 가져오기 진행 상황을 몇 개까지 기억할지
+FINISHED_HISTORY = 20
+# 본문 조각을 텍스트로 바꿀 때 읽는 크기
+READ_BUFFER_BYTES = 64 * 1024
+
+IMPORT_ID_PATTERN = re.compile(r"^[\w-]{1,64}$")
+CSV_COLUMNS = ("name", "description", "fixed_content") + TAG_KEYS
+# 머리글 이름 -> 열 (소문자, 공백 제거 후 비교)
+CSV_HEADER_ALIASES = {
+    "이름": "name", "템플릿이름": "name", "템플릿명": "name", "템플릿": "name", "name": "name",
+    "설명": "description", "description": "description",
+    "내용": "fixed_content", "고정내용": "fixed_content", "content": "fixed_content", "fixed_content": "fixed_content",
+    "용도": "용도", "회기": "회기", "아동유형": "아동유형",
+}
+
+
+class UploadError(Exception):
+    """업로드한 파일을 읽을 수 없음 (400)"""
+
+
+def check_upload_options(import_format, encoding, import_id):
+    if import_format not in UPLOAD_FORMATS:
+        raise UploadError(f"지원하지 않는 형식입니다: {import_format} (csv, tsv, simple)")
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        raise UploadError(f"알 수 없는 인코딩입니다: {encoding}")
+    if import_id is not None and not IMPORT_ID_PATTERN.match(import_id):
+        raise UploadError("import_id는 영문/숫자/_/- 64자 이내여야 합니다")
+
+
+# --- 본문 읽기 ---
+
+def iter_request_body(stream):
+    """
+    이벤트 루프의 request.stream() 을 워커 스레드에서 동기로 한 조각씩 읽습니다.
+    run_in_threadpool 로 실행한 함수 안에서만 씁니다. (다음 조각을 읽을 때만 루프에 들렀다 옴)
+    """
+    while True:
+        try:
+            chunk = anyio.from_thread.run(stream.__anext__)
+        except StopAsyncIteration:
+            return
+        if chunk:
+            yield chunk
+
+
+class _MultipartFile:
+    """multipart 본문에서 field 이름의 파일 부분 바이트만 꺼냄"""
+
+    def __init__(self, boundary, field):
+        self.field = field.encode("latin-1")
+        self.found = False
+        self._output = []
+        self._header_field = b""
+        self._header_value = b""
+        self._in_field = False
+        self._done = False
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def _on_part_begin(self):
+        self._in_field = False
+
+    def _on_header_field(self, data, start, end):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        if self._header_field.lower() == b"content-disposition" and not self._done:
+            _, options = parse_options_header(self._header_value)
+            self._in_field = options.get(b"name") == self.field
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_part_data(self, data, start, end):
+        if self._in_field:
+            self.found = True
+            self._output.append(data[start:end])
+
+    def _on_part_end(self):
+        if self._in_field:
+            self._done = True
+        self._in_field = False
+
+    def feed(self, chunk):
+        self._parser.write(chunk)
+        output, self._output = self._output, []
+        return output
+
+
+def iter_upload_bytes(chunks, content_type, field=UPLOAD_FILE_FIELD):
+    """본문 조각 → 파일 내용 조각. multipart 이면 field 파일 부분만, 아니면 본문 그대로"""
+    media_type, options = parse_options_header(content_type or "")
+    if media_type != b"multipart/form-data":
+        yield from chunks
+        return
+    boundary = options.get(b"boundary")
+    if not boundary:
+        raise UploadError("multipart 본문에 boundary가 없습니다")
+    upload = _MultipartFile(boundary, field)
+    for chunk in chunks:
+        yield from upload.feed(chunk)
+    if not upload.found:
+        raise UploadError(f"multipart 본문에 '{field}' 파일이 없습니다")
+
+
+class _ChunkReader(io.RawIOBase):
+    """바이트 조각 반복자를 파일처럼 읽게 함 (TextIOWrapper 용)"""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._pending = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._pending = memoryview(chunk)
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+def iter_text_lines(chunks, encoding, max_line_chars=UPLOAD_MAX_LINE_CHARS):
+    """바이트 조각 → 줄바꿈(\\n, \\r\\n, \\r)을 포함한 텍스트 줄. 한 줄이 max_line_chars 를 넘으면 UploadError"""
+    text = io.TextIOWrapper(io.BufferedReader(_ChunkReader(chunks), READ_BUFFER_BYTES), encoding=encoding, newline="")
+    while True:
+        line = text.readline(max_line_chars)
+        if not line:
+            return
+        if len(line) == max_line_chars and not line.endswith(("\n", "\r")):
+            raise UploadError(f"한 줄이 {max_line_chars}글자를 넘습니다")
+        yield line
+
+
+# --- 형식별 파서: 템플릿마다 (이름, 설명, 내용, 태그 dict) ---
+
+def make_tags(values):
+    return {key: values.get(key, "") for key in TAG_KEYS}
+
+
+def iter_simple_templates(lines):
+    """
+    탭 또는 | 로 구분된 간단한 형식 (Excel 복사/붙여넣기). lines 는 줄바꿈을 뺀 줄.
+
+    열이 3개 이상인 줄이 새 템플릿(이름, 설명, 내용, 용도, 회기, 아동유형)이고,
+    그 밖의 줄은 앞 템플릿 내용에 이어 붙입니다. (공백 줄도 그대로 - 문단 구분)
+    """
+    current_name = ""
+    current_description = ""
+    current_content = ""
+    current_tags = {}
+
+    for index, line in enumerate(lines):
+        # 첫 번째 줄이 헤더인지 확인
+        if index == 0 and (line.strip().startswith('이름') or line.strip().startswith('템플릿')):
+            continue
+
+        # 탭 또는 | 로 구분된 데이터 파싱 (원본 줄 사용)
+        parts = re.split(r'\t+|\s*\|\s*', line)
+
+        # 첫 번째 컬럼이 템플릿 이름이고, 3개 이상 컬럼이 있으면 새 템플릿
+        if len(parts) >= 3:
+            # 이전 템플릿 (있으면)
+            if current_name and current_content:
+                yield current_name, current_description, current_content, make_tags(current_tags)
+
+            # 새 템플릿 시작
+            current_name = parts[0].strip()
+            current_description = parts[1].strip()
+            # Excel에서 복사할 때 ""가 되므로 "로 변환
+            current_content = parts[2].strip().replace('""', '"')
+            # 시작과 끝의 따옴표 제거 (Excel이 전체를 감싸는 따옴표)
+            if len(current_content) >= 2 and current_content.startswith('"'):
+                current_content = current_content[1:]
+            if len(current_content) >= 1 and current_content.endswith('"'):
+                current_content = current_content[:-1]
+
+            current_tags = {key: part.strip() for key, part in zip(TAG_KEYS, parts[3:])}
+
+        # 첫 번째 컬럼이 비어있거나 구분자가 없으면 내용 추가 (들여쓰기, 공백 줄 유지)
+        elif current_name and current_content:
+            current_content += "\n" + line.replace('""', '"')
+
+    # 마지막 템플릿
+    if current_name and current_content:
+        # 끝의 따옴표가 줄바꿈 바로 뒤에 있는 경우 제거
+        current_content = current_content.rstrip()
+        if current_content.endswith('"'):
+            current_content = current_content[:-1].rstrip()
+        yield current_name, current_description, current_content, make_tags(current_tags)
+
+
+def _header_columns(row):
+    """머리글 행이면 {열: 위치}, 아니면 None"""
+    columns = {}
+    for position, cell in enumerate(row):
+        column = CSV_HEADER_ALIASES.get(re.sub(r"\s+", "", cell).lower())
+        if column and column not in columns:
+            columns[column] = position
+    if "name" in columns and "fixed_content" in columns:
+        return columns
+    return None
+
+
+def iter_csv_templates(lines, delimiter, on_error):
+    """
+    CSV / TSV 행 → 템플릿. lines 는 줄바꿈을 포함한 줄 (따옴표 안 여러 줄 셀 지원).
+    이름이나 내용이 빈 행은 on_error(메시지) 로 알리고 건너뜁니다.
+    """
+    reader = csv.reader(lines, delimiter=delimiter)
+    columns = None
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        if columns is None:
+            columns = _header_columns(row)
+            if columns is not None:
+                continue
+            columns = {column: position for position, column in enumerate(CSV_COLUMNS)}
+        values = {column: row[position] if position < len(row) else "" for column, position in columns.items()}
+        name = values.get("name", "").strip()
+        content = values.get("fixed_content", "")
+        if not name or not content.strip():
+            on_error(f"{reader.line_num}번째 줄: 이름 또는 내용이 비어 있습니다")
+            continue
+        yield name, values.get("description", "").strip(), content, make_tags(
+            {key: values.get(key, "").strip() for key in TAG_KEYS}
+        )
+
+
+def iter_upload_templates(lines, import_format, on_error):
+    if import_format == "simple":
+        return iter_simple_templates(line.rstrip("\r\n") for line in lines)
+    return iter_csv_templates(lines, "\t" if import_format == "tsv" else ",", on_error)
+
+
+# --- 가져오기 작업과 진행 상황 ---
+
+class UploadImport:
+    def __init__(self, import_id, import_format, skip_duplicates, encoding, content_length):
+        self.import_id = import_id
+        self.import_format = import_format
+        self.skip_duplicates = skip_duplicates
+        self.encoding = encoding
+        self.content_length = content_length
+        self.status = "running"
+        self.error = None
+        self.bytes_received = 0
+        self.started_at = time.time()
+        self.finished_at = None
+        self._importer = None
+
+    def _count_bytes(self, chunks):
+        for chunk in chunks:
+            self.bytes_received += len(chunk)
+            yield chunk
+
+    def run(self, conn, chunks, content_type, dump_tags, on_commit=None):
+        """
+        본문 조각을 끝까지 읽으면서 가져옵니다. (워커 스레드에서 실행)
+        dump_tags: 태그 dict → 저장할 JSON 문자열, on_commit(importer): 묶음을 커밋할 때마다
+        """
+        importer = self._importer = TemplateImport(
+            conn, skip_duplicates=self.skip_duplicates, chunk_size=UPLOAD_IMPORT_BATCH_ROWS,
+            track_names=False, commit_each_chunk=True, max_errors=MAX_REPORTED_ERRORS, on_commit=on_commit,
+        )
+        try:
+            lines = iter_text_lines(iter_upload_bytes(self._count_bytes(chunks), content_type), self.encoding)
+            for name, description, content, tags in iter_upload_templates(lines, self.import_format, importer.add_error):
+                importer.add(name, description, content, "{}", dump_tags(tags))
+            result = importer.finish()
+        except Exception as e:
+            importer.rollback()
+            self._finish("failed", describe_upload_error(e))
+            raise
+        self._finish("done")
+        return {**self.progress(), "errors": result["errors"]}
+
+    def _finish(self, status, error=None):
+        self.status = status
+        self.error = error
+        self.finished_at = time.time()
+
+    def progress(self):
+        counts = self._importer.progress() if self._importer else {}
+        return {
+            "import_id": self.import_id,
+            "status": self.status,
+            "format": self.import_format,
+            "bytes_received": self.bytes_received,
+            "content_length": self.content_length,
+            "percent": round(self.bytes_received * 100 / self.content_length, 1) if self.content_length else None,
+            **counts,
+            "error": self.error,
+        }
+
+
+# 파일 내용이나 업로드 문제라서 400으로 돌려줄 오류
+UPLOAD_ERRORS = (UploadError, UnicodeDecodeError, csv.Error, ClientDisconnect)
+
+
+def describe_upload_error(error):
+    if isinstance(error, UnicodeDecodeError):
+        return f"파일을 {error.encoding}(으)로 읽을 수 없습니다. encoding 파라미터를 확인하세요 (예: cp949)"
+    if isinstance(error, csv.Error):
+        return f"CSV 형식 오류: {error}"
+    if isinstance(error, ClientDisconnect):
+        return "업로드 도중 연결이 끊어졌습니다"
+    return str(error)
+
+
+class UploadImports:
+    """진행 중인 가져오기와 최근에 끝난 가져오기 목록"""
+
+    def __init__(self, history=FINISHED_HISTORY):
+        self.history = history
+        self._imports = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, import_id, import_format, skip_duplicates, encoding, content_length):
+        """새 가져오기를 등록합니다. 같은 id가 진행 중이면 None"""
+        with self._lock:
+            import_id = import_id or secrets.token_hex(8)
+            current = self._imports.get(import_id)
+            if current is not None and current.status == "running":
+                return None
+            job = UploadImport(import_id, import_format, skip_duplicates, encoding, content_length)
+            self._imports.pop(import_id, None)
+            self._imports[import_id] = job
+            finished = [key for key, item in self._imports.items() if item.status != "running"]
+            for key in finished[:max(0, len(finished) - self.history)]:
+                del self._imports[key]
+            return job
+
+    def get(self, import_id):
+        with self._lock:
+            job = self._imports.get(import_id)
+        return job.progress() if job else None
+
+    def list(self):
+        with self._lock:
+            jobs = list(self._imports.values())
+        return [job.progress() for job in reversed(jobs)]
+
+
+upload_imports = UploadImports()
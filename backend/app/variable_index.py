@@ -0,0 +1,82 @@
+"""
+템플릿 변수 색인 (template_variables 테이블)
+
+템플릿을 저장할 때 fixed_content의 {{{변수명}}}를 미리 뽑아서 등장 순서대로 저장해둡니다.
+폴더별 공통 변수는 매번 정규식으로 다시 추출하지 않고 색인 테이블을 묶어(GROUP BY) 계산합니다.
+
+폴더 정보는 templates.folder_id와 조인해서 얻기 때문에, 템플릿을 다른 폴더로 옮겨도
+색인을 다시 만들 필요가 없습니다. 템플릿 삭제 시에는 트리거가 색인 행을 지웁니다.
+"""
+from template_engine import compile_template
+
+
+def create_variable_index(c):
+    """template_variables 테이블을 만들고, 처음 만들 때는 기존 템플릿을 모두 색인합니다."""
+    c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'template_variables'")
+    exists = c.fetchone() is not None
+
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS template_variables (
+            template_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            PRIMARY KEY (template_id, position)
+        )
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_templates_folder ON templates (folder_id)")
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS template_variables_ad AFTER DELETE ON templates BEGIN
+            DELETE FROM template_variables WHERE template_id = old.id;
+        END
+    ''')
+
+    if not exists:
+        c.execute("SELECT id, fixed_content FROM templates")
+        for template_id, fixed_content in c.fetchall():
+            index_template_variables(c, template_id, fixed_content)
+
+
+def index_template_variables(c, template_id, fixed_content):
+    """템플릿 하나의 변수 색인을 새로 씁니다. (생성/수정/가져오기 시 호출, 커밋은 호출한 쪽에서)"""
+    c.execute("DELETE FROM template_variables WHERE template_id = ?", (template_id,))
+    c.executemany(
+        "INSERT INTO template_variables (template_id, position, name) VALUES (?, ?, ?)",
+        [(template_id, position, name) for position, name in enumerate(compile_template(fixed_content).slots)]
+    )
+
+
+def get_folder_variables(conn, folder_id):
+    """
+    폴더의 변수 사용 현황을 돌려줍니다.
+
+    반환값: (변수별 [(이름, 사용 템플릿 수, 한 템플릿에서만 쓰이면 그 템플릿 이름)],
+             [(템플릿 id, 템플릿 이름, [변수...])])
+    """
+    c = conn.cursor()
+    c.execute('''
+        SELECT tv.name,
+               COUNT(DISTINCT tv.template_id) AS usage_count,
+               CASE WHEN COUNT(DISTINCT tv.template_id) = 1 THEN MIN(t.name) END AS template_name
+        FROM templates t
+        JOIN template_variables tv ON tv.template_id = t.id
+        WHERE t.folder_id = ?
+        GROUP BY tv.name
+        ORDER BY usage_count DESC, tv.name
+    ''', (folder_id,))
+    variables = c.fetchall()
+
+    c.execute('''
+        SELECT t.id, t.name, tv.name
+        FROM templates t
+        LEFT JOIN template_variables tv ON tv.template_id = t.id
+        WHERE t.folder_id = ?
+        ORDER BY t.id, tv.position
+    ''', (folder_id,))
+    templates = []
+    for template_id, template_name, variable in c.fetchall():
+        if not templates or templates[-1][0] != template_id:
+            templates.append((template_id, template_name, []))
+        if variable is not None:
+            templates[-1][2].append(variable)
+
+    return variables, templates